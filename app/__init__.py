@@ -1,63 +1,114 @@
 # app/__init__.py
+from importlib import import_module
 from flask import Flask, session
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from datetime import datetime
+from app.replica import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+# RoutingSession, @read_replica ile işaretli view'larda okumaları replikaya yönlendirir
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login = LoginManager()
 login.login_view = 'auth.login'
 login.login_message = "Please log in to access this page."
 login.login_message_category = "info"
 
 
-def create_app(config_class=Config):
+# Uygulamanın yüklenebilecek bileşenleri. create_app() yalnızca seçilen bileşenlerin ihtiyaç
+# duyduğu blueprint'leri ve eklentileri import eder; kısa ömürlü CLI komutları, arka plan işleri
+# ve testler böylece daha hızlı açılır.
+#   web    : HTML arayüzü (tüm blueprint'ler)
+#   api    : JSON uç noktaları olan blueprint'ler (oturum açma ve yönlendirmesi için auth ve main dahil)
+#   cli    : flask db (Flask-Migrate) ve uygulama CLI komutları
+#   worker : yalnızca veritabanı ve modeller (populate_db.py, zamanlanmış işler)
+COMPONENTS = ('web', 'api', 'cli', 'worker')
+
+# Kayıt sırasıyla blueprint modülleri ve hangi bileşenlerin onları gerektirdiği
+BLUEPRINTS = (
+    ('auth', '/auth', ('web', 'api')),
+    ('main', None, ('web', 'api')),
+    ('products', None, ('web', 'api')),
+    ('suppliers', None, ('web',)),
+    ('warehouses', None, ('web',)),
+    ('cart', None, ('web',)),
+    ('orders', None, ('web', 'api', 'cli')),  # `flask orders` komutları blueprint'e bağlı
+    ('admin', None, ('web', 'api')),          # url_prefix='/admin' __init__.py'sinde
+)
+
+
+def _unloaded_blueprint_url(error, endpoint, values):
+    # Yüklenmemiş bir blueprint'e verilen bağlantılar (ör. 'api' sürecinde base.html menüsü) boş kalır
+    if endpoint.split('.', 1)[0] in {name for name, _, _ in BLUEPRINTS}:
+        return '#'
+    return None
+
+
+def create_app(config_class=Config, components=None):
+    """
+    Application factory. components selects what gets loaded (see COMPONENTS); None loads
+    everything, e.g. create_app(components=('worker',)) for a script that only needs the models.
+    """
+    components = tuple(components or COMPONENTS)
+    unknown = set(components) - set(COMPONENTS)
+    if unknown:
+        raise ValueError(f"Unknown app components: {', '.join(sorted(unknown))}. Use: {', '.join(COMPONENTS)}.")
+
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.config['APP_COMPONENTS'] = components
+    if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+        app.logger.warning("'.env' dosyasında 'DATABASE_URL' ortam değişkeni bulunamadı veya boş. "
+                           "Lütfen .env dosyanızı ve MS SQL Server bağlantı dizenizi kontrol edin.")
 
     db.init_app(app)
-    migrate.init_app(app, db)
     login.init_app(app)
 
-    from app.auth import bp as auth_bp
-    app.register_blueprint(auth_bp, url_prefix='/auth')
-
-    from app.main import bp as main_bp
-    app.register_blueprint(main_bp)
-
-    from app.products import bp as products_bp
-    app.register_blueprint(products_bp)
-
-    from app.suppliers import bp as suppliers_bp
-    app.register_blueprint(suppliers_bp)
-
-    from app.warehouses import bp as warehouses_bp
-    app.register_blueprint(warehouses_bp)
-
-    from app.cart import bp as cart_bp
-    app.register_blueprint(cart_bp)
-
-    from app.orders import bp as orders_bp
-    app.register_blueprint(orders_bp)
-
-    from app.admin import bp as admin_bp  # Admin Blueprint'ini import et
-    app.register_blueprint(admin_bp)  # Admin Blueprint'ini kaydet (url_prefix='/admin' __init__.py'sinde)
+    from app import replica, async_db, cdc, admission
+    replica.init_app(app)
+    admission.init_app(app)
+    async_db.init_app(app)
+    cdc.init_app(app)
+
+    for name, url_prefix, needed_by in BLUEPRINTS:
+        if set(needed_by) & set(components):
+            # url_prefix None ise blueprint'in kendi url_prefix'i kullanılır
+            app.register_blueprint(import_module(f'app.{name}').bp, url_prefix=url_prefix)
+    if 'web' not in components:
+        app.url_build_error_handlers.append(_unloaded_blueprint_url)
+    if 'web' in components and app.config.get('ASYNC_REPORTS'):
+        # Rapor view'larını async engine kullanan sürümleriyle değiştir (app/main/async_reports.py)
+        from app.main.async_reports import install_async_reports
+        install_async_reports(app)
 
     with app.app_context():
-        from . import models
-
-    @app.context_processor
-    def utility_processor():
-        def get_cart_item_count():
-            cart = session.get('cart', {})
-            return len(cart) if cart is not None else 0
-
-        return {
-            'current_year': datetime.utcnow().year,
-            'cart_item_count': get_cart_item_count()
-        }
-
-    return app
\ No newline at end of file
+        from . import models, ledger, allocation, lookups, product_cache
+    if 'web' in components:
+        # Canlı panel yayıncısı (SSE); iş parçacığı ilk abonede başlar
+        from app import live
+        live.init_app(app)
+
+    if 'cli' in components:
+        # Flask-Migrate alembic'i yükler; yalnızca `flask db` komutları için gerekli
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+        from app.commands import stock_cli, replica_cli, boot_cli, cdc_cli
+        app.cli.add_command(stock_cli)
+        app.cli.add_command(replica_cli)
+        app.cli.add_command(boot_cli)
+        app.cli.add_command(cdc_cli)
+
+    if {'web', 'api'} & set(components):
+        @app.context_processor
+        def utility_processor():
+            def get_cart_item_count():
+                cart = session.get('cart', {})
+                return len(cart) if cart is not None else 0
+
+            return {
+                'current_year': datetime.utcnow().year,
+                'cart_item_count': get_cart_item_count()
+            }
+
+    return app
@@ -1,11 +1,16 @@
 # app/admin/routes.py
-from flask import render_template, redirect, url_for, flash, request, abort
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify, current_app
 from flask_login import login_required, current_user
+from sqlalchemy import select
 from app import db
 from app.admin import bp
-from app.models import User
+from app.models import User, ArchivedOrder
 from app.forms import AdminUserForm, EmptyForm, USER_ROLE_CHOICES  # USER_ROLE_CHOICES'ı da import edebiliriz
 from app.decorators import admin_required
+from app.concurrency import conflict_metrics
+from app.query_pool import query_pool_metrics
+from app.scan import scan_cache
+from app.product_cache import product_cache
 from wtforms.validators import DataRequired  # add_user'da şifre için dinamik olarak eklenecek
 
 
@@ -123,7 +128,9 @@ def delete_user(user_id):
         flash("The primary admin account cannot be deleted.", "danger")
         return redirect(url_for('admin.list_users'))
 
-    if user_to_delete.orders_placed.first():
+    # Arşivlenmiş siparişler de kullanıcıya bağlıdır (app/archive.py)
+    if user_to_delete.orders_placed.first() or db.session.scalar(
+            select(ArchivedOrder.id).where(ArchivedOrder.user_id == user_to_delete.id).limit(1)):
         flash(
             f"User '{user_to_delete.username}' has existing orders and cannot be deleted. Consider deactivating the user instead.",
             "warning")
@@ -136,4 +143,20 @@ def delete_user(user_id):
         db.session.delete(user_to_delete)
         db.session.commit()
         flash(f'User "{username_deleted}" has been deleted.', 'success')
-    return redirect(url_for('admin.list_users'))
\ No newline at end of file
+    return redirect(url_for('admin.list_users'))
+
+
+@bp.route('/metrics')
+@login_required
+@admin_required
+def metrics():
+    return jsonify({
+        'stock_conflicts': conflict_metrics.snapshot(),
+        'read_replica': current_app.extensions['replica_router'].snapshot(),
+        'dashboard_queries': query_pool_metrics.snapshot(),
+        'admission': current_app.extensions['admission'].snapshot(),
+        'scan_cache': scan_cache.snapshot(),
+        'product_cache': product_cache.snapshot(),
+        'cdc': current_app.extensions['cdc'].snapshot() if 'cdc' in current_app.extensions else {'enabled': False},
+        'live_dashboard': current_app.extensions['live'].snapshot() if 'live' in current_app.extensions else {},
+    })
@@ -0,0 +1,204 @@
+# app/admission.py
+# Ağır uç noktalar için kabul denetimi (admission control).
+#
+# Her uç nokta sınıfının (raporlar, sipariş tamamlama, toplu JSON API'leri) aynı anda çalışan istek
+# sayısı ADMISSION_CONCURRENCY ile sınırlanır. Yuva bekleyen istekler ADMISSION_QUEUE_TIMEOUT kadar
+# bekler; kuyruk ADMISSION_MAX_QUEUE'yu aşarsa ya da süre dolarsa istek hemen 503 ile reddedilir.
+# Böylece tek bir kullanıcının ağır raporları bağlantı havuzunu herkes için tüketemez.
+#
+# Ayrıca her kullanıcının her sınıf için bir jeton kovası (token bucket) vardır: istek, maliyeti
+# (ör. recent_orders'ta bakılan gün sayısıyla artar) kadar jeton harcar; kova boşsa 429 döner.
+# Sınırlar ve sayaçlar işçi süreci başınadır (gunicorn'da toplam sınır = işçi sayısı x sınır).
+import math
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app, request, jsonify, make_response
+from flask_login import current_user
+
+CLASS_REPORTS = 'reports'
+CLASS_CHECKOUT = 'checkout'
+CLASS_BULK = 'bulk'
+
+DEFAULTS = {
+    'ADMISSION_CONCURRENCY': {CLASS_REPORTS: 4, CLASS_CHECKOUT: 8, CLASS_BULK: 2},
+    'ADMISSION_MAX_QUEUE': 16,
+    'ADMISSION_QUEUE_TIMEOUT': 0.5,
+    'RATE_LIMITS': {CLASS_REPORTS: (30, 0.5), CLASS_CHECKOUT: (10, 0.2), CLASS_BULK: (5, 0.05)},
+}
+
+# Kova sayısı bunu aşınca dolmuş (kullanılmayan) kovalar atılır
+_MAX_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Slots:
+    """Counting gate with a bounded wait queue for one endpoint class."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+
+
+class AdmissionController:
+    """Per-app concurrency gates and per-user token buckets, with counters for /admin/metrics."""
+
+    def __init__(self, app):
+        concurrency = app.config.get('ADMISSION_CONCURRENCY', DEFAULTS['ADMISSION_CONCURRENCY'])
+        self.max_queue = app.config.get('ADMISSION_MAX_QUEUE', DEFAULTS['ADMISSION_MAX_QUEUE'])
+        self.queue_timeout = app.config.get('ADMISSION_QUEUE_TIMEOUT', DEFAULTS['ADMISSION_QUEUE_TIMEOUT'])
+        self.rate_limits = dict(app.config.get('RATE_LIMITS', DEFAULTS['RATE_LIMITS']))
+        self._slots = {name: _Slots(limit) for name, limit in concurrency.items()}
+        self._lock = threading.Lock()
+        self._buckets = {}  # (sınıf, kullanıcı) -> [jeton, son güncelleme]
+        self._counters = defaultdict(lambda: {'admitted': 0, 'queued': 0, 'rate_limited': 0,
+                                              'rejected_queue_full': 0, 'rejected_timeout': 0,
+                                              'max_queue_depth': 0, 'wait_seconds': 0.0})
+
+    # --- Jeton kovası ---------------------------------------------------------------------------
+
+    def take_tokens(self, endpoint_class, user_key, cost):
+        """Takes cost tokens from the user's bucket; raises AdmissionRejected(429) when it runs dry."""
+        limit = self.rate_limits.get(endpoint_class)
+        if limit is None or cost <= 0:
+            return
+        capacity, refill_rate = limit
+        cost = min(cost, capacity)  # kapasiteden pahalı istek hiç geçemez olmasın
+        now = time.monotonic()
+        key = (endpoint_class, user_key)
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                self._counters[endpoint_class]['rate_limited'] += 1
+                retry_after = (cost - tokens) / refill_rate if refill_rate else 60
+                raise AdmissionRejected(429, f'Rate limit for {endpoint_class} exceeded.', retry_after)
+            self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > _MAX_BUCKETS:
+                self._prune(now)
+
+    def _prune(self, now):
+        for key, (tokens, updated) in list(self._buckets.items()):
+            capacity, refill_rate = self.rate_limits[key[0]]
+            if tokens + (now - updated) * refill_rate >= capacity:
+                del self._buckets[key]
+
+    # --- Eşzamanlılık kapısı -------------------------------------------------------------------
+
+    def enter(self, endpoint_class):
+        """Waits for a free slot (at most queue_timeout); raises AdmissionRejected(503) otherwise."""
+        slots = self._slots.get(endpoint_class)
+        if slots is None:
+            return
+        counters = self._counters[endpoint_class]
+        with slots.condition:
+            if slots.in_flight < slots.limit and not slots.waiting:
+                slots.in_flight += 1
+                with self._lock:
+                    counters['admitted'] += 1
+                return
+            if slots.waiting >= self.max_queue:
+                with self._lock:
+                    counters['rejected_queue_full'] += 1
+                raise AdmissionRejected(503, f'Too many {endpoint_class} requests are queued.', 1)
+            slots.waiting += 1
+            with self._lock:
+                counters['queued'] += 1
+                counters['max_queue_depth'] = max(counters['max_queue_depth'], slots.waiting)
+            started = time.monotonic()
+            try:
+                admitted = slots.condition.wait_for(lambda: slots.in_flight < slots.limit, self.queue_timeout)
+                if admitted:
+                    slots.in_flight += 1
+            finally:
+                slots.waiting -= 1
+            with self._lock:
+                counters['wait_seconds'] += time.monotonic() - started
+                counters['admitted' if admitted else 'rejected_timeout'] += 1
+        if not admitted:
+            raise AdmissionRejected(503, f'The server is busy with other {endpoint_class} requests.',
+                                    max(1, self.queue_timeout))
+
+    def leave(self, endpoint_class):
+        slots = self._slots.get(endpoint_class)
+        if slots is None:
+            return
+        with slots.condition:
+            slots.in_flight -= 1
+            slots.condition.notify()
+
+    def snapshot(self):
+        data = {}
+        for name in sorted(set(self._slots) | set(self.rate_limits) | set(self._counters)):
+            slots = self._slots.get(name)
+            with self._lock:
+                counters = dict(self._counters.get(name) or self._counters.default_factory())
+            counters['wait_seconds'] = round(counters['wait_seconds'], 3)
+            counters.update({
+                'concurrency_limit': slots.limit if slots else None,
+                'in_flight': slots.in_flight if slots else 0,
+                'queue_depth': slots.waiting if slots else 0,
+                'rate_limit': dict(zip(('burst', 'per_second'), self.rate_limits[name]))
+                if name in self.rate_limits else None,
+            })
+            data[name] = counters
+        with self._lock:
+            data['tracked_buckets'] = len(self._buckets)
+        return data
+
+
+def init_app(app):
+    app.extensions['admission'] = AdmissionController(app)
+
+
+def _user_key():
+    if current_user.is_authenticated:
+        return f'user:{current_user.get_id()}'
+    return f'ip:{request.remote_addr}'
+
+
+def _rejection_response(error):
+    retry_after = str(max(1, math.ceil(error.retry_after)))
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        response = make_response(jsonify({'error': error.reason, 'retry_after': int(retry_after)}), error.status)
+    else:
+        response = make_response(f'{error.reason} Please try again in {retry_after} seconds.', error.status)
+        response.mimetype = 'text/plain'
+    response.headers['Retry-After'] = retry_after
+    return response
+
+
+def admit(cost, view, args, kwargs):
+    """
+    Runs view(*args, **kwargs) under admission control. cost is an endpoint class name, or a
+    (class, weight) tuple where weight is a number or a callable evaluated in the request.
+    A weight of 0 skips admission (e.g. the GET of a form whose POST is the heavy part).
+    """
+    endpoint_class, weight = (cost, 1) if isinstance(cost, str) else cost
+    weight = weight() if callable(weight) else weight
+    controller = current_app.extensions.get('admission')
+    if controller is None or not weight:
+        return view(*args, **kwargs)
+    try:
+        controller.take_tokens(endpoint_class, _user_key(), weight)
+        controller.enter(endpoint_class)
+    except AdmissionRejected as e:
+        current_app.logger.info(f'{request.path} rejected with {e.status}: {e.reason}')
+        return _rejection_response(e)
+    try:
+        return view(*args, **kwargs)
+    finally:
+        controller.leave(endpoint_class)
@@ -0,0 +1,281 @@
+# app/allocation.py
+# Çok depolu stok (warehouse_stock) ve sipariş satırları için kaynak depo seçimi.
+#
+# Dağıtım motoru bir "dalga" (wave) siparişin ürünlerine ait stok matrisini tek seferde yükler
+# (ürün x depo, NumPy) ve siparişleri sırayla işler:
+#   1) Siparişin tüm satırlarını tek başına karşılayabilen depolar vektörel olarak bulunur;
+#      bunlardan doluluk oranı (doluluk / kapasite) en yüksek olan seçilir, böylece dolu depolar
+#      önce boşaltılır.
+#   2) Tek depo yoksa her satır, stoğu en fazla olan depodan başlayarak (eşitlikte doluluk oranı
+#      yüksek olan önce) bölünerek karşılanır.
+# Depolara atanmamış stok (Product.quantity_in_stock - depo satırları toplamı) ayrı bir "unassigned"
+# sütunu olarak en son tercih edilir; eski veriler bu sayede warehouse_stock dolmadan da çalışır.
+#
+# NumPy yalnızca dağıtım yapılırken yüklenir: bu modül stok dinleyicileri için her bileşende
+# (cli, worker, api) import edilir ve kısa ömürlü süreçler NumPy'nin açılış maliyetini ödemez.
+from collections import defaultdict
+
+from sqlalchemy import event, select, update, insert, func, bindparam, exists, inspect
+
+from app import db
+from app.models import Product, WarehouseLocation, WarehouseStock
+from app.ledger import attribute_change, stock_accounted_ids, note_home_move
+from app.utils import chunked
+from app.concurrency import matched_rows
+
+UNASSIGNED = None  # depoya atanmamış stok sütununun warehouse_id karşılığı
+
+
+class AllocationError(Exception):
+    """Raised when allocated warehouse stock is no longer available at write time."""
+
+
+class StockMatrix:
+    """Dense product x warehouse stock matrix for one allocation wave; the last column is unassigned stock."""
+
+    def __init__(self, product_ids, warehouse_ids, stock, capacity, occupancy):
+        self.product_ids = product_ids
+        self.product_index = {product_id: row for row, product_id in enumerate(product_ids)}
+        self.warehouse_ids = warehouse_ids
+        self.stock = stock
+        self.capacity = capacity
+        self.occupancy = occupancy
+
+    def utilization(self):
+        import numpy as np
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(self.capacity > 0, self.occupancy / self.capacity, 0.0)
+        ratio[-1] = -1.0  # atanmamış stok her zaman en son tercih
+        return ratio
+
+
+def load_stock_matrix(product_ids):
+    import numpy as np
+    product_ids = sorted(set(product_ids))
+    totals = {}
+    located = []
+    for chunk in chunked(product_ids):
+        totals.update(db.session.execute(
+            select(Product.id, Product.quantity_in_stock).where(Product.id.in_(chunk))
+        ).all())
+        located.extend(db.session.execute(
+            select(WarehouseStock.product_id, WarehouseStock.warehouse_id, WarehouseStock.quantity)
+            .where(WarehouseStock.product_id.in_(chunk), WarehouseStock.quantity > 0)
+        ).all())
+    warehouses = db.session.execute(
+        select(WarehouseLocation.id, WarehouseLocation.capacity).order_by(WarehouseLocation.id)
+    ).all()
+    occupancy = dict(db.session.execute(
+        select(WarehouseStock.warehouse_id, func.sum(WarehouseStock.quantity)).group_by(WarehouseStock.warehouse_id)
+    ).all())
+
+    warehouse_ids = [w.id for w in warehouses] + [UNASSIGNED]
+    warehouse_index = {warehouse_id: column for column, warehouse_id in enumerate(warehouse_ids)}
+    product_index = {product_id: row for row, product_id in enumerate(product_ids)}
+
+    stock = np.zeros((len(product_ids), len(warehouse_ids)), dtype=np.int64)
+    if located:
+        rows = np.fromiter((product_index[r.product_id] for r in located), dtype=np.intp, count=len(located))
+        columns = np.fromiter((warehouse_index[r.warehouse_id] for r in located), dtype=np.intp, count=len(located))
+        quantities = np.fromiter((r.quantity for r in located), dtype=np.int64, count=len(located))
+        np.add.at(stock, (rows, columns), quantities)
+    total = np.fromiter((totals.get(product_id) or 0 for product_id in product_ids), dtype=np.int64,
+                        count=len(product_ids))
+    stock[:, -1] = np.maximum(total - stock[:, :-1].sum(axis=1), 0)
+
+    capacity = np.array([w.capacity or 0 for w in warehouses] + [0], dtype=np.float64)
+    occupancy = np.array([occupancy.get(w.id) or 0 for w in warehouses] + [0], dtype=np.float64)
+    return StockMatrix(product_ids, warehouse_ids, stock, capacity, occupancy)
+
+
+class Allocator:
+    """Allocates orders one after another against a StockMatrix, consuming its stock as it goes."""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self._utilization = matrix.utilization()
+
+    def allocate(self, lines):
+        """
+        lines: {product_id: quantity}. Returns [(product_id, warehouse_id, quantity), ...] with
+        warehouse_id None for unassigned stock, or None when the order cannot be filled.
+        """
+        import numpy as np
+        matrix = self.matrix
+        if not lines:
+            return None
+        product_ids = list(lines)
+        if any(product_id not in matrix.product_index for product_id in product_ids):
+            return None
+        rows = np.fromiter((matrix.product_index[p] for p in product_ids), dtype=np.intp, count=len(product_ids))
+        need = np.fromiter((lines[p] for p in product_ids), dtype=np.int64, count=len(product_ids))
+        block = matrix.stock[rows]
+
+        feasible = (block >= need[:, None]).all(axis=0)
+        take = np.zeros_like(block)
+        if feasible.any():
+            column = int(np.argmax(np.where(feasible, self._utilization, -np.inf)))
+            take[:, column] = need
+        else:
+            if (block.sum(axis=1) < need).any():
+                return None
+            # Satır başına depolar: stok azalan, eşitlikte doluluk oranı azalan sırada
+            order = np.lexsort((-np.broadcast_to(self._utilization, block.shape), -block), axis=-1)
+            sorted_stock = np.take_along_axis(block, order, axis=1)
+            taken_before = np.cumsum(sorted_stock, axis=1) - sorted_stock
+            sorted_take = np.clip(need[:, None] - taken_before, 0, sorted_stock)
+            np.put_along_axis(take, order, sorted_take, axis=1)
+
+        matrix.stock[rows] -= take
+        matrix.occupancy -= take.sum(axis=0)
+        self._utilization = matrix.utilization()
+        line_index, column_index = np.nonzero(take)
+        return [(product_ids[i], matrix.warehouse_ids[j], int(take[i, j])) for i, j in zip(line_index, column_index)]
+
+
+def allocate_wave(orders):
+    """Allocates a list of {product_id: quantity} orders in sequence; returns one plan (or None) per order."""
+    orders = list(orders)
+    allocator = Allocator(load_stock_matrix({product_id for lines in orders for product_id in lines}))
+    return [allocator.allocate(lines) for lines in orders]
+
+
+def split_allocations(lines, plan):
+    """
+    Distributes an order plan over its order lines (an order may list the same product twice).
+    lines: [(product_id, quantity), ...]; returns a list of [(warehouse_id, quantity), ...] per line.
+    """
+    remaining = defaultdict(list)
+    for product_id, warehouse_id, quantity in plan:
+        remaining[product_id].append([warehouse_id, quantity])
+    result = []
+    for product_id, quantity in lines:
+        pieces = []
+        sources = remaining[product_id]
+        while quantity > 0 and sources:
+            take = min(quantity, sources[0][1])
+            pieces.append((sources[0][0], take))
+            quantity -= take
+            sources[0][1] -= take
+            if sources[0][1] == 0:
+                sources.pop(0)
+        result.append(pieces)
+    return result
+
+
+def _aggregate_located(allocations):
+    totals = defaultdict(int)
+    for product_id, warehouse_id, quantity in allocations:
+        if warehouse_id is not UNASSIGNED:
+            totals[(product_id, warehouse_id)] += quantity
+    return totals
+
+
+def apply_allocations(allocations):
+    """
+    Decrements warehouse_stock for the located part of the given allocations with one guarded
+    UPDATE per product/warehouse (executemany where the driver counts it). Product totals are the
+    caller's job.
+    """
+    totals = _aggregate_located(allocations)
+    if not totals:
+        return
+    table = WarehouseStock.__table__
+    matched = matched_rows(
+        update(table)
+        .where(table.c.product_id == bindparam('b_product_id'), table.c.warehouse_id == bindparam('b_warehouse_id'),
+               table.c.quantity >= bindparam('b_quantity'))
+        .values(quantity=table.c.quantity - bindparam('b_quantity')),
+        [{'b_product_id': p, 'b_warehouse_id': w, 'b_quantity': q} for (p, w), q in totals.items()]
+    )
+    if matched < len(totals):
+        raise AllocationError('Warehouse stock changed while the order was being allocated.')
+
+
+def restore_allocations(allocations):
+    """Adds the located part of the given allocations back to warehouse_stock (cancellations, returns)."""
+    totals = _aggregate_located(allocations)
+    if not totals:
+        return
+    table = WarehouseStock.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.product_id == bindparam('b_product_id'), table.c.warehouse_id == bindparam('b_warehouse_id'))
+        .values(quantity=table.c.quantity + bindparam('b_quantity')),
+        [{'b_product_id': p, 'b_warehouse_id': w, 'b_quantity': q} for (p, w), q in totals.items()]
+    )
+
+
+def initialize_warehouse_stock():
+    """Creates a home-warehouse stock row for every product that has a warehouse but no stock rows yet."""
+    has_rows = exists().where(WarehouseStock.product_id == Product.id)
+    result = db.session.execute(
+        insert(WarehouseStock).from_select(
+            ['product_id', 'warehouse_id', 'quantity'],
+            select(Product.id, Product.warehouse_id, Product.quantity_in_stock)
+            .where(Product.warehouse_id.isnot(None), ~has_rows)
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _home_row(session, rows, warehouse_id, product):
+    for row in rows:
+        if row.warehouse_id == warehouse_id:
+            return row
+    row = WarehouseStock(product=product, warehouse_id=warehouse_id, quantity=0)
+    session.add(row)
+    rows.append(row)
+    return row
+
+
+@event.listens_for(db.session, 'before_flush')
+def _sync_home_warehouse_stock(session, flush_context, instances):
+    # Dağıtım motorundan geçmeyen ORM stok değişiklikleri (ürün ekleme/düzenleme, seed script)
+    # ürünün ana deposuna (Product.warehouse_id) yansıtılır. Defterle aynı sırada: önce miktar
+    # değişikliği eski ana depoda uygulanır, sonra ana depo değiştiyse eski ana depo satırı (ana
+    # depo yoksa atanmamış stok) yeni ana depoya taşınır; taşınan miktar deftere bildirilir.
+    accounted = stock_accounted_ids(session)
+    for product in list(session.new):
+        if isinstance(product, Product) and product.quantity_in_stock and product.warehouse_id:
+            session.add(WarehouseStock(product=product, warehouse_id=product.warehouse_id,
+                                       quantity=product.quantity_in_stock))
+
+    for product in list(session.dirty):
+        if not isinstance(product, Product) or product.id in accounted:
+            continue
+        state = inspect(product)
+        stock_change = attribute_change(state, 'quantity_in_stock')
+        warehouse_change = attribute_change(state, 'warehouse_id')
+        if not stock_change and not warehouse_change:
+            continue
+        with session.no_autoflush:
+            rows = WarehouseStock.query.filter_by(product_id=product.id).all()
+        old_home = warehouse_change[0] if warehouse_change else product.warehouse_id
+        if stock_change:
+            old_total, new_total = (stock_change[0] or 0), (stock_change[1] or 0)
+            delta = new_total - old_total
+            if delta > 0 and old_home:
+                _home_row(session, rows, old_home, product).quantity += delta
+            elif delta < 0:
+                # Önce atanmamış stoktan, sonra ana depodan, sonra en dolu diğer depolardan düşülür
+                shortfall = -delta - max(old_total - sum(row.quantity for row in rows), 0)
+                ordered = sorted(rows, key=lambda row: (row.warehouse_id != old_home, -row.quantity))
+                for row in ordered:
+                    if shortfall <= 0:
+                        break
+                    take = min(row.quantity, shortfall)
+                    row.quantity -= take
+                    shortfall -= take
+        if warehouse_change:
+            new_home = warehouse_change[1]
+            if old_home:
+                source, moved = next((row for row in rows if row.warehouse_id == old_home), None), 0
+                if source is not None:
+                    moved, source.quantity = source.quantity, 0  # yeni ana depo yoksa stok atanmamış olur
+            else:
+                moved = max((product.quantity_in_stock or 0) - sum(row.quantity for row in rows), 0)
+            if new_home and moved:
+                _home_row(session, rows, new_home, product).quantity += moved
+            note_home_move(session, product.id, moved)
@@ -0,0 +1,168 @@
+# app/archive.py
+# Sıcak/soğuk sipariş ayrımı: kapanmış eski siparişlerin arşiv tablolarına taşınması.
+#
+# orders ve order_items sürekli büyüyor, sipariş listesi ve panel sorguları tüm geçmişi tarıyordu.
+# archive_orders() (`flask orders archive`, cron'dan), ARCHIVE_AFTER_DAYS'ten eski Delivered /
+# Cancelled / Returned siparişleri kalemleri ve depo dağılımlarıyla birlikte archived_* tablolarına
+# taşır:
+# - Taşıma ARCHIVE_BATCH_SIZE siparişlik parçalar halinde yapılır; her parça kendi transaction'ında
+#   INSERT ... SELECT ile kopyalanıp sıcak tablolardan silinir. Kesilen bir çalışma yalnızca tam
+#   parçalar taşımış olur; sonraki çalışma kalan siparişlerden devam eder.
+# - Siparişler durumlarıyla birlikte koşullu silinir (WHERE id = ? AND status = ?). Kopyalama
+#   sırasında durumu değişen (ör. Delivered -> Returned) bir sipariş varsa parça geri alınır ve
+#   taze verilerle yeniden denenir; arşiv her zaman silinen satırın son halini tutar.
+# - CDC tüketicileri arşivlenen sipariş ve kalemleri silme olarak görür.
+#
+# Sipariş listesi, paneller, canlı panel ve ödeme yalnızca sıcak tabloları okur. Geçmişe bakan
+# raporlar (son siparişler, en kârlı ürünler, talep geçmişi, ABC/XYZ) order_history() ve
+# order_item_history() birleşimlerini okur; tarih/durum filtreleri her iki tarafın içine uygulanır.
+# Panellerin son 30 günü eksiksiz kalsın diye MIN_ARCHIVE_DAYS'ten yeni siparişler arşivlenmez.
+# Arşivlenen Delivered siparişler artık Returned yapılamaz; ARCHIVE_AFTER_DAYS iade süresinden
+# uzun tutulmalıdır.
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, insert, delete, literal, union_all, bindparam
+
+from app import db
+from app.models import Order, OrderItem, OrderItemAllocation, ArchivedOrder, ArchivedOrderItem, \
+    ArchivedOrderItemAllocation
+from app.cdc import record_changes, OP_DELETE
+from app.concurrency import run_with_retry, matched_rows
+
+DEFAULTS = {
+    'ARCHIVE_AFTER_DAYS': 180,
+    'ARCHIVE_BATCH_SIZE': 500,
+}
+
+ARCHIVABLE_STATUSES = ('Delivered', 'Cancelled', 'Returned')
+MIN_ARCHIVE_DAYS = 31
+
+ORDER_COLUMNS = ('id', 'order_number', 'order_date', 'status', 'total_amount', 'notes', 'created_at', 'updated_at',
+                 'user_id', 'wave_id')
+ITEM_COLUMNS = ('id', 'quantity', 'price_at_order', 'order_id', 'product_id')
+ALLOCATION_COLUMNS = ('id', 'order_item_id', 'warehouse_id', 'quantity')
+
+
+class ArchiveError(Exception):
+    """Raised for invalid archive runs (e.g. an age that would empty the dashboards)."""
+
+
+class ArchiveConflict(Exception):
+    """Raised when an order in the batch changed between copying and deleting it; the batch is retried."""
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+def _lazy_ids(query):
+    # record_changes satırları yalnızca CDC açıkken tüketir; sorgu da ancak o zaman çalışır
+    yield from ({'id': row_id} for row_id in db.session.execute(query).scalars())
+
+
+def _copy(source, target, columns, where, extra=None):
+    names = [*columns, *(extra or {})]
+    values = [source.c[name] for name in columns] + [literal(value) for value in (extra or {}).values()]
+    return db.session.execute(insert(target).from_select(names, select(*values).where(where))).rowcount
+
+
+def _archive_batch(cutoff, after_id, batch_size, now):
+    orders, items, allocations = Order.__table__, OrderItem.__table__, OrderItemAllocation.__table__
+    batch = db.session.execute(
+        select(orders.c.id, orders.c.status)
+        .where(orders.c.status.in_(ARCHIVABLE_STATUSES), orders.c.order_date < cutoff, orders.c.id > after_id)
+        .order_by(orders.c.id).limit(batch_size)).all()
+    if not batch:
+        return None
+    order_ids = [row.id for row in batch]
+    item_ids = select(items.c.id).where(items.c.order_id.in_(order_ids))
+
+    _copy(orders, ArchivedOrder.__table__, ORDER_COLUMNS, orders.c.id.in_(order_ids), {'archived_at': now})
+    moved_items = _copy(items, ArchivedOrderItem.__table__, ITEM_COLUMNS, items.c.order_id.in_(order_ids))
+    _copy(allocations, ArchivedOrderItemAllocation.__table__, ALLOCATION_COLUMNS,
+          allocations.c.order_item_id.in_(item_ids))
+
+    record_changes('order_items', OP_DELETE, _lazy_ids(item_ids))
+    db.session.execute(delete(allocations).where(allocations.c.order_item_id.in_(item_ids)))
+    db.session.execute(delete(items).where(items.c.order_id.in_(order_ids)))
+    matched = matched_rows(
+        delete(orders).where(orders.c.id == bindparam('b_id'), orders.c.status == bindparam('b_status')),
+        [{'b_id': row.id, 'b_status': row.status} for row in batch])
+    if matched < len(batch):
+        raise ArchiveConflict()
+    record_changes('orders', OP_DELETE, [{'id': order_id} for order_id in order_ids])
+    db.session.commit()
+    return order_ids[-1], len(order_ids), moved_items
+
+
+def archive_orders(days=None, batch_size=None, max_batches=None, now=None):
+    """
+    Moves Delivered/Cancelled/Returned orders older than `days` (default ARCHIVE_AFTER_DAYS) to the
+    archive tables, one committed batch at a time. Returns {'orders', 'items', 'batches', 'cutoff',
+    'done', 'seconds'}; done is False when max_batches stopped the run early.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    days = _setting('ARCHIVE_AFTER_DAYS') if days is None else days
+    if days < MIN_ARCHIVE_DAYS:
+        raise ArchiveError(f'Orders younger than {MIN_ARCHIVE_DAYS} days are not archived; '
+                           f'dashboards read only the hot tables.')
+    cutoff = now - timedelta(days=days)
+    batch_size = batch_size or _setting('ARCHIVE_BATCH_SIZE')
+    summary = {'orders': 0, 'items': 0, 'batches': 0, 'cutoff': cutoff.isoformat(), 'done': False}
+    after_id = 0
+    while max_batches is None or summary['batches'] < max_batches:
+        moved = run_with_retry('archive_orders', lambda: _archive_batch(cutoff, after_id, batch_size, now),
+                               retry_on=(ArchiveConflict,))
+        if moved is None:
+            summary['done'] = True
+            break
+        after_id, orders, items = moved
+        summary['orders'] += orders
+        summary['items'] += items
+        summary['batches'] += 1
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+# --- Geçmiş raporları için birleşimler --------------------------------------------------------
+
+def _order_filters(table, start, end, exclude_statuses):
+    filters = []
+    if start is not None:
+        filters.append(table.c.order_date >= start)
+    if end is not None:
+        filters.append(table.c.order_date <= end)
+    if exclude_statuses:
+        filters.append(table.c.status.notin_(exclude_statuses))
+    return filters
+
+
+def order_history(start=None, end=None, exclude_statuses=()):
+    """
+    Subquery over hot and archived orders: id, order_number, order_date, status, total_amount,
+    user_id, archived. The filters are applied inside both branches so each uses its own indexes.
+    """
+    branches = []
+    for table, archived in ((Order.__table__, False), (ArchivedOrder.__table__, True)):
+        branches.append(select(table.c.id, table.c.order_number, table.c.order_date, table.c.status,
+                               table.c.total_amount, table.c.user_id, literal(archived).label('archived'))
+                        .where(*_order_filters(table, start, end, exclude_statuses)))
+    return union_all(*branches).subquery('order_history')
+
+
+def order_item_history(start=None, end=None, exclude_statuses=()):
+    """
+    Subquery over hot and archived order lines joined to their orders: order_id, product_id,
+    quantity, price_at_order, order_date, status. Filters are applied inside both branches.
+    """
+    branches = []
+    for orders, items in ((Order.__table__, OrderItem.__table__),
+                          (ArchivedOrder.__table__, ArchivedOrderItem.__table__)):
+        branches.append(select(items.c.order_id, items.c.product_id, items.c.quantity, items.c.price_at_order,
+                               orders.c.order_date, orders.c.status)
+                        .join(orders, items.c.order_id == orders.c.id)
+                        .where(*_order_filters(orders, start, end, exclude_statuses)))
+    return union_all(*branches).subquery('order_item_history')
@@ -0,0 +1,77 @@
+# app/async_db.py
+# Asenkron rapor view'ları (ASYNC_REPORTS) için async SQLAlchemy engine'i.
+#
+# Birincil (ve varsa replika) bağlantı dizesi async sürücüye çevrilir: yerelde sqlite+aiosqlite,
+# MS SQL Server için mssql+aioodbc. Flask her async view'ı kendi olay döngüsünde çalıştırdığından
+# bağlantılar istekler arasında paylaşılamaz; engine bu yüzden NullPool ile kurulur.
+# fetch_concurrently() bir view'daki birbirinden bağımsız sorguları ayrı bağlantılarda aynı anda
+# çalıştırır; toplam süre en yavaş sorguya yaklaşır.
+import asyncio
+import threading
+from inspect import isclass
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app.replica import current_async_bind
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'mssql': 'mssql+aioodbc',
+    'mysql': 'mysql+aiomysql',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    """Maps a sync database URL to its async driver (e.g. mssql+pyodbc -> mssql+aioodbc)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for '{backend}' databases.")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """Lazily created async engines for the default bind and SQLALCHEMY_BINDS entries."""
+
+    def __init__(self, app):
+        self._urls = {None: app.config['SQLALCHEMY_DATABASE_URI'], **(app.config.get('SQLALCHEMY_BINDS') or {})}
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def engine(self, bind_key=None):
+        with self._lock:
+            if bind_key not in self._engines:
+                from sqlalchemy.ext.asyncio import create_async_engine
+                self._engines[bind_key] = create_async_engine(async_url(self._urls[bind_key]), poolclass=NullPool)
+            return self._engines[bind_key]
+
+
+def init_app(app):
+    app.extensions['async_db'] = AsyncDatabase(app)
+
+
+def _returns_entities(statement):
+    columns = statement.column_descriptions
+    return len(columns) == 1 and isclass(columns[0]['expr'])
+
+
+async def fetch_concurrently(**statements):
+    """
+    Runs each statement on its own connection, concurrently, and returns {name: results}.
+    select(Model) statements return model instances (eager-load what templates use; lazy loads
+    are not possible afterwards), other selects return rows. Follows @read_replica routing.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    engine = current_app.extensions['async_db'].engine(current_async_bind())
+
+    async def run(statement):
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            result = await session.execute(statement)
+            return result.scalars().all() if _returns_entities(statement) else result.all()
+
+    names = list(statements)
+    results = await asyncio.gather(*(run(statements[name]) for name in names))
+    return dict(zip(names, results))
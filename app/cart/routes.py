@@ -1,15 +1,15 @@
 # app/cart/routes.py
 from flask import render_template, redirect, url_for, flash, request, session, abort
 from flask_login import login_required
-from app import db
 from app.cart import bp
-from app.models import Product
+from app.product_cache import get_product
 
 
 @bp.route('/add/<int:product_id>', methods=['POST'])
 @login_required
 def add_to_cart(product_id):
-    product = db.session.get(Product, product_id) or abort(404)
+    # Önbellekteki özet yeterli: stok burada yalnızca ön kontrol, sipariş oluşturulurken yeniden doğrulanır
+    product = get_product(product_id) or abort(404)
     quantity = int(request.form.get('quantity', 1))  # Formdan miktar al, varsayılan 1
 
     if quantity <= 0:
@@ -81,7 +81,7 @@ def update_cart_item(product_id):
     quantity = int(request.form.get('quantity', 0))
 
     if str_product_id in cart:
-        product = db.session.get(Product, int(product_id))  # Stok kontrolü için
+        product = get_product(int(product_id))  # Stok ön kontrolü için (önbellekten)
         if quantity > 0:
             if product and product.quantity_in_stock >= quantity:
                 cart[str_product_id]['quantity'] = quantity
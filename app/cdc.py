@@ -0,0 +1,345 @@
+# app/cdc.py
+# Değişiklik akışı (change data capture): arama indeksi, BI ve önbellekler tabloları yeniden
+# okumak yerine yalnızca değişen satırları okur.
+#
+# - ORM ile yapılan INSERT/UPDATE/DELETE'ler after_flush olayında toplanır; aynı transaction'daki
+#   bir satırın değişiklikleri tek olayda birleştirilir. Core ile toplu yazan kod (toplu sipariş
+#   alımı, durum geçişleri...) değişiklikleri record_changes() ile kendisi bildirir.
+# - Olaylar yalnızca commit'ten sonra (after_commit) yazıcı kuyruğuna verilir; geri alınan
+#   transaction'ların olayları atılır.
+# - Arka plandaki yazıcı iş parçacığı kuyruktakileri toplar, tek seferde yazar ve grup başına tek
+#   fsync yapar. Dosyalar CDC_DIR altında sıra numaralı NDJSON segmentleridir (00000001.ndjson...);
+#   segment CDC_SEGMENT_BYTES'ı aşınca yenisine geçilir. Birden çok süreç (gunicorn işçileri) aynı
+#   dizine dosya kilidiyle ekler.
+# - Okuyucu "segment:bayt" biçimindeki bir imleçten devam eder; maliyet tablo boyutuna değil,
+#   imleçten sonraki değişiklik sayısına bağlıdır.
+#
+# Olaylar commit'ten sonra bellekte sıraya girdiği için süreç çökerse henüz yazılmamış olaylar
+# kaybolabilir (en fazla bir kez teslim). Olay sırası süreçler arasında yaklaşık commit sırasıdır;
+# tüketiciler 'data' alanını satırın son hali olarak kullanmalıdır.
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+
+from app import db
+from app.models import Product, Order, OrderItem, Supplier, WarehouseLocation, User
+
+try:
+    import fcntl  # Windows'ta yok; orada tek süreçli geliştirme sunucusu kullanılır
+except ImportError:
+    fcntl = None
+
+TRACKED_MODELS = (Product, Order, OrderItem, Supplier, WarehouseLocation, User)
+# Akışa hiçbir zaman yazılmayan sütunlar
+EXCLUDED_COLUMNS = {'users': {'password_hash'}}
+
+OP_INSERT = 'insert'
+OP_UPDATE = 'update'
+OP_DELETE = 'delete'
+
+DEFAULTS = {
+    'CDC_DIR': None,
+    'CDC_SEGMENT_BYTES': 64 * 1024 * 1024,
+    'CDC_FLUSH_INTERVAL': 0.05,
+    'CDC_BATCH_MAX': 5000,
+}
+
+_PENDING_KEY = 'cdc_pending'
+_SEGMENT_SUFFIX = '.ndjson'
+_LOCK_FILE = '.lock'
+
+
+class CDCError(Exception):
+    """Raised for invalid reader cursors."""
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _segment_name(number):
+    return f'{number:08d}{_SEGMENT_SUFFIX}'
+
+
+def list_segments(directory):
+    """Segment numbers in the directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                  if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit())
+
+
+class ChangeLogWriter:
+    """Per-process background writer: batches committed changes, appends them, fsyncs once per batch."""
+
+    def __init__(self, directory, segment_bytes, flush_interval, batch_max, logger):
+        self.directory = directory
+        self.logger = logger
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.batch_max = batch_max
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._counters = {'events': 0, 'batches': 0, 'fsyncs': 0, 'bytes': 0, 'errors': 0}
+        self._segment = None
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def submit(self, events):
+        """Queues one committed transaction's events; returns immediately."""
+        self._ensure_thread()
+        self._queue.put(events)
+
+    def _ensure_thread(self):
+        # fork'tan sonra (gunicorn preload) alt süreçte yazıcı iş parçacığı yoktur; yeniden başlatılır
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='cdc-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            stop = False
+            events = list(batch)
+            # Kısa bir süre daha bekleyip gelenleri aynı yazma/fsync grubuna kat
+            deadline = time.monotonic() + self.flush_interval
+            while len(events) < self.batch_max:
+                try:
+                    more = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                events.extend(more)
+            try:
+                self._write(events)
+            except OSError as e:
+                with self._metrics_lock:
+                    self._counters['errors'] += 1
+                self.logger.error(f'CDC write failed, {len(events)} changes lost: {e}')
+            if stop:
+                return
+
+    def _write(self, events):
+        payload = ''.join(json.dumps(e, default=_json_default, separators=(',', ':')) + '\n'
+                          for e in events).encode('utf-8')
+        with open(os.path.join(self.directory, _LOCK_FILE), 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                segments = list_segments(self.directory)
+                number = segments[-1] if segments else 1
+                path = os.path.join(self.directory, _segment_name(number))
+                if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+                    number += 1
+                    path = os.path.join(self.directory, _segment_name(number))
+                with open(path, 'ab') as segment:
+                    segment.write(payload)
+                    segment.flush()
+                    os.fsync(segment.fileno())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        with self._metrics_lock:
+            self._counters['events'] += len(events)
+            self._counters['batches'] += 1
+            self._counters['fsyncs'] += 1
+            self._counters['bytes'] += len(payload)
+            self._segment = _segment_name(number)
+
+    def close(self, timeout=5.0):
+        """Writes what is queued and stops the thread (also runs at interpreter exit)."""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def snapshot(self):
+        with self._metrics_lock:
+            data = dict(self._counters)
+            data.update({'queue_depth': self._queue.qsize(), 'segment': self._segment,
+                         'directory': self.directory})
+            return data
+
+
+def init_app(app):
+    directory = app.config.get('CDC_DIR', DEFAULTS['CDC_DIR'])
+    if directory:
+        app.extensions['cdc'] = ChangeLogWriter(
+            directory,
+            segment_bytes=app.config.get('CDC_SEGMENT_BYTES', DEFAULTS['CDC_SEGMENT_BYTES']),
+            flush_interval=app.config.get('CDC_FLUSH_INTERVAL', DEFAULTS['CDC_FLUSH_INTERVAL']),
+            batch_max=app.config.get('CDC_BATCH_MAX', DEFAULTS['CDC_BATCH_MAX']),
+            logger=app.logger,
+        )
+
+
+def _writer():
+    return current_app.extensions.get('cdc') if has_app_context() else None
+
+
+# --- Yakalama -----------------------------------------------------------------------------------
+
+def _row_values(obj, mapper):
+    """Loaded column values of obj keyed by column name (never triggers a lazy load)."""
+    state_dict = inspect(obj).dict
+    excluded = EXCLUDED_COLUMNS.get(mapper.local_table.name, ())
+    values = {}
+    for prop in mapper.column_attrs:
+        column = prop.columns[0]
+        if prop.key in state_dict and column.name not in excluded:
+            values[column.name] = state_dict[prop.key]
+    return values
+
+
+def _changed_columns(obj, mapper):
+    state = inspect(obj)
+    excluded = EXCLUDED_COLUMNS.get(mapper.local_table.name, ())
+    return [prop.columns[0].name for prop in mapper.column_attrs
+            if prop.columns[0].name not in excluded and state.attrs[prop.key].history.has_changes()]
+
+
+def _merge(pending, table, op, pk, data, changed=()):
+    """Folds a row change into the transaction's pending changes (one entry per row)."""
+    key = (table, pk)
+    previous = pending.get(key)
+    if previous is None:
+        pending[key] = {'table': table, 'op': op, 'pk': pk, 'data': data, 'changed': list(changed)}
+        return
+    if op == OP_DELETE:
+        if previous['op'] == OP_INSERT:
+            del pending[key]  # aynı transaction'da eklenip silinen satır hiç görünmez
+        else:
+            pending[key] = {'table': table, 'op': OP_DELETE, 'pk': pk, 'data': data, 'changed': []}
+        return
+    previous['data'].update(data)
+    if previous['op'] == OP_UPDATE:
+        previous['changed'] = sorted(set(previous['changed']) | set(changed))
+
+
+def record_changes(table, op, rows, changed=(), session=None):
+    """
+    Reports changes written with Core statements, which bypass the ORM flush hooks. rows is an
+    iterable (consumed only when CDC is on) of dicts with the primary key 'id' plus known column values; changed lists the columns an
+    UPDATE touched (values computed in SQL may be left out of the row). Runs in the caller's
+    transaction: the changes are published only if it commits.
+    """
+    session = session or db.session()
+    if _writer() is None or not rows:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for row in rows:
+        _merge(pending, table, op, row['id'], dict(row), changed)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _capture_flushed_changes(session, flush_context):
+    if _writer() is None:
+        return
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    for op, objects in ((OP_INSERT, session.new), (OP_UPDATE, session.dirty), (OP_DELETE, session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, TRACKED_MODELS):
+                continue
+            mapper = inspect(obj).mapper
+            if op == OP_UPDATE:
+                changed = _changed_columns(obj, mapper)
+                if not changed:
+                    continue  # yalnızca ilişki koleksiyonu değişmiş
+            else:
+                changed = ()
+            _merge(pending, mapper.local_table.name, op, obj.id, _row_values(obj, mapper), changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_committed_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    writer = _writer()
+    if not pending or writer is None:
+        return
+    committed_at = datetime.utcnow().isoformat()
+    tx = uuid.uuid4().hex
+    writer.submit([dict(change, tx=tx, ts=committed_at) for change in pending.values()])
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- Okuma --------------------------------------------------------------------------------------
+
+def parse_cursor(cursor):
+    """'segment:offset' -> (segment, offset); None or '' means the beginning of the log."""
+    if not cursor:
+        return None
+    try:
+        segment, offset = cursor.split(':')
+        return int(segment), int(offset)
+    except ValueError:
+        raise CDCError(f"Invalid CDC cursor '{cursor}'. Expected 'segment:offset'.")
+
+
+def format_cursor(segment, offset):
+    return f'{segment}:{offset}'
+
+
+def read_changes(directory, cursor=None, limit=1000):
+    """
+    Returns (changes, next_cursor): up to limit changes written after cursor, oldest first.
+    Pass next_cursor to the following call; an incomplete last line is left for the next read.
+    """
+    segments = list_segments(directory)
+    if not segments:
+        return [], cursor
+    position = parse_cursor(cursor)
+    if position is None:
+        position = (segments[0], 0)
+    segment, offset = position
+    if segment < segments[0]:
+        raise CDCError(f'Segment {segment} no longer exists; the oldest is {segments[0]}.')
+
+    changes = []
+    while len(changes) < limit:
+        path = os.path.join(directory, _segment_name(segment))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                while len(changes) < limit:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break  # dosya sonu veya henüz tamamlanmamış satır
+                    offset += len(line)
+                    changes.append(json.loads(line))
+        if len(changes) >= limit:
+            break
+        later = [number for number in segments if number > segment]
+        if not later:
+            break
+        segment, offset = later[0], 0  # bu segment kapandı, sonrakine geç
+    return changes, format_cursor(segment, offset)
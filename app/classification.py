@@ -0,0 +1,219 @@
+# app/classification.py
+# ABC (ciro katkısı) / XYZ (talep değişkenliği) ürün sınıflandırması.
+#
+# ABC: ürünler dönem cirosuna göre azalan sıralanır; kümülatif ciro payı CLASSIFICATION_ABC_A'ya
+#      kadar olanlar A, CLASSIFICATION_ABC_B'ye kadar olanlar B, kalanlar (ve cirosu olmayanlar) C.
+# XYZ: haftalık talebin değişim katsayısı (CV = σ / ortalama); CV <= X sınırı X, <= Y sınırı Y,
+#      daha yüksek veya hiç talep yoksa Z.
+# Hesap tüm ürünler için vektöreldir (argsort + cumsum, reshape + std/mean). Sonuçlar dönem
+# (gün sayısı, bitiş günü) başına süreç içinde önbelleğe alınır; store_classification() sınıfları
+# filtreleme için Product.abc_class / xyz_class alanlarına yazar.
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, update, func, bindparam
+
+from app import db
+from app.models import Product
+from app.orders.status import STOCK_RESTORING_STATUSES
+from app.replenishment import load_daily_demand
+from app.cdc import record_changes, OP_UPDATE
+from app.archive import order_item_history
+
+ABC_CLASSES = ('A', 'B', 'C')
+XYZ_CLASSES = ('X', 'Y', 'Z')
+BUCKET_DAYS = 7  # değişkenlik haftalık talep üzerinden ölçülür
+
+DEFAULTS = {
+    'CLASSIFICATION_PERIOD_DAYS': 182,
+    'CLASSIFICATION_ABC_A': 0.80,
+    'CLASSIFICATION_ABC_B': 0.95,
+    'CLASSIFICATION_XYZ_X': 0.5,
+    'CLASSIFICATION_XYZ_Y': 1.0,
+    'CLASSIFICATION_CACHE_SECONDS': 900,
+}
+
+
+class ClassificationError(Exception):
+    """Raised when classification parameters are invalid."""
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+class Classification:
+    """ABC/XYZ result for one period; arrays are aligned with product_ids (sorted)."""
+
+    def __init__(self, period_days, start, end, product_ids, revenue, cumulative_share, cv, abc, xyz):
+        self.period_days = period_days
+        self.start = start
+        self.end = end
+        self.computed_at = datetime.utcnow()
+        self.product_ids = product_ids
+        self.revenue = revenue
+        self.cumulative_share = cumulative_share
+        self.cv = cv
+        self.abc = abc
+        self.xyz = xyz
+
+    def matrix(self):
+        """3x3 summary: {'counts': [[...]], 'revenue_share': [[...]]} with rows A-C and columns X-Z."""
+        abc_index = np.searchsorted(np.array(ABC_CLASSES), self.abc)
+        xyz_index = np.searchsorted(np.array(XYZ_CLASSES), self.xyz)
+        counts = np.zeros((3, 3), dtype=np.int64)
+        revenue = np.zeros((3, 3), dtype=np.float64)
+        np.add.at(counts, (abc_index, xyz_index), 1)
+        np.add.at(revenue, (abc_index, xyz_index), self.revenue)
+        total = revenue.sum()
+        share = revenue / total if total > 0 else revenue
+        return {'counts': counts.tolist(), 'revenue_share': np.round(share * 100, 2).tolist()}
+
+    def select(self, abc=None, xyz=None, limit=200):
+        """Row indices of the given class cell, highest revenue first."""
+        mask = np.ones(len(self.product_ids), dtype=bool)
+        if abc:
+            mask &= self.abc == abc
+        if xyz:
+            mask &= self.xyz == xyz
+        indices = np.nonzero(mask)[0]
+        return indices[np.argsort(-self.revenue[indices], kind='stable')][:limit]
+
+
+def _load_revenue(product_ids, start, end):
+    items = order_item_history(start=start, end=end, exclude_statuses=STOCK_RESTORING_STATUSES)
+    rows = db.session.connection().execute(
+        select(items.c.product_id, func.sum(items.c.quantity * items.c.price_at_order))
+        .group_by(items.c.product_id)
+    ).all()
+    revenue = np.zeros(len(product_ids), dtype=np.float64)
+    if not rows or not len(product_ids):
+        return revenue
+    row_products = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    amounts = np.fromiter((float(r[1] or 0) for r in rows), dtype=np.float64, count=len(rows))
+    positions = np.minimum(np.searchsorted(product_ids, row_products), len(product_ids) - 1)
+    known = product_ids[positions] == row_products
+    np.add.at(revenue, positions[known], amounts[known])
+    return revenue
+
+
+def abc_classes(revenue, a_share, b_share):
+    """Vectorized ABC split by cumulative revenue share; returns (classes, cumulative share per product)."""
+    order = np.argsort(-revenue, kind='stable')
+    total = revenue.sum()
+    cumulative = np.zeros_like(revenue)
+    if total > 0:
+        cumulative[order] = np.cumsum(revenue[order]) / total
+    # Sınıf, ürünün kendisinden önceki kümülatif paya göre belirlenir; böylece sınırı aşan ilk
+    # ürün de üst sınıfa girer (tek ürünlük bir A sınıfı boş kalmaz)
+    preceding = cumulative - (revenue / total if total > 0 else 0)
+    classes = np.where(preceding < a_share, 'A', np.where(preceding < b_share, 'B', 'C'))
+    classes = np.where(revenue > 0, classes, 'C')
+    return classes, cumulative
+
+
+def xyz_classes(demand, x_limit, y_limit, bucket_days=BUCKET_DAYS):
+    """Vectorized XYZ split by the coefficient of variation of demand summed per bucket; returns (classes, cv)."""
+    buckets = demand.shape[1] // bucket_days
+    if buckets < 2:
+        raise ClassificationError(f'The period must cover at least {2 * bucket_days} days.')
+    # En yeni günlerden geriye doğru tam haftalar alınır
+    weekly = demand[:, -buckets * bucket_days:].reshape(demand.shape[0], buckets, bucket_days).sum(axis=2)
+    mean = weekly.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cv = np.where(mean > 0, weekly.std(axis=1, ddof=1) / mean, np.inf)
+    classes = np.where(cv <= x_limit, 'X', np.where(cv <= y_limit, 'Y', 'Z'))
+    return classes, cv
+
+
+def compute_classification(period_days=None, end=None):
+    period_days = int(period_days or _setting('CLASSIFICATION_PERIOD_DAYS'))
+    if not 2 * BUCKET_DAYS <= period_days <= 730:
+        raise ClassificationError(f'The period must be between {2 * BUCKET_DAYS} and 730 days.')
+    end = end or datetime.utcnow()
+    start = datetime.combine(end.date() - timedelta(days=period_days - 1), datetime.min.time())
+
+    product_ids = np.fromiter(db.session.connection().execute(select(Product.id).order_by(Product.id)).scalars(),
+                              dtype=np.int64)
+    revenue = _load_revenue(product_ids, start, end)
+    demand = load_daily_demand(product_ids, period_days, end=end)
+    abc, cumulative = abc_classes(revenue, float(_setting('CLASSIFICATION_ABC_A')),
+                                  float(_setting('CLASSIFICATION_ABC_B')))
+    xyz, cv = xyz_classes(demand, float(_setting('CLASSIFICATION_XYZ_X')), float(_setting('CLASSIFICATION_XYZ_Y')))
+    return Classification(period_days, start, end, product_ids, revenue, cumulative, cv, abc, xyz)
+
+
+class ClassificationCache:
+    """
+    In-process cache of Classification results keyed by period (days, end day). A result is
+    reused for max_age seconds; entries of earlier days are dropped on the next put.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, period_days, max_age):
+        today = datetime.utcnow().date()
+        with self._lock:
+            entry = self._entries.get((period_days, today))
+        if entry and time.monotonic() - entry[0] < max_age:
+            return entry[1]
+        return None
+
+    def put(self, result):
+        with self._lock:
+            # Geçmiş günlere ait dönemler artık sorgulanmaz; bellekte birikmemeleri için atılır
+            today = result.end.date()
+            self._entries = {key: value for key, value in self._entries.items() if key[1] >= today}
+            self._entries[(result.period_days, today)] = (time.monotonic(), result)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+classification_cache = ClassificationCache()
+
+
+def get_classification(period_days=None, refresh=False):
+    """Cached classification of the period ending now."""
+    period_days = int(period_days or _setting('CLASSIFICATION_PERIOD_DAYS'))
+    if not refresh:
+        cached = classification_cache.get(period_days, _setting('CLASSIFICATION_CACHE_SECONDS'))
+        if cached is not None:
+            return cached
+    result = compute_classification(period_days)
+    classification_cache.put(result)
+    return result
+
+
+def store_classification(result):
+    """
+    Writes the classes to Product.abc_class / xyz_class with one executemany UPDATE limited to the
+    rows whose class changed (stamping classified_at, bumping version_id). Returns the row count.
+    """
+    current = {row.id: (row.abc_class, row.xyz_class) for row in db.session.connection().execute(
+        select(Product.id, Product.abc_class, Product.xyz_class))}
+    params = []
+    for product_id, abc, xyz in zip(result.product_ids.tolist(), result.abc.tolist(), result.xyz.tolist()):
+        if product_id in current and current[product_id] != (abc, xyz):
+            params.append({'b_product_id': product_id, 'b_abc': abc, 'b_xyz': xyz})
+    table = Product.__table__
+    if params:
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_product_id'))
+            .values(abc_class=bindparam('b_abc'), xyz_class=bindparam('b_xyz'), classified_at=result.computed_at,
+                    version_id=table.c.version_id + 1),
+            params
+        )
+        record_changes('products', OP_UPDATE,
+                       ({'id': p['b_product_id'], 'abc_class': p['b_abc'], 'xyz_class': p['b_xyz'],
+                         'classified_at': result.computed_at} for p in params),
+                       changed=('abc_class', 'xyz_class', 'classified_at', 'version_id'))
+    db.session.commit()
+    return len(params)
@@ -0,0 +1,151 @@
+# app/commands.py
+# Belirli bir blueprint'e ait olmayan, uygulama düzeyindeki CLI komutları.
+import json
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db
+from app.ledger import take_snapshots, stock_on_hand_at, record_opening_balances
+from app.allocation import initialize_warehouse_stock
+from app.classification import compute_classification, store_classification, classification_cache, \
+    ClassificationError
+from app.replenishment import compute_reorder_plan, apply_reorder_points, ReplenishmentError, FORECAST_METHODS
+from app.import_profile import profile_boot
+from app.cdc import read_changes, CDCError
+
+stock_cli = AppGroup('stock', help='Stock ledger, warehouse stock and replenishment commands.')
+
+
+@stock_cli.command('snapshot')
+def snapshot_command():
+    """Write per-product stock snapshots (schedule periodically, e.g. nightly)."""
+    written = take_snapshots()
+    click.echo(f'{written} stock snapshots written.')
+
+
+@stock_cli.command('init-ledger')
+def init_ledger_command():
+    """Record opening-balance movements so the ledger matches current stock."""
+    written = record_opening_balances()
+    click.echo(f'{written} opening-balance movements written.')
+
+
+@stock_cli.command('init-warehouse-stock')
+def init_warehouse_stock_command():
+    """Create per-warehouse stock rows from each product's home warehouse."""
+    written = initialize_warehouse_stock()
+    click.echo(f'{written} warehouse stock rows created.')
+
+
+@stock_cli.command('on-hand')
+@click.argument('product_id', type=int)
+@click.option('--at', 'at', type=click.DateTime(), default=None,
+              help='UTC date/time (default: now), e.g. 2025-01-31 or "2025-01-31 18:00:00".')
+def on_hand_command(product_id, at):
+    """Show the quantity on hand for a product at a point in time."""
+    at = at or datetime.utcnow()
+    click.echo(f'Product {product_id} on hand at {at:%Y-%m-%d %H:%M:%S}: {stock_on_hand_at(product_id, at)}')
+
+
+@stock_cli.command('reorder')
+@click.option('--method', type=click.Choice(FORECAST_METHODS), default=None, help='Forecast method (default: config).')
+@click.option('--days', type=int, default=None, help='Days of order history to use (default: config).')
+@click.option('--service-level', type=float, default=None, help='Target service level, e.g. 0.95.')
+@click.option('--update-thresholds', is_flag=True, help='Store each reorder point as the low stock threshold.')
+def reorder_command(method, days, service_level, update_thresholds):
+    """Forecast demand and print reorder suggestions grouped by supplier."""
+    started = time.perf_counter()
+    try:
+        plan = compute_reorder_plan(method=method, history_days=days, service_level=service_level)
+    except ReplenishmentError as e:
+        raise click.BadParameter(str(e))
+    elapsed = time.perf_counter() - started
+    suppliers = plan.by_supplier()
+    for group in suppliers:
+        click.echo(f"{group['supplier_name']}: {len(group['lines'])} products, {group['total_units']} units, "
+                   f"{group['total_cost']:.2f} estimated cost")
+        for line in group['lines']:
+            click.echo(f"  #{line['product_id']} {line['product_name']}: on hand {line['on_hand']}, "
+                       f"ROP {line['reorder_point']}, order {line['order_quantity']}")
+    click.echo(f'{len(plan.products.ids)} products forecast in {elapsed:.2f}s; '
+               f'{sum(len(g["lines"]) for g in suppliers)} reorder suggestions.')
+    if update_thresholds:
+        click.echo(f'{apply_reorder_points(plan)} low stock thresholds updated.')
+
+
+@stock_cli.command('classify')
+@click.option('--days', type=int, default=None, help='Length of the period in days (default: config).')
+def classify_command(days):
+    """Compute ABC/XYZ classes from order history and store them on products."""
+    try:
+        result = compute_classification(days)
+    except ClassificationError as e:
+        raise click.BadParameter(str(e))
+    classification_cache.put(result)
+    updated = store_classification(result)
+    counts = result.matrix()['counts']
+    for abc, row in zip('ABC', counts):
+        click.echo(f'{abc}: ' + '  '.join(f'{xyz}={count}' for xyz, count in zip('XYZ', row)))
+    click.echo(f'{len(result.product_ids)} products classified; {updated} changed class.')
+
+
+replica_cli = AppGroup('replica', help='Read replica commands.')
+
+
+@replica_cli.command('status')
+def replica_status_command():
+    """Write a heartbeat on the primary and show the replica lag."""
+    router = current_app.extensions['replica_router']
+    if not router.configured:
+        click.echo('No read replica configured (set REPLICA_DATABASE_URL).')
+        return
+    lag = router.measure_lag(db)
+    if lag is None:
+        click.echo('The replica has no heartbeat yet; reports stay on the primary until it replicates.')
+    else:
+        state = 'OK' if lag <= router.max_lag else 'LAGGING (reports use the primary)'
+        click.echo(f'Replica lag: {lag:.1f}s (limit {router.max_lag}s) - {state}')
+
+
+boot_cli = AppGroup('boot', help='Application start-up commands.')
+
+
+@boot_cli.command('profile')
+@click.option('--components', default=None,
+              help='Comma-separated app components to load, e.g. "worker" or "web,api" (default: all).')
+@click.option('--top', type=int, default=15, show_default=True, help='Number of packages to list.')
+def boot_profile_command(components, top):
+    """Start the app in a fresh interpreter and show which imports its start-up time goes to."""
+    components = tuple(c.strip() for c in components.split(',')) if components else None
+    try:
+        profile = profile_boot(components)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"create_app(components={', '.join(profile.components)}): {profile.total_seconds * 1000:.0f} ms "
+               f"(imports {profile.import_seconds * 1000:.0f} ms, {profile.module_count} modules)")
+    for package, seconds in profile.packages[:top]:
+        click.echo(f'  {seconds * 1000:8.1f} ms  {package}')
+
+
+cdc_cli = AppGroup('cdc', help='Change data capture stream commands.')
+
+
+@cdc_cli.command('read')
+@click.option('--cursor', default=None, help='Cursor printed by the previous read (default: start of the log).')
+@click.option('--limit', type=int, default=1000, show_default=True)
+def cdc_read_command(cursor, limit):
+    """Print changes after the cursor as NDJSON; the next cursor goes to stderr."""
+    directory = current_app.config.get('CDC_DIR')
+    if not directory:
+        raise click.ClickException('CDC is not enabled (set CDC_DIR).')
+    try:
+        changes, next_cursor = read_changes(directory, cursor, limit)
+    except CDCError as e:
+        raise click.BadParameter(str(e))
+    for change in changes:
+        click.echo(json.dumps(change, separators=(',', ':')))
+    click.echo(f'next cursor: {next_cursor}', err=True)
@@ -0,0 +1,93 @@
+# app/concurrency.py
+# Product stoğu için iyimser eşzamanlılık (optimistic concurrency) yardımcıları.
+# Product.version_id, SQLAlchemy'nin version_id_col özelliğiyle her UPDATE'in WHERE koşuluna
+# eklenir; araya başka bir yazma girdiyse flush StaleDataError fırlatır. Bu modül o hatayı
+# yakalayıp işlemi geri alarak artan bekleme süreleriyle yeniden dener ve çakışmaları sayar.
+import random
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BASE_DELAY = 0.05  # saniye
+DEFAULT_MAX_DELAY = 1.0
+
+
+class StockConflictError(Exception):
+    """Raised when a stock mutation still conflicts after all retry attempts."""
+
+
+class ConflictMetrics:
+    """Thread-safe, in-process counters of optimistic-lock conflicts per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'attempts': 0, 'conflicts': 0, 'succeeded': 0, 'exhausted': 0})
+
+    def record(self, operation, event):
+        with self._lock:
+            self._counters[operation][event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            data = {}
+            for operation, counters in self._counters.items():
+                counters = dict(counters)
+                counters['conflict_rate'] = round(counters['conflicts'] / counters['attempts'], 4) \
+                    if counters['attempts'] else 0.0
+                data[operation] = counters
+            return data
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+conflict_metrics = ConflictMetrics()
+
+
+def run_with_retry(operation, func, attempts=DEFAULT_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                   max_delay=DEFAULT_MAX_DELAY, retry_on=(StaleDataError,)):
+    """
+    Calls func() and retries it when the flush/commit hits a stale Product version
+    (or another conflict exception listed in retry_on).
+
+    func must do its own reads (so a retry sees fresh rows) and commit. Between attempts the
+    session is rolled back and the caller sleeps with exponential backoff plus jitter.
+    Raises StockConflictError when every attempt conflicted.
+    """
+    for attempt in range(1, attempts + 1):
+        conflict_metrics.record(operation, 'attempts')
+        try:
+            result = func()
+        except retry_on:
+            db.session.rollback()
+            conflict_metrics.record(operation, 'conflicts')
+            if attempt == attempts:
+                conflict_metrics.record(operation, 'exhausted')
+                raise StockConflictError(
+                    f'{operation}: stock was modified concurrently {attempts} times in a row. Please try again.')
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+            time.sleep(delay / 2 + random.uniform(0, delay / 2))
+        else:
+            conflict_metrics.record(operation, 'succeeded')
+            return result
+
+
+def matched_rows(statement, rows):
+    """
+    Executes a guarded UPDATE/DELETE once per parameter row and returns how many rows it matched.
+
+    executemany row counts are only reliable when the dialect says so: mssql+pyodbc reports -1 or
+    the last statement's count (supports_sane_multi_rowcount is False). There every row runs as its
+    own statement, so a guard that matched nothing is still noticed.
+    """
+    if not rows:
+        return 0
+    if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.session.execute(statement, rows).rowcount
+    return sum(db.session.execute(statement, row).rowcount for row in rows)
@@ -0,0 +1,244 @@
+# app/cycle_count.py
+# Depo bazında sayım (cycle count / stock-take).
+#
+# 1) open_count() depo için bir sayım oturumu açar (depo başına tek açık sayım).
+# 2) Sayım personeli (ürün veya SKU, sayılan miktar) listelerini submit_lines() ile gönderir; satırlar
+#    cycle_count_lines hazırlık tablosuna toplu INSERT ile yazılır. Aynı ürünün farklı raflardaki
+#    sayımları toplanır; replace=True ürünün önceki satırlarını siler (yeniden sayım).
+# 3) Farklar tek bir SQL sorgusuyla hesaplanır: sayım satırlarının ürün bazında toplamı, deponun
+#    warehouse_stock miktarıyla karşılaştırılır. include_uncounted=True ise depoda stoğu olup hiç
+#    sayılmamış ürünler 0 sayılmış kabul edilir (tam sayım).
+# 4) apply_count() onaylanan farkları tek transaction içinde toplu UPDATE'lerle uygular: depo stoğu
+#    sayılan miktara, ürün toplamı farkla güncellenir ve her fark 'adjustment' defter kaydı olur.
+#    Depo stoğu fark hesaplandıktan sonra değiştiyse koşullu UPDATE'ler bunu yakalar ve işlem
+#    taze farklarla yeniden denenir.
+from datetime import datetime
+
+from sqlalchemy import select, update, insert, delete, func, and_, exists, literal, bindparam
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import CycleCount, CycleCountLine, Product, WarehouseStock, WarehouseLocation
+from app.ledger import record_movements, MOVEMENT_ADJUSTMENT
+from app.cdc import record_changes, OP_UPDATE
+from app.concurrency import run_with_retry, matched_rows
+from app.scan import resolve, normalize_sku
+from app.utils import chunked
+
+STATUS_OPEN = 'Open'
+STATUS_APPLIED = 'Applied'
+STATUS_CANCELLED = 'Cancelled'
+
+# Hata mesajında listelenen en fazla hatalı satır
+MAX_REPORTED_ERRORS = 20
+
+
+class CycleCountError(Exception):
+    """Raised for invalid count submissions or operations on a count that is not open."""
+
+
+class CycleCountConflict(Exception):
+    """Raised when warehouse stock changed between computing and applying the variances."""
+
+
+def open_count(warehouse_id, user_id=None):
+    if db.session.get(WarehouseLocation, warehouse_id) is None:
+        raise CycleCountError('Warehouse not found.')
+    existing = db.session.scalar(select(CycleCount.id).where(CycleCount.warehouse_id == warehouse_id,
+                                                             CycleCount.status == STATUS_OPEN))
+    if existing:
+        raise CycleCountError(f'Cycle count #{existing} is already open for this warehouse.')
+    count = CycleCount(warehouse_id=warehouse_id, status=STATUS_OPEN, created_by=user_id)
+    db.session.add(count)
+    db.session.commit()
+    return count
+
+
+def _require_open(count):
+    if count.status != STATUS_OPEN:
+        raise CycleCountError(f'Cycle count #{count.id} is {count.status.lower()}; it can no longer be changed.')
+
+
+def _parse_lines(lines):
+    """[(line index, product_id or None, sku or None, counted_qty)] plus a list of error messages."""
+    if not isinstance(lines, list) or not lines:
+        raise CycleCountError('"lines" must be a non-empty list.')
+    parsed, errors = [], []
+    for index, line in enumerate(lines):
+        if not isinstance(line, dict):
+            errors.append(f'Line {index + 1}: must be an object.')
+            continue
+        product_id, sku, qty = line.get('product_id'), normalize_sku(line.get('sku')), line.get('counted_qty')
+        if not isinstance(qty, int) or isinstance(qty, bool) or qty < 0:
+            errors.append(f'Line {index + 1}: counted_qty must be a non-negative integer.')
+        elif product_id is None and sku is None:
+            errors.append(f'Line {index + 1}: product_id or sku is required.')
+        elif product_id is not None and (not isinstance(product_id, int) or isinstance(product_id, bool)):
+            errors.append(f'Line {index + 1}: product_id must be an integer.')
+        else:
+            parsed.append((index, product_id, sku, qty))
+    return parsed, errors
+
+
+def submit_lines(count, lines, user_id=None, replace=False):
+    """
+    Adds counted lines to an open count. Each line is {'product_id' or 'sku', 'counted_qty'}.
+    The whole submission is rejected if any line is invalid. Returns {'accepted', 'products'}.
+    """
+    _require_open(count)
+    parsed, errors = _parse_lines(lines)
+
+    skus = resolve([sku for _, product_id, sku, _ in parsed if product_id is None])
+    product_ids = {product_id for _, product_id, _, _ in parsed if product_id is not None}
+    existing = set()
+    for chunk in chunked(product_ids):
+        existing.update(db.session.execute(select(Product.id).where(Product.id.in_(chunk))).scalars())
+
+    rows = []
+    now = datetime.utcnow()
+    for index, product_id, sku, qty in parsed:
+        if product_id is None:
+            summary = skus.get(sku)
+            if summary is None:
+                errors.append(f'Line {index + 1}: unknown SKU "{sku}".')
+                continue
+            product_id = summary['id']
+        elif product_id not in existing:
+            errors.append(f'Line {index + 1}: product {product_id} does not exist.')
+            continue
+        rows.append({'count_id': count.id, 'product_id': product_id, 'counted_qty': qty,
+                     'counted_by': user_id, 'counted_at': now})
+    if errors:
+        more = f' (and {len(errors) - MAX_REPORTED_ERRORS} more)' if len(errors) > MAX_REPORTED_ERRORS else ''
+        raise CycleCountError(' '.join(errors[:MAX_REPORTED_ERRORS]) + more)
+
+    counted_ids = {row['product_id'] for row in rows}
+    table = CycleCountLine.__table__
+    if replace:
+        for chunk in chunked(counted_ids):
+            db.session.execute(delete(table).where(table.c.count_id == count.id, table.c.product_id.in_(chunk)))
+    db.session.execute(insert(table), rows)
+    db.session.commit()
+    return {'accepted': len(rows), 'products': len(counted_ids)}
+
+
+def _variances(count, include_uncounted=False):
+    """
+    Subquery of (product_id, stock_id, expected, counted, variance) for every product whose count
+    differs from its warehouse stock. stock_id is None when the product has no stock row yet.
+    """
+    lines = CycleCountLine.__table__
+    stock = WarehouseStock.__table__
+    counted = select(lines.c.product_id, func.sum(lines.c.counted_qty).label('counted')) \
+        .where(lines.c.count_id == count.id).group_by(lines.c.product_id).subquery()
+    parts = [
+        select(counted.c.product_id, stock.c.id.label('stock_id'),
+               func.coalesce(stock.c.quantity, 0).label('expected'), counted.c.counted)
+        .select_from(counted)
+        .outerjoin(stock, and_(stock.c.product_id == counted.c.product_id, stock.c.warehouse_id == count.warehouse_id))
+    ]
+    if include_uncounted:
+        was_counted = exists().where(lines.c.count_id == count.id, lines.c.product_id == stock.c.product_id)
+        parts.append(select(stock.c.product_id, stock.c.id, stock.c.quantity, literal(0))
+                     .where(stock.c.warehouse_id == count.warehouse_id, stock.c.quantity != 0, ~was_counted))
+    combined = parts[0].union_all(*parts[1:]).subquery() if len(parts) > 1 else parts[0].subquery()
+    return select(combined.c.product_id, combined.c.stock_id, combined.c.expected, combined.c.counted,
+                  (combined.c.counted - combined.c.expected).label('variance')) \
+        .where(combined.c.counted != combined.c.expected).subquery()
+
+
+def variance_summary(count, include_uncounted=False):
+    """Counted products, products with a variance, net and absolute unit variance (one query each)."""
+    variances = _variances(count, include_uncounted)
+    lines = CycleCountLine.__table__
+    counted_products = db.session.scalar(select(func.count(func.distinct(lines.c.product_id)))
+                                         .where(lines.c.count_id == count.id))
+    row = db.session.execute(select(func.count(), func.coalesce(func.sum(variances.c.variance), 0),
+                                    func.coalesce(func.sum(func.abs(variances.c.variance)), 0))).one()
+    return {'counted_products': counted_products, 'variance_products': row[0],
+            'net_variance': int(row[1]), 'absolute_variance': int(row[2])}
+
+
+def list_variances(count, include_uncounted=False, limit=None, offset=0):
+    """Variance rows with product names, largest absolute variance first."""
+    variances = _variances(count, include_uncounted)
+    query = select(variances.c.product_id, Product.name, Product.sku, variances.c.expected, variances.c.counted,
+                   variances.c.variance) \
+        .join(Product, Product.id == variances.c.product_id) \
+        .order_by(func.abs(variances.c.variance).desc(), variances.c.product_id) \
+        .offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return [row._asdict() for row in db.session.execute(query)]
+
+
+def _apply(count_id, include_uncounted, product_ids):
+    count = db.session.get(CycleCount, count_id, populate_existing=True)
+    _require_open(count)
+    variances = _variances(count, include_uncounted)
+    query = select(variances.c.product_id, variances.c.stock_id, variances.c.expected, variances.c.counted)
+    if product_ids is not None:
+        approved = set(product_ids)
+        rows = [row for row in db.session.execute(query) if row.product_id in approved]
+    else:
+        rows = db.session.execute(query).all()
+
+    stock = WarehouseStock.__table__
+    products = Product.__table__
+    existing = [{'b_id': r.stock_id, 'b_expected': r.expected, 'b_counted': r.counted}
+                for r in rows if r.stock_id is not None]
+    if existing:
+        matched = matched_rows(
+            update(stock).where(stock.c.id == bindparam('b_id'), stock.c.quantity == bindparam('b_expected'))
+            .values(quantity=bindparam('b_counted'), updated_at=datetime.utcnow()),
+            existing)
+        if matched < len(existing):
+            raise CycleCountConflict()
+    missing = [{'product_id': r.product_id, 'warehouse_id': count.warehouse_id, 'quantity': r.counted}
+               for r in rows if r.stock_id is None]
+    if missing:
+        try:
+            db.session.execute(insert(stock), missing)
+        except IntegrityError:
+            raise CycleCountConflict()  # aynı anda başka bir işlem depo satırını oluşturdu
+
+    deltas = [{'b_product_id': r.product_id, 'b_delta': r.counted - r.expected} for r in rows]
+    if deltas:
+        matched = matched_rows(
+            update(products).where(products.c.id == bindparam('b_product_id'),
+                                   products.c.quantity_in_stock + bindparam('b_delta') >= 0)
+            .values(quantity_in_stock=products.c.quantity_in_stock + bindparam('b_delta'),
+                    version_id=products.c.version_id + 1),
+            deltas)
+        if matched < len(deltas):
+            raise CycleCountConflict()
+        record_movements([{'product_id': r.product_id, 'movement_type': MOVEMENT_ADJUSTMENT,
+                           'quantity': r.counted - r.expected, 'warehouse_id': count.warehouse_id,
+                           'reference': f'Cycle count #{count.id}'} for r in rows])
+        record_changes('products', OP_UPDATE, ({'id': r.product_id} for r in rows),
+                       changed=('quantity_in_stock', 'version_id'))
+
+    count.status = STATUS_APPLIED
+    count.applied_at = datetime.utcnow()
+    count.adjusted_products = len(rows)
+    count.net_adjustment = sum(r.counted - r.expected for r in rows)
+    db.session.commit()
+    return count
+
+
+def apply_count(count, include_uncounted=False, product_ids=None):
+    """
+    Applies the count's variances (only those of product_ids when given) in one transaction.
+    Returns the updated CycleCount; raises StockConflictError if stock kept changing meanwhile.
+    """
+    _require_open(count)
+    count_id = count.id
+    return run_with_retry('cycle_count', lambda: _apply(count_id, include_uncounted, product_ids),
+                          retry_on=(CycleCountConflict,))
+
+
+def cancel_count(count):
+    _require_open(count)
+    count.status = STATUS_CANCELLED
+    db.session.execute(delete(CycleCountLine.__table__).where(CycleCountLine.__table__.c.count_id == count.id))
+    db.session.commit()
@@ -1,10 +1,13 @@
 # app/decorators.py
 from functools import wraps
-from flask import abort, flash, redirect, url_for, request
+from flask import abort, flash, redirect, url_for, request, current_app
 from flask_login import current_user
 from urllib.parse import urlparse
+from app.admission import admit
 
-def role_required(allowed_roles):
+def role_required(allowed_roles, cost=None):
+    # cost verilirse view kabul denetiminden geçer (app/admission.py): 'reports' gibi bir uç nokta
+    # sınıfı ya da ('reports', ağırlık) ikilisi; ağırlık istek içinde hesaplanan bir fonksiyon olabilir.
     if not isinstance(allowed_roles, list):
         allowed_roles = [allowed_roles]
 
@@ -20,7 +23,18 @@ def role_required(allowed_roles):
                 if request.referrer and urlparse(request.referrer).netloc == urlparse(request.url_root).netloc and request.referrer != request.url:
                     return redirect(safe_redirect)
                 return redirect(safe_redirect)
-            return f(*args, **kwargs)
+            if cost is not None:
+                return admit(cost, current_app.ensure_sync(f), args, kwargs)
+            return current_app.ensure_sync(f)(*args, **kwargs)  # async view'lar da desteklenir
+        return decorated_function
+    return decorator
+
+def admission_controlled(cost):
+    # Rol kısıtı olmayan (yalnızca @login_required) view'lar için kabul denetimi
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return admit(cost, current_app.ensure_sync(f), args, kwargs)
         return decorated_function
     return decorator
 
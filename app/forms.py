@@ -1,9 +1,12 @@
 # app/forms.py
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, SelectField, DecimalField, DateField, \
-    IntegerField, TextAreaField
+    IntegerField, TextAreaField, HiddenField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError, NumberRange, Optional
-from app.models import User
+from app import db
+from app.models import User, Supplier, WarehouseLocation, Product
+from app.scan import normalize_sku
+from app.picking import normalize_bin, parse_bin
 
 USER_ROLE_CHOICES = [
     ('Admin', 'Administrator'),
@@ -13,6 +16,18 @@ USER_ROLE_CHOICES = [
 ]
 
 
+class RecordExists:
+    """Validates a submitted id with a single primary-key lookup instead of a full choices list."""
+
+    def __init__(self, model, message=None):
+        self.model = model
+        self.message = message
+
+    def __call__(self, form, field):
+        if field.data and db.session.get(self.model, field.data) is None:
+            raise ValidationError(self.message or 'The selected record does not exist.')
+
+
 class LoginForm(FlaskForm):
     username = StringField('Username',
                            validators=[DataRequired(message="Username field cannot be empty."),
@@ -55,6 +70,12 @@ class ProductForm(FlaskForm):
                        validators=[DataRequired(message="Product name is required."),
                                    Length(min=2, max=100,
                                           message="Product name must be between 2 and 100 characters.")])
+    sku = StringField('SKU / Barcode', filters=[normalize_sku],
+                      validators=[Optional(),
+                                  Length(max=64, message="SKU can be at most 64 characters.")])
+    bin = StringField('Bin Location', filters=[normalize_bin],
+                      validators=[Optional(),
+                                  Length(max=20, message="Bin location can be at most 20 characters.")])
     category = StringField('Category',
                            validators=[Optional(),
                                        Length(max=50, message="Category can be at most 50 characters.")])
@@ -71,10 +92,31 @@ class ProductForm(FlaskForm):
     description = TextAreaField('Description',
                                 validators=[Optional(),
                                             Length(max=500, message="Description can be at most 500 characters.")])
-    supplier_id = SelectField('Supplier', coerce=int, validators=[Optional()])
-    warehouse_id = SelectField('Warehouse Location', coerce=int, validators=[Optional()])
+    # Seçenekler formda tutulmaz; küçük kurulumlarda önbellekten <select>, büyüklerde typeahead çizilir
+    supplier_id = IntegerField('Supplier', validators=[Optional(), RecordExists(
+        Supplier, message='Selected supplier does not exist. Pick one from the list.')])
+    warehouse_id = IntegerField('Warehouse Location', validators=[Optional(), RecordExists(
+        WarehouseLocation, message='Selected warehouse does not exist. Pick one from the list.')])
+    # Formun açıldığı andaki Product.version_id; kaydederken eski form tespiti için kullanılır
+    version_id = HiddenField()
     submit = SubmitField('Save Product')
 
+    def __init__(self, product_id=None, *args, **kwargs):
+        super(ProductForm, self).__init__(*args, **kwargs)
+        self.product_id = product_id
+
+    def validate_sku(self, sku_field):
+        if sku_field.data:
+            query = Product.query.filter(Product.sku == sku_field.data)
+            if self.product_id is not None:
+                query = query.filter(Product.id != self.product_id)
+            if query.first():
+                raise ValidationError('This SKU is already assigned to another product.')
+
+    def validate_bin(self, bin_field):
+        if bin_field.data and parse_bin(bin_field.data) is None:
+            raise ValidationError('Bin location must look like A-03 or A-03-2 (aisle, bay, optional level).')
+
 
 class SupplierForm(FlaskForm):
     name = StringField('Supplier Name',
@@ -93,6 +135,10 @@ class SupplierForm(FlaskForm):
     address = TextAreaField('Address',
                             validators=[Optional(),
                                         Length(max=255, message="Address can be at most 255 characters.")])
+    lead_time_days = IntegerField('Lead Time (days)',
+                                  validators=[Optional(),
+                                              NumberRange(min=0, max=365,
+                                                          message="Lead time must be between 0 and 365 days.")])
     submit = SubmitField('Save Supplier')
 
 
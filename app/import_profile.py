@@ -0,0 +1,51 @@
+# app/import_profile.py
+# create_app() açılış süresinin ölçümü (`flask boot profile`). Uygulama, modül önbelleği boş olan
+# yeni bir Python sürecinde `-X importtime` ile başlatılır; import süreleri en üst paket
+# (flask, sqlalchemy, numpy, app...) bazında toplanır ve en pahalılar listelenir.
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict, namedtuple
+
+BootProfile = namedtuple('BootProfile', 'components total_seconds import_seconds module_count packages')
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_BOOT_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app(components=json.loads(sys.argv[1]))
+print(json.dumps({'seconds': time.perf_counter() - started, 'components': app.config['APP_COMPONENTS']}))
+'''
+
+
+def parse_importtime(output):
+    """Sums `-X importtime` self times per top-level package; returns ([(package, seconds)] slowest first, modules)."""
+    per_package = defaultdict(int)
+    modules = 0
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # başlık satırı
+        per_package[fields[2].strip().split('.')[0]] += int(fields[0])
+        modules += 1
+    packages = sorted(((name, us / 1e6) for name, us in per_package.items()), key=lambda item: -item[1])
+    return packages, modules
+
+
+def profile_boot(components=None):
+    """Runs create_app(components=...) in a new interpreter and returns its BootProfile."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _BOOT_SCRIPT, json.dumps(components)],
+                            cwd=_PROJECT_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        error_lines = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('App start-up failed:\n' + '\n'.join(error_lines[-10:]))
+    boot = json.loads(result.stdout.strip().splitlines()[-1])
+    packages, modules = parse_importtime(result.stderr)
+    return BootProfile(components=boot['components'], total_seconds=boot['seconds'],
+                       import_seconds=sum(seconds for _, seconds in packages), module_count=modules,
+                       packages=packages)
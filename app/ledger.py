@@ -0,0 +1,274 @@
+# app/ledger.py
+# Stok hareket defteri (stock_movements) ve periyodik anlık görüntüler (stock_snapshots).
+#
+# - ORM üzerinden yapılan her Product.quantity_in_stock / warehouse_id değişikliği after_flush
+#   olayında aynı transaction içinde deftere yazılır (edit_product, create_order, populate_db...).
+# - Core ile toplu UPDATE yapan kod (toplu sipariş alımı, durum geçişleri) hareketleri
+#   record_movements() ile kendisi yazar.
+# - "X tarihinde eldeki stok" sorguları en yakın anlık görüntüyü okuyup yalnızca ondan sonraki
+#   hareketleri toplar; böylece maliyet defterin toplam boyutuna değil, son anlık görüntüden
+#   bu yana biriken hareket sayısına bağlıdır.
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import event, insert, select, func, inspect, and_
+
+from app import db
+from app.models import Product, StockMovement, StockSnapshot
+from app.utils import chunked
+
+MOVEMENT_RECEIPT = 'receipt'
+MOVEMENT_SALE = 'sale'
+MOVEMENT_RETURN = 'return'
+MOVEMENT_ADJUSTMENT = 'adjustment'
+MOVEMENT_TRANSFER = 'transfer'
+MOVEMENT_TYPES = (MOVEMENT_RECEIPT, MOVEMENT_SALE, MOVEMENT_RETURN, MOVEMENT_ADJUSTMENT, MOVEMENT_TRANSFER)
+
+# Anlık görüntü yalnızca bu kadar saniyeden eski hareketleri kapsar; böylece id'si alınmış ama
+# henüz commit edilmemiş bir hareket, görüntünün kapsadığı aralıkta sessizce kaybolmaz.
+SNAPSHOT_SETTLE_SECONDS = 60
+
+_CONTEXT_KEY = 'stock_movement_context'
+_ACCOUNTED_KEY = 'stock_accounted_product_ids'
+_HOME_MOVES_KEY = 'stock_home_moves'
+
+
+def _current_user_id():
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+@contextmanager
+def stock_movement_context(movement_type, reference=None):
+    """Tags ORM stock changes flushed inside the block with a movement type and reference."""
+    if movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f"Unknown stock movement type '{movement_type}'.")
+    previous = db.session.info.get(_CONTEXT_KEY)
+    db.session.info[_CONTEXT_KEY] = {'movement_type': movement_type, 'reference': reference}
+    try:
+        yield
+    finally:
+        if previous is None:
+            db.session.info.pop(_CONTEXT_KEY, None)
+        else:
+            db.session.info[_CONTEXT_KEY] = previous
+
+
+def mark_stock_accounted(product_ids):
+    """
+    Declares that the current transaction writes ledger rows (and per-warehouse stock) for these
+    products itself, so the flush hooks must not record their quantity changes a second time.
+    """
+    db.session.info.setdefault(_ACCOUNTED_KEY, set()).update(product_ids)
+
+
+def stock_accounted_ids(session):
+    return session.info.get(_ACCOUNTED_KEY, ())
+
+
+def note_home_move(session, product_id, quantity):
+    """
+    Records how many units a home-warehouse change actually moved (app/allocation.py); the flush
+    hook writes the transfer with this quantity instead of the product's whole stock.
+    """
+    session.info.setdefault(_HOME_MOVES_KEY, {})[product_id] = quantity
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_soft_rollback')
+def _clear_stock_accounted(session, *args):
+    session.info.pop(_ACCOUNTED_KEY, None)
+
+
+def record_movements(rows, connection=None):
+    """
+    Bulk-inserts ledger rows. Each row: {'product_id', 'movement_type', 'quantity'} and optionally
+    'warehouse_id', 'reference', 'user_id', 'created_at'. Runs in the caller's transaction.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    user_id = _current_user_id()
+    for row in rows:
+        row.setdefault('warehouse_id', None)
+        row.setdefault('reference', None)
+        row.setdefault('user_id', user_id)
+        row.setdefault('created_at', now)
+    (connection or db.session).execute(insert(StockMovement.__table__), rows)
+
+
+# Eski değerin bilinmesi için stok ve depo alanlarında "active history" açılır; aksi halde
+# süresi dolmuş (expired) bir nesneye yapılan atamada önceki değer geçmişte bulunmaz.
+@event.listens_for(Product.quantity_in_stock, 'set', active_history=True)
+@event.listens_for(Product.warehouse_id, 'set', active_history=True)
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+
+def attribute_change(state, attribute):
+    history = state.attrs[attribute].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_orm_stock_movements(session, flush_context):
+    context = session.info.get(_CONTEXT_KEY) or {}
+    reference = context.get('reference')
+    accounted = stock_accounted_ids(session)
+    home_moves = session.info.pop(_HOME_MOVES_KEY, {})
+    rows = []
+
+    for product in session.new:
+        if isinstance(product, Product) and product.quantity_in_stock:
+            rows.append({'product_id': product.id, 'movement_type': context.get('movement_type', MOVEMENT_RECEIPT),
+                         'quantity': product.quantity_in_stock, 'warehouse_id': product.warehouse_id,
+                         'reference': reference})
+
+    for product in session.dirty:
+        if not isinstance(product, Product):
+            continue
+        state = inspect(product)
+        stock_change = attribute_change(state, 'quantity_in_stock')
+        warehouse_change = attribute_change(state, 'warehouse_id')
+        old_warehouse = warehouse_change[0] if warehouse_change else product.warehouse_id
+        if stock_change and product.id not in accounted:
+            old_qty, new_qty = stock_change
+            delta = (new_qty or 0) - (old_qty or 0)
+            if delta:
+                # Miktar değişikliği, varsa depo değişikliğinden önce eski depoda gerçekleşmiş sayılır
+                rows.append({'product_id': product.id,
+                             'movement_type': context.get('movement_type', MOVEMENT_ADJUSTMENT),
+                             'quantity': delta, 'warehouse_id': old_warehouse, 'reference': reference})
+        # Depo değişikliğinde yalnızca gerçekten taşınan miktar (ana depo satırı veya atanmamış stok)
+        moved = home_moves.get(product.id, product.quantity_in_stock) if warehouse_change else 0
+        if moved:
+            rows.append({'product_id': product.id, 'movement_type': MOVEMENT_TRANSFER,
+                         'quantity': -moved, 'warehouse_id': warehouse_change[0], 'reference': reference})
+            rows.append({'product_id': product.id, 'movement_type': MOVEMENT_TRANSFER,
+                         'quantity': moved, 'warehouse_id': warehouse_change[1], 'reference': reference})
+
+    for product in session.deleted:
+        if isinstance(product, Product) and product.quantity_in_stock:
+            rows.append({'product_id': product.id, 'movement_type': MOVEMENT_ADJUSTMENT,
+                         'quantity': -product.quantity_in_stock, 'warehouse_id': product.warehouse_id,
+                         'reference': reference or 'Product deleted'})
+
+    record_movements(rows, connection=session.connection())
+
+
+def _latest_snapshot_ids(at=None, product_ids=None):
+    """Subquery of (product_id, last_movement_id) of each product's newest snapshot taken <= at."""
+    latest = select(StockSnapshot.product_id, func.max(StockSnapshot.last_movement_id).label('last_movement_id'))
+    if at is not None:
+        latest = latest.where(StockSnapshot.taken_at <= at)
+    if product_ids is not None:
+        latest = latest.where(StockSnapshot.product_id.in_(product_ids))
+    return latest.group_by(StockSnapshot.product_id).subquery()
+
+
+def _latest_snapshots(latest):
+    """Returns {product_id: quantity} for the snapshots selected by a _latest_snapshot_ids() subquery."""
+    rows = db.session.execute(
+        select(StockSnapshot.product_id, StockSnapshot.quantity)
+        .join(latest, and_(StockSnapshot.product_id == latest.c.product_id,
+                           StockSnapshot.last_movement_id == latest.c.last_movement_id))
+    ).all()
+    return {row.product_id: row.quantity for row in rows}
+
+
+def stock_on_hand_at(product_id, at):
+    """Quantity on hand for one product at the given UTC datetime."""
+    snapshot = db.session.execute(
+        select(StockSnapshot.quantity, StockSnapshot.last_movement_id)
+        .where(StockSnapshot.product_id == product_id, StockSnapshot.taken_at <= at)
+        .order_by(StockSnapshot.last_movement_id.desc())
+        .limit(1)
+    ).first()
+    base_quantity, after_id = (snapshot.quantity, snapshot.last_movement_id) if snapshot else (0, 0)
+    tail = db.session.execute(
+        select(func.coalesce(func.sum(StockMovement.quantity), 0))
+        .where(StockMovement.product_id == product_id,
+               StockMovement.id > after_id,
+               StockMovement.created_at <= at)
+    ).scalar()
+    return base_quantity + int(tail)
+
+
+def stock_levels_at(at, product_ids=None):
+    """{product_id: quantity on hand at `at`} for the given products (or every product in the ledger)."""
+    latest = _latest_snapshot_ids(at=at, product_ids=product_ids)
+    levels = _latest_snapshots(latest)
+    tail = select(StockMovement.product_id, func.sum(StockMovement.quantity)) \
+        .outerjoin(latest, StockMovement.product_id == latest.c.product_id) \
+        .where(StockMovement.id > func.coalesce(latest.c.last_movement_id, 0),
+               StockMovement.created_at <= at)
+    if product_ids is not None:
+        tail = tail.where(StockMovement.product_id.in_(product_ids))
+    for product_id, quantity in db.session.execute(tail.group_by(StockMovement.product_id)).all():
+        levels[product_id] = levels.get(product_id, 0) + int(quantity)
+    return levels
+
+
+def take_snapshots(settle_seconds=SNAPSHOT_SETTLE_SECONDS):
+    """
+    Writes a snapshot for every product that has movements since the previous run.
+    Set-based: one grouped SUM over the new id range plus the previous snapshots of those products.
+    Returns the number of snapshots written.
+    """
+    now = datetime.utcnow()
+    previous_cutoff = db.session.execute(select(func.max(StockSnapshot.last_movement_id))).scalar() or 0
+    cutoff = db.session.execute(
+        select(StockMovement.id)
+        .where(StockMovement.created_at <= now - timedelta(seconds=settle_seconds))
+        .order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
+        .limit(1)
+    ).scalar()
+    if cutoff is None or cutoff <= previous_cutoff:
+        return 0
+
+    deltas = db.session.execute(
+        select(StockMovement.product_id, func.sum(StockMovement.quantity))
+        .where(StockMovement.id > previous_cutoff, StockMovement.id <= cutoff)
+        .group_by(StockMovement.product_id)
+    ).all()
+    if not deltas:
+        return 0
+
+    previous = {}
+    for chunk in chunked([product_id for product_id, _ in deltas]):
+        previous.update(_latest_snapshots(_latest_snapshot_ids(product_ids=chunk)))
+
+    rows = [{'product_id': product_id,
+             'quantity': previous.get(product_id, 0) + int(delta),
+             'last_movement_id': cutoff,
+             'taken_at': now}
+            for product_id, delta in deltas]
+    db.session.execute(insert(StockSnapshot.__table__), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def record_opening_balances():
+    """
+    Writes an 'adjustment' movement for every product whose ledger total differs from
+    Product.quantity_in_stock (e.g. stock that existed before the ledger). Returns the row count.
+    """
+    ledger_totals = select(StockMovement.product_id, func.sum(StockMovement.quantity).label('quantity')) \
+        .group_by(StockMovement.product_id).subquery()
+    rows = db.session.execute(
+        select(Product.id, Product.warehouse_id,
+               (Product.quantity_in_stock - func.coalesce(ledger_totals.c.quantity, 0)).label('difference'))
+        .outerjoin(ledger_totals, Product.id == ledger_totals.c.product_id)
+        .where(Product.quantity_in_stock != func.coalesce(ledger_totals.c.quantity, 0))
+    ).all()
+    record_movements([{'product_id': row.id, 'movement_type': MOVEMENT_ADJUSTMENT, 'quantity': int(row.difference),
+                       'warehouse_id': row.warehouse_id, 'reference': 'Opening balance'} for row in rows])
+    db.session.commit()
+    return len(rows)
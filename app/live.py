@@ -0,0 +1,254 @@
+# app/live.py
+# Canlı gösterge paneli: bekleyen sipariş sayısı, düşük stok geçişleri ve bugünkü satışlar için
+# server-sent events (SSE).
+#
+# Açık panellerin her biri sayfayı yenileyip tüm toplamları yeniden çalıştırmak yerine
+# /dashboard/stream'e bağlanır. Süreç başına tek bir yayıncı (LivePublisher) vardır:
+# - Sipariş veya ürün yazan bir transaction commit edilince (ORM flush'ı ya da Core INSERT/UPDATE/
+#   DELETE) yayıncı uyarılır. LIVE_COALESCE_SECONDS içindeki değişiklikler tek hesaplamada birleşir.
+# - Yayıncı iş parçacığı toplamları bir kez hesaplar, önceki durumla karşılaştırır ve yalnızca
+#   farkı (delta) tüm abonelerin kuyruklarına dağıtır. Maliyet izleyici sayısından bağımsızdır.
+# - Diğer işçi süreçlerindeki değişiklikler ve gün dönümü LIVE_REFRESH_SECONDS'luk periyodik
+#   yenilemeyle yakalanır.
+# - Kuyruğu dolan yavaş istemcinin akışı kapatılır; tarayıcı (EventSource) yeniden bağlanır ve
+#   güncel durumu baştan alır. Akışlar LIVE_STREAM_SECONDS sonra kapanır, böylece işçi
+#   iş parçacıkları süresiz tutulmaz.
+# - gthread işçisinde her akış bir iş parçacığını tutar. LIVE_MAX_SUBSCRIBERS bu yüzden işçinin
+#   iş parçacığı sayısının altında tutulur; sınır 0 ise panel akış açmaz. gevent işçisinde akış bir
+#   greenlet'tir ve sınır yüzlerce akışa çıkarılabilir (config.py).
+import json
+import queue
+import threading
+import time
+from datetime import datetime, time as day_start
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select, func
+
+from app import db
+from app.models import Order, Product
+
+DEFAULTS = {
+    'LIVE_COALESCE_SECONDS': 0.5,
+    'LIVE_REFRESH_SECONDS': 30,
+    'LIVE_HEARTBEAT_SECONDS': 15,
+    'LIVE_STREAM_SECONDS': 300,
+    'LIVE_MAX_SUBSCRIBERS': 2,  # varsayılan 4 iş parçacıklı işçinin yarısı
+    'LIVE_QUEUE_SIZE': 100,
+    'LIVE_LOW_STOCK_LIST': 20,
+}
+
+# Bu tablolara yazan Core ifadeleri de paneli etkiler
+WATCHED_TABLES = {'orders', 'products'}
+
+_CHANGED_KEY = 'live_changed'
+
+
+class LiveUnavailable(Exception):
+    """Raised when the process already serves LIVE_MAX_SUBSCRIBERS streams."""
+
+
+def compute_state():
+    """Current dashboard figures: pending orders, low-stock products, today's order count and sales."""
+    today = datetime.combine(datetime.utcnow().date(), day_start.min)
+    pending = db.session.scalar(select(func.count(Order.id)).where(Order.status == 'Pending'))
+    orders_today, sales_today = db.session.execute(
+        select(func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0))
+        .where(Order.order_date >= today)).one()
+    low_stock = {row.id: {'id': row.id, 'name': row.name, 'quantity': row.quantity_in_stock}
+                 for row in db.session.execute(select(Product.id, Product.name, Product.quantity_in_stock)
+                                               .where(Product.quantity_in_stock <= Product.low_stock_threshold))}
+    return {'day': today.date().isoformat(), 'pending_orders': pending, 'orders_today': orders_today,
+            'sales_today': f'{sales_today:.2f}', 'low_stock': low_stock}
+
+
+def snapshot_event(state, list_limit):
+    listed = sorted(state['low_stock'].values(), key=lambda row: (row['quantity'], row['id']))[:list_limit]
+    return {'pending_orders': state['pending_orders'], 'orders_today': state['orders_today'],
+            'sales_today': state['sales_today'], 'low_stock_count': len(state['low_stock']),
+            'low_stock': listed}
+
+
+def diff_states(old, new, list_limit):
+    """Delta between two states; empty when nothing a dashboard shows has changed."""
+    delta = {key: new[key] for key in ('pending_orders', 'orders_today', 'sales_today') if old[key] != new[key]}
+    entered = new['low_stock'].keys() - old['low_stock'].keys()
+    left = old['low_stock'].keys() - new['low_stock'].keys()
+    if entered or left:
+        delta['low_stock'] = {
+            'count': len(new['low_stock']),
+            'entered': sorted((new['low_stock'][pid] for pid in entered), key=lambda row: row['id'])[:list_limit],
+            'left': sorted(left)[:list_limit],
+        }
+    return delta
+
+
+class _Subscriber:
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.closed = False
+
+
+class LivePublisher:
+    """Single per-process producer of dashboard deltas, fanned out to every open stream."""
+
+    def __init__(self, app):
+        self.app = app
+        self.settings = {name: app.config.get(name, default) for name, default in DEFAULTS.items()}
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._state = None
+        self._sequence = 0
+        self.computations = 0
+        self.events = 0
+        self.dropped = 0
+
+    def _ensure_thread(self):
+        # İş parçacığı ilk abonede başlatılır; gunicorn fork'undan önce başlamış olmaz
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-publisher', daemon=True)
+                self._thread.start()
+
+    def subscribe(self):
+        """Registers a stream; returns (subscriber, snapshot event). Call inside an app context."""
+        with self._lock:
+            if len(self._subscribers) >= self.settings['LIVE_MAX_SUBSCRIBERS']:
+                raise LiveUnavailable('Too many live dashboards are open. Refresh the page later.')
+        subscriber = _Subscriber(self.settings['LIVE_QUEUE_SIZE'])
+        # Abone, durumu okuduğu kilit içinde kaydolur; arada gelen notify() ya durumu siler ya da
+        # yenileme ister, abone hiçbir değişikliği kaçırmaz
+        with self._compute_lock:
+            if self._state is None:
+                self._state = compute_state()
+                self.computations += 1
+            state, sequence = self._state, self._sequence
+            with self._lock:
+                self._subscribers.add(subscriber)
+        self._ensure_thread()
+        return subscriber, (sequence, 'snapshot', snapshot_event(state, self.settings['LIVE_LOW_STOCK_LIST']))
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self):
+        """Called after a commit that touched orders or products."""
+        with self._compute_lock:
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                self._state = None  # izleyen yok; ilk abone güncel durumu hesaplar
+                return
+        self._changed.set()
+
+    def refresh(self):
+        """Recomputes the figures once and publishes the delta to all subscribers. Needs an app context."""
+        with self._compute_lock:
+            state = compute_state()
+            self.computations += 1
+            previous, self._state = self._state, state
+            if previous is None or previous['day'] != state['day']:
+                kind, data = 'snapshot', snapshot_event(state, self.settings['LIVE_LOW_STOCK_LIST'])
+            else:
+                kind, data = 'delta', diff_states(previous, state, self.settings['LIVE_LOW_STOCK_LIST'])
+                if not data:
+                    return None
+            self._sequence += 1
+            message = (self._sequence, kind, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.closed = True
+                self.unsubscribe(subscriber)
+                self.dropped += 1
+        self.events += 1
+        return message
+
+    def _run(self):
+        while True:
+            triggered = self._changed.wait(self.settings['LIVE_REFRESH_SECONDS'])
+            if triggered:
+                time.sleep(self.settings['LIVE_COALESCE_SECONDS'])  # art arda gelen commit'leri birleştir
+                self._changed.clear()
+            with self._lock:
+                if not self._subscribers:
+                    continue
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception as e:
+                self.app.logger.error(f'Live dashboard refresh failed: {e}')
+            finally:
+                with self.app.app_context():
+                    db.session.remove()
+
+    def snapshot(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {'subscribers': subscribers, 'computations': self.computations, 'events': self.events,
+                'dropped_slow_clients': self.dropped}
+
+
+def init_app(app):
+    app.extensions['live'] = LivePublisher(app)
+
+
+def _format(sequence, kind, data):
+    return f'id: {sequence}\nevent: {kind}\ndata: {json.dumps(data)}\n\n'
+
+
+def stream(publisher, subscriber, first_event):
+    """SSE body for one subscriber; runs without an app context or database session."""
+    settings = publisher.settings
+    deadline = time.monotonic() + settings['LIVE_STREAM_SECONDS']
+    try:
+        yield 'retry: 3000\n\n'
+        yield _format(*first_event)
+        while not subscriber.closed and time.monotonic() < deadline:
+            try:
+                message = subscriber.queue.get(timeout=min(settings['LIVE_HEARTBEAT_SECONDS'],
+                                                           max(deadline - time.monotonic(), 0.01)))
+            except queue.Empty:
+                yield ': heartbeat\n\n'  # proxy'ler boşta kalan bağlantıyı kapatmasın
+                continue
+            yield _format(*message)
+    finally:
+        publisher.unsubscribe(subscriber)
+
+
+# --- Değişiklik tespiti --------------------------------------------------------------------------
+
+@event.listens_for(db.session, 'after_flush')
+def _note_orm_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Order, Product)):
+            session.info[_CHANGED_KEY] = True
+            return
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _note_core_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in WATCHED_TABLES:
+            orm_execute_state.session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _notify_after_commit(session):
+    if session.info.pop(_CHANGED_KEY, None) and has_app_context():
+        publisher = current_app.extensions.get('live')
+        if publisher is not None:
+            publisher.notify()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_changes(session, previous_transaction):
+    session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,139 @@
+# app/lookups.py
+# Ürün formundaki tedarikçi/depo seçimi için arama yardımcıları.
+#
+# Formlar artık her açılışta tüm tedarikçi ve depoları yüklemez. Kayıt sayısı LOOKUP_SELECT_MAX'ı
+# aşmıyorsa (küçük kurulumlar) seçenek listesi süreç içinde önbelleğe alınır ve normal bir <select>
+# çizilir. Aşıyorsa alan, /suppliers/lookup ve /warehouses/lookup JSON uç noktalarından önek
+# aramasıyla beslenen bir typeahead olur. Gönderilen id her iki durumda da tek bir birincil anahtar
+# sorgusuyla doğrulanır (app/forms.py: RecordExists).
+#
+# Önbellek, aynı süreçte bir tedarikçi/depo eklenip değiştirildiğinde veya silindiğinde commit
+# sonrası temizlenir. Diğer işçi süreçlerinde en fazla LOOKUP_CACHE_SECONDS eski kalabilir.
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, select, func, case, or_, and_
+
+from app import db
+from app.models import Supplier, WarehouseLocation
+
+DEFAULTS = {
+    'LOOKUP_LIMIT': 20,
+    'LOOKUP_SELECT_MAX': 200,
+    'LOOKUP_CACHE_SECONDS': 300,
+}
+
+_DIRTY_KEY = 'lookups_dirty'
+
+Lookup = namedtuple('Lookup', 'model label order prefix_filter')
+
+
+def _warehouse_prefix(prefix):
+    # Adı olmayan depolar adresleriyle gösterilir ve aranır
+    return or_(WarehouseLocation.name.startswith(prefix, autoescape=True),
+               and_(WarehouseLocation.name == None, WarehouseLocation.address.startswith(prefix, autoescape=True)))
+
+
+LOOKUPS = {
+    'supplier': Lookup(Supplier, Supplier.name, (Supplier.name.asc(),),
+                       lambda prefix: Supplier.name.startswith(prefix, autoescape=True)),
+    'warehouse': Lookup(WarehouseLocation, func.coalesce(WarehouseLocation.name, WarehouseLocation.address),
+                        (case((WarehouseLocation.name == None, 1), else_=0),
+                         WarehouseLocation.name.asc(), WarehouseLocation.address.asc()),
+                        _warehouse_prefix),
+}
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+def search(kind, prefix, limit=None):
+    """[{'id', 'text'}] of the rows whose label starts with prefix (index-backed LIKE 'prefix%')."""
+    lookup = LOOKUPS[kind]
+    # SQLite'ta LIMIT -1 sınırsızdır; negatif limit tüm tabloyu döndürmesin
+    limit = max(1, min(int(limit or _setting('LOOKUP_LIMIT')), 100))
+    query = select(lookup.model.id, lookup.label).order_by(*lookup.order).limit(limit)
+    if prefix:
+        query = query.where(lookup.prefix_filter(prefix))
+    return [{'id': row_id, 'text': text} for row_id, text in db.session.execute(query)]
+
+
+def label_for(kind, row_id):
+    """Display text of the selected row, or None (a primary-key get, usually from the identity map)."""
+    if not row_id:
+        return None
+    obj = db.session.get(LOOKUPS[kind].model, row_id)
+    if obj is None:
+        return None
+    return obj.name if kind == 'supplier' else (obj.name or obj.address)
+
+
+class ChoiceCache:
+    """
+    In-process cache of full (id, label) choice lists. None is cached for tables too large
+    for a <select>, so the row count is not re-run on every form.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, kind, max_age):
+        with self._lock:
+            entry = self._entries.get(kind)
+        if entry and time.monotonic() - entry[0] < max_age:
+            return entry
+        return None
+
+    def put(self, kind, choices):
+        with self._lock:
+            self._entries[kind] = (time.monotonic(), choices)
+
+    def invalidate(self, kinds=None):
+        with self._lock:
+            for kind in list(kinds or self._entries):
+                self._entries.pop(kind, None)
+
+
+choice_cache = ChoiceCache()
+
+
+def cached_choices(kind):
+    """[(id, label)] for small tables; None when the field should be a typeahead."""
+    entry = choice_cache.get(kind, _setting('LOOKUP_CACHE_SECONDS'))
+    if entry is not None:
+        return entry[1]
+    lookup = LOOKUPS[kind]
+    max_rows = _setting('LOOKUP_SELECT_MAX')
+    # max_rows + 1 satır okumak, büyük tabloda COUNT(*) çalıştırmaktan ucuzdur
+    rows = db.session.execute(select(lookup.model.id, lookup.label).order_by(*lookup.order)
+                              .limit(max_rows + 1)).all()
+    choices = [tuple(row) for row in rows] if len(rows) <= max_rows else None
+    choice_cache.put(kind, choices)
+    return choices
+
+
+_KINDS_BY_MODEL = {lookup.model: kind for kind, lookup in LOOKUPS.items()}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _note_lookup_writes(session, flush_context):
+    kinds = {_KINDS_BY_MODEL[type(obj)] for obj in (*session.new, *session.dirty, *session.deleted)
+             if type(obj) in _KINDS_BY_MODEL}
+    if kinds:
+        session.info.setdefault(_DIRTY_KEY, set()).update(kinds)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    kinds = session.info.pop(_DIRTY_KEY, None)
+    if kinds:
+        choice_cache.invalidate(kinds)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_writes(session, previous_transaction):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,135 @@
+# app/main/async_reports.py
+# ASYNC_REPORTS açıkken main rapor view'larının async sürümleri (app/async_db.py engine'i ile).
+# Her view'daki birbirinden bağımsız sorgular fetch_concurrently() ile aynı anda çalışır.
+# Şablonlar senkron sürümlerle aynıdır; async oturum kapandıktan sonra tembel yükleme
+# yapılamayacağı için şablonun kullandığı ilişkiler sorguda önceden yüklenir.
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import render_template, request
+from flask_login import login_required
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import selectinload
+
+from app.async_db import fetch_concurrently
+from app.decorators import role_required
+from app.replica import read_replica
+from app.models import Product, WarehouseLocation, WarehouseStock
+from app.main.routes import warehouse_capacity_rows, recent_orders_cost, recent_orders_queries, \
+    profitable_products_queries
+
+
+def _warehouse_order():
+    return [case((WarehouseLocation.name == None, 1), else_=0),
+            WarehouseLocation.name.asc(), WarehouseLocation.address.asc()]
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'], cost='reports')
+@read_replica
+async def low_stock_report():
+    results = await fetch_concurrently(
+        products=select(Product).options(selectinload(Product.supplier_details))
+        .where(Product.quantity_in_stock <= Product.low_stock_threshold)
+        .order_by(Product.quantity_in_stock.asc())
+    )
+    return render_template('main/report_low_stock.html',
+                           title='Low Stock Products',
+                           products=results['products'])
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost='reports')
+@read_replica
+async def inventory_aging_report():
+    today = datetime.utcnow().date()
+    upcoming_expiry_limit = today + timedelta(days=30)
+    results = await fetch_concurrently(
+        expiring=select(Product).where(Product.expiry_date != None, Product.expiry_date >= today,
+                                       Product.expiry_date <= upcoming_expiry_limit)
+        .order_by(Product.expiry_date.asc()),
+        expired=select(Product).where(Product.expiry_date != None, Product.expiry_date < today)
+        .order_by(Product.expiry_date.desc()),
+    )
+    return render_template('main/report_inventory_aging.html',
+                           title='Inventory Aging Analysis',
+                           expiring_soon=results['expiring'],
+                           expired=results['expired'],
+                           today=today)
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'], cost='reports')
+@read_replica
+async def products_by_warehouse_report():
+    results = await fetch_concurrently(
+        warehouses=select(WarehouseLocation).order_by(*_warehouse_order()),
+        products=select(Product).where(Product.warehouse_id != None).order_by(Product.name),
+    )
+    products_by_warehouse = defaultdict(list)
+    for product in results['products']:
+        products_by_warehouse[product.warehouse_id].append(product)
+    warehouses_with_products = [{'warehouse': wh, 'products': products_by_warehouse.get(wh.id, [])}
+                                for wh in results['warehouses']]
+    return render_template('main/report_products_by_warehouse.html',
+                           title='Products by Warehouse',
+                           warehouses_with_products=warehouses_with_products)
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost=('reports', recent_orders_cost))
+@read_replica
+async def recent_orders_report():
+    days_to_look_back = request.args.get('days', 30, type=int)
+    if days_to_look_back <= 0 or days_to_look_back > 365: days_to_look_back = 30
+    start_date = datetime.utcnow() - timedelta(days=days_to_look_back)
+    orders, item_counts = recent_orders_queries(start_date)
+    results = await fetch_concurrently(orders=orders, item_counts=item_counts)
+    return render_template('main/report_recent_orders.html',
+                           title=f'Recent Orders (Last {days_to_look_back} Days)',
+                           orders=results['orders'],
+                           item_counts=dict(results['item_counts']),
+                           days_filter=days_to_look_back)
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost='reports')
+@read_replica
+async def most_profitable_products_report():
+    profitable, most_sold = profitable_products_queries()
+    results = await fetch_concurrently(profitable=profitable, most_sold=most_sold)
+    return render_template('main/report_most_profitable_products.html',
+                           title='Most Profitable Products (Top 10)',
+                           profitable_products=results['profitable'],
+                           most_sold_products=results['most_sold'])
+
+
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff'], cost='reports')
+@read_replica
+async def warehouse_capacity_report():
+    results = await fetch_concurrently(
+        warehouses=select(WarehouseLocation).order_by(*_warehouse_order()),
+        occupancy=select(WarehouseStock.warehouse_id, func.sum(WarehouseStock.quantity))
+        .group_by(WarehouseStock.warehouse_id),
+    )
+    return render_template('main/report_warehouse_capacity.html',
+                           title='Warehouse Capacity Analysis',
+                           warehouses_data=warehouse_capacity_rows(results['warehouses'],
+                                                                   dict(results['occupancy'])))
+
+
+ASYNC_REPORT_VIEWS = {
+    'main.low_stock_report': low_stock_report,
+    'main.inventory_aging_report': inventory_aging_report,
+    'main.products_by_warehouse_report': products_by_warehouse_report,
+    'main.recent_orders_report': recent_orders_report,
+    'main.most_profitable_products_report': most_profitable_products_report,
+    'main.warehouse_capacity_report': warehouse_capacity_report,
+}
+
+
+def install_async_reports(app):
+    """Replaces the sync report views with the async ones (URLs and endpoints stay the same)."""
+    for endpoint, view in ASYNC_REPORT_VIEWS.items():
+        app.view_functions[endpoint] = view
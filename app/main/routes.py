@@ -1,12 +1,37 @@
 # app/main/routes.py
-from flask import render_template, flash, redirect, url_for, request, abort
+import math
+from collections import defaultdict
+from flask import render_template, flash, redirect, url_for, request, abort, current_app, Response
 from flask_login import current_user, login_required
-from sqlalchemy import func, desc, asc, case, cast, Numeric, Date
+from sqlalchemy import select, func, desc, asc, case, cast, Numeric, Date
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 from app import db
 from app.main import bp
-from app.models import User, Product, Order, OrderItem, WarehouseLocation, Supplier
-from app.decorators import role_required
+from app.models import User, Product, Order, OrderItem, WarehouseLocation, Supplier, WarehouseStock
+from app.decorators import role_required, manager_or_admin_required
+from app.forms import EmptyForm
+from app.replica import read_replica
+from app.query_pool import run_concurrently, scalar, scalars, rows
+from app.replenishment import compute_reorder_plan, ReplenishmentError, FORECAST_METHODS
+from app.classification import get_classification, store_classification, ClassificationError, ABC_CLASSES, \
+    XYZ_CLASSES
+from app.live import LiveUnavailable, stream
+from app.archive import order_history, order_item_history
+
+# Canlı sayaçları (bekleyen siparişler, düşük stok, bugünkü satışlar) gösteren panel rolleri
+LIVE_DASHBOARD_ROLES = ['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam']
+
+
+def recent_orders_cost():
+    # Kabul denetimi ağırlığı: bakılan her 30 gün bir jeton (365 gün = 12)
+    days = request.args.get('days', 30, type=int)
+    return max(1, days // 30) if 0 < days <= 365 else 1
+
+
+def abc_xyz_cost():
+    # Önbellekteki sonuç ucuzdur; refresh=1 tüm dönemi yeniden hesaplar
+    return 5 if request.args.get('refresh') == '1' else 1
 
 
 @bp.route('/')
@@ -19,70 +44,95 @@ def index():
 @login_required
 def dashboard():
     user_role = current_user.role
-    dashboard_data = {}
-
-    dashboard_data['recent_user_orders'] = Order.query.filter_by(user_id=current_user.id) \
-        .order_by(Order.order_date.desc()) \
-        .limit(3).all()
-    dashboard_data['total_products_in_system'] = Product.query.count()
+    today_date = datetime.utcnow().date()
+    low_stock = Product.quantity_in_stock <= Product.low_stock_threshold
 
+    # Rolün ihtiyaç duyduğu sorgular bağımsız görevler olarak tanımlanır ve ayrı bağlantılarda
+    # aynı anda çalıştırılır (app/query_pool.py); süresi dolan sayaç varsayılan değerle gösterilir.
+    tasks = {
+        'recent_user_orders': scalars(select(Order).filter_by(user_id=current_user.id)
+                                      .order_by(Order.order_date.desc()).limit(3)),
+        'total_products_in_system': scalar(select(func.count(Product.id))),
+    }
     if user_role == 'Admin':
-        dashboard_data['total_users'] = User.query.count()
-        dashboard_data['pending_orders_count'] = Order.query.filter_by(status='Pending').count()
-        dashboard_data['total_suppliers'] = Supplier.query.count()
-        dashboard_data['total_warehouses'] = WarehouseLocation.query.count()
-        dashboard_data['latest_products'] = Product.query.order_by(Product.created_at.desc()).limit(5).all()
-        dashboard_data['all_system_orders_count'] = Order.query.count()
+        tasks.update({
+            'total_users': scalar(select(func.count(User.id))),
+            'pending_orders_count': scalar(select(func.count(Order.id)).filter_by(status='Pending')),
+            'total_suppliers': scalar(select(func.count(Supplier.id))),
+            'total_warehouses': scalar(select(func.count(WarehouseLocation.id))),
+            'latest_products': scalars(select(Product).order_by(Product.created_at.desc()).limit(5)),
+            'all_system_orders_count': scalar(select(func.count(Order.id))),
+        })
     elif user_role == 'WarehouseManager':
-        dashboard_data['low_stock_products_count'] = Product.query.filter(
-            Product.quantity_in_stock <= Product.low_stock_threshold).count()
-        dashboard_data['pending_orders_count'] = Order.query.filter_by(status='Pending').count()
-        dashboard_data['total_warehouses'] = WarehouseLocation.query.count()
-        dashboard_data['total_suppliers'] = Supplier.query.count()
-        today_date = datetime.utcnow().date()
         upcoming_expiry_limit = today_date + timedelta(days=30)
-        dashboard_data['expiring_soon_products'] = Product.query.filter(
-            Product.expiry_date != None,
-            Product.expiry_date >= today_date,
-            Product.expiry_date <= upcoming_expiry_limit
-        ).order_by(Product.expiry_date.asc()).limit(5).all()
+        tasks.update({
+            'low_stock_products_count': scalar(select(func.count(Product.id)).where(low_stock)),
+            'pending_orders_count': scalar(select(func.count(Order.id)).filter_by(status='Pending')),
+            'total_warehouses': scalar(select(func.count(WarehouseLocation.id))),
+            'total_suppliers': scalar(select(func.count(Supplier.id))),
+            'expiring_soon_products': scalars(select(Product).where(
+                Product.expiry_date != None,
+                Product.expiry_date >= today_date,
+                Product.expiry_date <= upcoming_expiry_limit
+            ).order_by(Product.expiry_date.asc()).limit(5)),
+        })
     elif user_role == 'InventoryStaff':
-        dashboard_data['low_stock_products_count'] = Product.query.filter(
-            Product.quantity_in_stock <= Product.low_stock_threshold).count()
-        today_date = datetime.utcnow().date()
         upcoming_expiry_limit_staff = today_date + timedelta(days=15)
-        dashboard_data['expiring_soon_count_staff'] = Product.query.filter(
-            Product.expiry_date != None,
-            Product.expiry_date >= today_date,
-            Product.expiry_date <= upcoming_expiry_limit_staff
-        ).count()
-        dashboard_data['total_products_in_stock_units'] = db.session.query(
-            func.sum(Product.quantity_in_stock)).scalar() or 0
+        tasks.update({
+            'low_stock_products_count': scalar(select(func.count(Product.id)).where(low_stock)),
+            'expiring_soon_count_staff': scalar(select(func.count(Product.id)).where(
+                Product.expiry_date != None,
+                Product.expiry_date >= today_date,
+                Product.expiry_date <= upcoming_expiry_limit_staff
+            )),
+            'total_products_in_stock_units': scalar(select(func.sum(Product.quantity_in_stock))),
+        })
     elif user_role == 'SalesTeam':
-        today_date = datetime.utcnow().date()
-        dashboard_data['orders_today_count'] = Order.query.filter(
-            cast(Order.order_date, Date) == today_date
-        ).count()
-        dashboard_data['sales_today_amount'] = db.session.query(func.sum(Order.total_amount)).filter(
-            cast(Order.order_date, Date) == today_date
-        ).scalar() or 0.0
-
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        dashboard_data['top_selling_products_30d'] = db.session.query(
-            Product.name,
-            Product.id.label('product_id'),
-            func.sum(OrderItem.quantity).label('total_sold')
-        ).join(OrderItem, Product.id == OrderItem.product_id) \
-            .join(Order, OrderItem.order_id == Order.id) \
-            .filter(Order.order_date >= thirty_days_ago) \
-            .group_by(Product.id, Product.name) \
-            .order_by(desc('total_sold')) \
-            .limit(5).all()
+        tasks.update({
+            'orders_today_count': scalar(select(func.count(Order.id)).where(
+                cast(Order.order_date, Date) == today_date
+            )),
+            'sales_today_amount': scalar(select(func.sum(Order.total_amount)).where(
+                cast(Order.order_date, Date) == today_date
+            ), default=0.0),
+            'top_selling_products_30d': rows(select(
+                Product.name,
+                Product.id.label('product_id'),
+                func.sum(OrderItem.quantity).label('total_sold')
+            ).join(OrderItem, Product.id == OrderItem.product_id)
+                .join(Order, OrderItem.order_id == Order.id)
+                .where(Order.order_date >= thirty_days_ago)
+                .group_by(Product.id, Product.name)
+                .order_by(desc('total_sold'))
+                .limit(5)),
+        })
+
+    dashboard_data, degraded = run_concurrently(tasks)
+    if degraded:
+        dashboard_data['degraded'] = degraded
 
     return render_template('main/dashboard.html',
                            title='Dashboard',
                            dashboard_data=dashboard_data,
-                           user_role=user_role)
+                           user_role=user_role,
+                           live=user_role in LIVE_DASHBOARD_ROLES and 'live' in current_app.extensions
+                           and current_app.extensions['live'].settings['LIVE_MAX_SUBSCRIBERS'] > 0)
+
+
+@bp.route('/dashboard/stream')
+@login_required
+@role_required(LIVE_DASHBOARD_ROLES)
+def dashboard_stream():
+    """Server-sent events with the dashboard's live counters (app/live.py)."""
+    publisher = current_app.extensions['live']
+    try:
+        subscriber, first_event = publisher.subscribe()
+    except LiveUnavailable as e:
+        return Response(str(e), status=503, headers={'Retry-After': '30'}, mimetype='text/plain')
+    # Gövde istek bittikten sonra üretilir; veritabanına dokunmaz, yalnızca kuyruğu okur
+    return Response(stream(publisher, subscriber, first_event), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 # --- Reports Section ---
@@ -95,9 +145,10 @@ def reports_index():
 
 @bp.route('/reports/low_stock')
 @login_required
-@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'])
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'], cost='reports')
+@read_replica
 def low_stock_report():
-    low_stock_products = Product.query.filter(
+    low_stock_products = Product.query.options(joinedload(Product.supplier_details)).filter(
         Product.quantity_in_stock <= Product.low_stock_threshold
     ).order_by(Product.quantity_in_stock.asc()).all()
     return render_template('main/report_low_stock.html',
@@ -107,7 +158,8 @@ def low_stock_report():
 
 @bp.route('/reports/inventory_aging')
 @login_required
-@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'])
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost='reports')
+@read_replica
 def inventory_aging_report():
     today = datetime.utcnow().date()
     upcoming_expiry_limit = today + timedelta(days=30)
@@ -129,80 +181,87 @@ def inventory_aging_report():
 
 @bp.route('/reports/products_by_warehouse')
 @login_required
-@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'])
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'], cost='reports')
+@read_replica
 def products_by_warehouse_report():
     warehouse_order_criteria = [
         case((WarehouseLocation.name == None, 1), else_=0),
         WarehouseLocation.name.asc(), WarehouseLocation.address.asc()
     ]
     warehouses = WarehouseLocation.query.order_by(*warehouse_order_criteria).all()
-    warehouses_with_products = []
-    for wh in warehouses:
-        sorted_products = sorted(wh.products_stored, key=lambda p: p.name)
-        warehouses_with_products.append({'warehouse': wh, 'products': sorted_products})
+    # Depo başına products_stored sorgusu yerine tüm ürünler tek sorguda alınıp gruplanır
+    products_by_warehouse = defaultdict(list)
+    for product in Product.query.filter(Product.warehouse_id != None).order_by(Product.name).all():
+        products_by_warehouse[product.warehouse_id].append(product)
+    warehouses_with_products = [{'warehouse': wh, 'products': products_by_warehouse.get(wh.id, [])}
+                                for wh in warehouses]
     return render_template('main/report_products_by_warehouse.html',
                            title='Products by Warehouse',
                            warehouses_with_products=warehouses_with_products)
 
 
+def recent_orders_queries(start_date):
+    """Orders since start_date (hot and archived, with the customer's username) and their line counts."""
+    history = order_history(start=start_date)
+    orders = select(history, User.username).outerjoin(User, User.id == history.c.user_id) \
+        .order_by(history.c.order_date.desc())
+    # Sipariş başına kalem sayısı tek gruplu sorguyla (sipariş başına COUNT yerine)
+    items = order_item_history(start=start_date)
+    item_counts = select(items.c.order_id, func.count()).group_by(items.c.order_id)
+    return orders, item_counts
+
+
+def profitable_products_queries():
+    """Top 10 products by profit and by units sold over the full (hot and archived) order history."""
+    items = order_item_history()
+    total_quantity_sold = func.sum(items.c.quantity).label('total_quantity_sold')
+    total_profit = func.sum(items.c.quantity * (cast(Product.price, Numeric) - cast(Product.purchase_price, Numeric))) \
+        .label('total_profit')
+    profitable = select(Product.name, Product.id.label('product_id'), total_quantity_sold, total_profit) \
+        .join(items, Product.id == items.c.product_id) \
+        .where(Product.purchase_price != None) \
+        .group_by(Product.id, Product.name).order_by(desc('total_profit')).limit(10)
+    most_sold = select(Product.name, Product.id.label('product_id'), total_quantity_sold) \
+        .join(items, Product.id == items.c.product_id) \
+        .group_by(Product.id, Product.name).order_by(desc('total_quantity_sold')).limit(10)
+    return profitable, most_sold
+
+
 @bp.route('/reports/recent_orders')
 @login_required
-@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'])
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost=('reports', recent_orders_cost))
+@read_replica
 def recent_orders_report():
     days_to_look_back = request.args.get('days', 30, type=int)
     if days_to_look_back <= 0 or days_to_look_back > 365: days_to_look_back = 30
     start_date = datetime.utcnow() - timedelta(days=days_to_look_back)
-    query = Order.query.filter(Order.order_date >= start_date)
-    recent_orders = query.order_by(Order.order_date.desc()).all()
+    orders_query, item_counts_query = recent_orders_queries(start_date)
+    recent_orders = db.session.execute(orders_query).all()
+    item_counts = dict(db.session.execute(item_counts_query).all())
     return render_template('main/report_recent_orders.html',
                            title=f'Recent Orders (Last {days_to_look_back} Days)',
                            orders=recent_orders,
+                           item_counts=item_counts,
                            days_filter=days_to_look_back)
 
 
 @bp.route('/reports/most_profitable_products')
 @login_required
-@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'])
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam', 'InventoryStaff'], cost='reports')
+@read_replica
 def most_profitable_products_report():
-    profitable_products_query = db.session.query(
-        Product.name, Product.id.label('product_id'),
-        func.sum(OrderItem.quantity).label('total_quantity_sold'),
-        func.sum(OrderItem.quantity * (cast(Product.price, Numeric) - cast(Product.purchase_price, Numeric))).label(
-            'total_profit')
-    ).join(OrderItem, Product.id == OrderItem.product_id) \
-        .filter(Product.purchase_price != None) \
-        .group_by(Product.id, Product.name) \
-        .order_by(desc('total_profit')) \
-        .limit(10).all()
-    most_sold_products_query = db.session.query(
-        Product.name, Product.id.label('product_id'),
-        func.sum(OrderItem.quantity).label('total_quantity_sold')
-    ).join(OrderItem, Product.id == OrderItem.product_id) \
-        .group_by(Product.id, Product.name) \
-        .order_by(desc('total_quantity_sold')) \
-        .limit(10).all()
+    profitable_query, most_sold_query = profitable_products_queries()
     return render_template('main/report_most_profitable_products.html',
                            title='Most Profitable Products (Top 10)',
-                           profitable_products=profitable_products_query,
-                           most_sold_products=most_sold_products_query)
+                           profitable_products=db.session.execute(profitable_query).all(),
+                           most_sold_products=db.session.execute(most_sold_query).all())
 
 
-@bp.route('/reports/warehouse_capacity')
-@login_required
-@role_required(['Admin', 'WarehouseManager', 'InventoryStaff'])
-def warehouse_capacity_report():
-    warehouse_order_criteria = [
-        case((WarehouseLocation.name == None, 1), else_=0),
-        WarehouseLocation.name.asc(), WarehouseLocation.address.asc()
-    ]
-    warehouses = WarehouseLocation.query.order_by(*warehouse_order_criteria).all()
+def warehouse_capacity_rows(warehouses, occupancy_by_warehouse):
     warehouse_data = []
     for wh in warehouses:
         if wh.capacity is not None and wh.capacity > 0:
-            current_occupancy_query = db.session.query(func.sum(Product.quantity_in_stock)) \
-                .filter(Product.warehouse_id == wh.id) \
-                .scalar()
-            current_occupancy = current_occupancy_query if current_occupancy_query is not None else 0
+            current_occupancy = occupancy_by_warehouse.get(wh.id) or 0
             occupancy_percentage = (current_occupancy / wh.capacity) * 100 if wh.capacity > 0 else 0
             warehouse_data.append({
                 'id': wh.id, 'name': wh.name if wh.name else wh.address,
@@ -215,6 +274,93 @@ def warehouse_capacity_report():
                 'capacity': wh.capacity if wh.capacity is not None else 'N/A',
                 'current_occupancy': 'N/A', 'occupancy_percentage': 'N/A'
             })
+    return warehouse_data
+
+
+@bp.route('/reports/warehouse_capacity')
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff'], cost='reports')
+@read_replica
+def warehouse_capacity_report():
+    warehouse_order_criteria = [
+        case((WarehouseLocation.name == None, 1), else_=0),
+        WarehouseLocation.name.asc(), WarehouseLocation.address.asc()
+    ]
+    warehouses = WarehouseLocation.query.order_by(*warehouse_order_criteria).all()
+    # Depo bazında doluluk: warehouse_stock üzerinde tek bir gruplu SUM
+    occupancy_by_warehouse = dict(db.session.query(WarehouseStock.warehouse_id, func.sum(WarehouseStock.quantity))
+                                  .group_by(WarehouseStock.warehouse_id).all())
+    warehouse_data = warehouse_capacity_rows(warehouses, occupancy_by_warehouse)
     return render_template('main/report_warehouse_capacity.html',
                            title='Warehouse Capacity Analysis',
-                           warehouses_data=warehouse_data)
\ No newline at end of file
+                           warehouses_data=warehouse_data)
+
+
+@bp.route('/reports/reorder_suggestions')
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff'], cost='reports')
+@read_replica
+def reorder_suggestions_report():
+    method = request.args.get('method') or None
+    days = request.args.get('days', type=int)
+    service_level = request.args.get('service_level', type=float)
+    try:
+        plan = compute_reorder_plan(method=method, history_days=days, service_level=service_level)
+    except ReplenishmentError as e:
+        flash(str(e), 'warning')
+        # Hatalı parametreler atılarak bir kez yeniden denenir; varsayılanlar da hatalıysa (yapılandırma)
+        # kendine yönlendirme döngüsüne girmeden rapor listesine dönülür
+        return redirect(url_for('main.reorder_suggestions_report' if request.args else 'main.reports_index'))
+    return render_template('main/report_reorder_suggestions.html',
+                           title='Reorder Suggestions',
+                           suppliers=plan.by_supplier(),
+                           parameters=plan.parameters,
+                           forecast_methods=FORECAST_METHODS)
+
+
+@bp.route('/reports/abc_xyz')
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam'], cost=('reports', abc_xyz_cost))
+@read_replica
+def abc_xyz_report():
+    days = request.args.get('days', type=int)
+    abc = request.args.get('abc') if request.args.get('abc') in ABC_CLASSES else None
+    xyz = request.args.get('xyz') if request.args.get('xyz') in XYZ_CLASSES else None
+    try:
+        result = get_classification(days, refresh=request.args.get('refresh') == '1')
+    except ClassificationError as e:
+        flash(str(e), 'warning')
+        # Yeniden sipariş raporundaki gibi: hatalı varsayılan dönem kendine yönlendirme döngüsü yapmaz
+        return redirect(url_for('main.abc_xyz_report' if request.args else 'main.reports_index'))
+    selected = result.select(abc=abc, xyz=xyz)
+    names = dict(db.session.query(Product.id, Product.name)
+                 .filter(Product.id.in_(result.product_ids[selected].tolist())).all())
+    products = [{'id': int(result.product_ids[i]), 'name': names.get(int(result.product_ids[i]), 'N/A'),
+                 'revenue': float(result.revenue[i]), 'cumulative_share': float(result.cumulative_share[i]) * 100,
+                 'cv': float(result.cv[i]) if math.isfinite(result.cv[i]) else None, 'abc': str(result.abc[i]), 'xyz': str(result.xyz[i])}
+                for i in selected]
+    return render_template('main/report_abc_xyz.html',
+                           title='ABC/XYZ Classification',
+                           result=result,
+                           matrix=result.matrix(),
+                           products=products,
+                           abc=abc, xyz=xyz,
+                           abc_classes=ABC_CLASSES, xyz_classes=XYZ_CLASSES,
+                           store_form=EmptyForm())
+
+
+@bp.route('/reports/abc_xyz/store', methods=['POST'])
+@login_required
+@manager_or_admin_required
+def store_abc_xyz_classes():
+    form = EmptyForm()
+    if not form.validate_on_submit():
+        abort(400)
+    days = request.form.get('days', type=int)
+    try:
+        updated = store_classification(get_classification(days))
+    except ClassificationError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('main.abc_xyz_report'))
+    flash(f'Classification saved to products ({updated} products changed class).', 'success')
+    return redirect(url_for('main.abc_xyz_report', days=days))
@@ -57,6 +57,7 @@ class Supplier(db.Model):
     name = db.Column(db.String(100), nullable=False, unique=True, index=True)
     contact = db.Column(db.String(100), nullable=True)
     address = db.Column(db.String(200), nullable=True)
+    lead_time_days = db.Column(db.Integer, nullable=True)  # Boşsa REPLENISHMENT_LEAD_TIME_DAYS kullanılır
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     products_supplied = db.relationship('Product', backref='supplier_details', lazy='dynamic')
@@ -69,7 +70,7 @@ class WarehouseLocation(db.Model):
     __tablename__ = 'warehouse_locations'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=True, index=True)
-    address = db.Column(db.String(200), nullable=False)
+    address = db.Column(db.String(200), nullable=False, index=True)  # adı olmayan depolar adresle aranır
     capacity = db.Column(db.Integer, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -83,6 +84,11 @@ class Product(db.Model):
     __tablename__ = 'products'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
+    # Stok kodu / barkod (el terminali taramaları, app/scan.py). Benzersizlik, SKU'su olmayan
+    # ürünler birbirini engellemesin diye yalnızca NULL olmayan değerler için uygulanır.
+    sku = db.Column(db.String(64), nullable=True)
+    # Depodaki raf konumu, "koridor-bölme[-kat]" (A-03-2); toplama rotaları bunu kullanır (app/picking.py)
+    bin = db.Column(db.String(20), nullable=True)
     category = db.Column(db.String(50), nullable=True)
     quantity_in_stock = db.Column(db.Integer, nullable=False, default=0)
     price = db.Column(db.Numeric(10, 2), nullable=False)  # Selling Price
@@ -90,14 +96,30 @@ class Product(db.Model):
     description = db.Column(db.Text, nullable=True)
     purchase_price = db.Column(db.Numeric(10, 2), nullable=True)  # Cost/Purchase Price
     low_stock_threshold = db.Column(db.Integer, default=10, nullable=False)
+    # ABC (ciro katkısı) / XYZ (talep değişkenliği) sınıfı; app/classification.py tarafından yazılır
+    abc_class = db.Column(db.String(1), nullable=True, index=True)
+    xyz_class = db.Column(db.String(1), nullable=True, index=True)
+    classified_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # İyimser kilitleme: her ORM UPDATE'i "WHERE version_id = <okunan değer>" ile yapılır ve
+    # sürümü bir artırır. Satırı toplu (Core) UPDATE ile değiştiren kod da sürümü artırmalıdır.
+    version_id = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
     warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse_locations.id'), nullable=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=True)
 
     order_items = db.relationship('OrderItem', backref='product_details', lazy='dynamic')
 
+    __mapper_args__ = {'version_id_col': version_id}
+    __table_args__ = (
+        # Koşullu stok düşümleri atlanırsa (ör. sürücünün satır sayısı güvenilmezse) eksi stok yazılamaz
+        db.CheckConstraint('quantity_in_stock >= 0', name='ck_products_quantity_in_stock'),
+        db.Index('ix_products_sku', 'sku', unique=True,
+                 mssql_where=sku.isnot(None), sqlite_where=sku.isnot(None), postgresql_where=sku.isnot(None)),
+    )
+
     def __repr__(self):
         return f'<Product {self.name}>'
 
@@ -114,6 +136,8 @@ class Order(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Siparişin atandığı toplama dalgası (app/waves.py); henüz planlanmadıysa NULL
+    wave_id = db.Column(db.Integer, db.ForeignKey('pick_waves.id'), nullable=True, index=True)
     items = db.relationship('OrderItem', backref='order_ref', lazy='dynamic', cascade="all, delete-orphan")
 
     def calculate_and_set_total(self):
@@ -133,8 +157,199 @@ class OrderItem(db.Model):
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
 
+    allocations = db.relationship('OrderItemAllocation', backref='order_item', lazy='select',
+                                  cascade="all, delete-orphan")
+
     def get_item_total(self):
         return self.quantity * self.price_at_order
 
     def __repr__(self):
-        return f'<OrderItem OrderID: {self.order_id} ProductID: {self.product_id} Qty: {self.quantity}>'
\ No newline at end of file
+        return f'<OrderItem OrderID: {self.order_id} ProductID: {self.product_id} Qty: {self.quantity}>'
+
+class ArchivedOrder(db.Model):
+    # Sıcak tablolardan taşınmış, ARCHIVE_AFTER_DAYS'ten eski Delivered/Cancelled/Returned siparişler
+    # (app/archive.py). Sütunlar ve id'ler orders ile aynıdır; geçmiş raporları ikisinin birleşimini okur.
+    __tablename__ = 'archived_orders'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_number = db.Column(db.String(50), unique=True, index=True, nullable=False)
+    order_date = db.Column(db.DateTime, nullable=False, index=True)
+    status = db.Column(db.String(50), nullable=False)
+    total_amount = db.Column(db.Numeric(12, 2), nullable=False)
+    notes = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    wave_id = db.Column(db.Integer, nullable=True)  # dalgalar ayrıca temizlenebilir; FK yok
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+
+class ArchivedOrderItem(db.Model):
+    __tablename__ = 'archived_order_items'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    price_at_order = db.Column(db.Numeric(10, 2), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('archived_orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+
+
+class ArchivedOrderItemAllocation(db.Model):
+    __tablename__ = 'archived_order_item_allocations'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_item_id = db.Column(db.Integer, db.ForeignKey('archived_order_items.id'), nullable=False, index=True)
+    warehouse_id = db.Column(db.Integer, nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+
+
+class WarehouseStock(db.Model):
+    # Ürünün depo bazında stoğu. Product.quantity_in_stock toplam stok olarak kalır;
+    # toplamın depolara atanmamış kısmı (varsa) "unassigned" stok sayılır.
+    __tablename__ = 'warehouse_stock'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse_locations.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    product = db.relationship('Product', backref=db.backref('warehouse_stock', lazy='dynamic',
+                                                            cascade="all, delete-orphan"))
+    warehouse = db.relationship('WarehouseLocation', backref=db.backref('stock_levels', lazy='dynamic'))
+
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'warehouse_id', name='uq_warehouse_stock_product_warehouse'),
+        db.CheckConstraint('quantity >= 0', name='ck_warehouse_stock_quantity'),
+    )
+
+    def __repr__(self):
+        return f'<WarehouseStock ProductID: {self.product_id} WarehouseID: {self.warehouse_id} Qty: {self.quantity}>'
+
+
+class OrderItemAllocation(db.Model):
+    # Sipariş kaleminin hangi depodan ne kadar karşılanacağı. warehouse_id NULL ise
+    # kalem depoya atanmamış stoktan karşılanmıştır.
+    __tablename__ = 'order_item_allocations'
+    id = db.Column(db.Integer, primary_key=True)
+    order_item_id = db.Column(db.Integer, db.ForeignKey('order_items.id'), nullable=False, index=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse_locations.id'), nullable=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    warehouse = db.relationship('WarehouseLocation')
+
+    def __repr__(self):
+        return f'<OrderItemAllocation ItemID: {self.order_item_id} WarehouseID: {self.warehouse_id} Qty: {self.quantity}>'
+
+
+class CycleCount(db.Model):
+    # Bir depodaki sayım (stock-take) oturumu; sayılan miktarlar cycle_count_lines'ta biriktirilir
+    __tablename__ = 'cycle_counts'
+    id = db.Column(db.Integer, primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse_locations.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='Open', index=True)  # Open, Applied, Cancelled
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime, nullable=True)
+    adjusted_products = db.Column(db.Integer, nullable=True)  # uygulanan düzeltme sayısı
+    net_adjustment = db.Column(db.Integer, nullable=True)     # düzeltmelerin toplamı (adet, işaretli)
+
+    warehouse = db.relationship('WarehouseLocation', backref=db.backref('cycle_counts', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<CycleCount #{self.id} WarehouseID: {self.warehouse_id} Status: {self.status}>'
+
+
+class CycleCountLine(db.Model):
+    # Sayım hazırlık (staging) tablosu: her gönderilen (ürün, sayılan miktar) satırı. Aynı ürün farklı
+    # raflarda ayrı ayrı sayılabilir; ürünün sayımı satırlarının toplamıdır.
+    __tablename__ = 'cycle_count_lines'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    count_id = db.Column(db.Integer, db.ForeignKey('cycle_counts.id'), nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    counted_qty = db.Column(db.Integer, nullable=False)
+    counted_by = db.Column(db.Integer, nullable=True)
+    counted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Fark hesabı sayım başına ürün bazında gruplar
+        db.Index('ix_cycle_count_lines_count_id_product_id', 'count_id', 'product_id'),
+    )
+
+
+class StockMovement(db.Model):
+    # Yalnızca ekleme yapılan stok hareket defteri. quantity işaretlidir (giriş +, çıkış -).
+    # product_id bilinçli olarak FK değildir: defter, silinen ürünlerin geçmişini de tutar.
+    __tablename__ = 'stock_movements'
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    movement_type = db.Column(db.String(20), nullable=False)  # receipt, sale, return, adjustment, transfer
+    quantity = db.Column(db.Integer, nullable=False)
+    warehouse_id = db.Column(db.Integer, nullable=True)
+    reference = db.Column(db.String(100), nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Anlık görüntüden sonraki "kuyruk" sorgusu: WHERE product_id = ? AND id > ?
+        db.Index('ix_stock_movements_product_id_id', 'product_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<StockMovement {self.movement_type} ProductID: {self.product_id} Qty: {self.quantity:+d}>'
+
+
+class StockSnapshot(db.Model):
+    # Ürün başına periyodik stok özeti: last_movement_id'ye kadarki tüm hareketlerin toplamı.
+    __tablename__ = 'stock_snapshots'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    last_movement_id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), nullable=False, index=True)
+    taken_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_stock_snapshots_product_id_taken_at', 'product_id', 'taken_at'),
+    )
+
+    def __repr__(self):
+        return f'<StockSnapshot ProductID: {self.product_id} Qty: {self.quantity} @ {self.taken_at}>'
+
+
+class PickWave(db.Model):
+    # Birlikte toplanmak üzere gruplanan bekleyen siparişler (app/waves.py). Building dalgalar yeni
+    # sipariş kabul eder; dolunca veya en eski siparişi WAVE_CUTOFF_MINUTES'ı aşınca Released olur.
+    __tablename__ = 'pick_waves'
+    id = db.Column(db.Integer, primary_key=True)
+    warehouse_id = db.Column(db.Integer, db.ForeignKey('warehouse_locations.id'), nullable=True, index=True)
+    status = db.Column(db.String(20), nullable=False, default='Building', index=True)  # Building, Released
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime, nullable=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    line_count = db.Column(db.Integer, nullable=False, default=0)  # sipariş kalemi sayısı
+    sku_count = db.Column(db.Integer, nullable=False, default=0)   # farklı ürün sayısı (toplama durağı)
+
+    warehouse = db.relationship('WarehouseLocation')
+    orders = db.relationship('Order', backref='wave', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<PickWave #{self.id} WarehouseID: {self.warehouse_id} {self.status} Orders: {self.order_count}>'
+
+
+class WavePlannerState(db.Model):
+    # Dalga planlayıcısının tek satırlık durumu: en son incelenen sipariş id'si (artımlı tarama imleci)
+    __tablename__ = 'wave_planner_state'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_order_id = db.Column(db.Integer, nullable=False, default=0)
+    ran_at = db.Column(db.DateTime, nullable=True)
+
+
+class OrderNumberNode(db.Model):
+    # Sipariş numarası düğüm id'si kiralaması (app/order_numbers.py); çalışan her süreç bir id tutar
+    __tablename__ = 'order_number_nodes'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    owner = db.Column(db.String(100), nullable=False)  # "host:pid"
+    leased_until = db.Column(db.DateTime, nullable=False)
+
+
+class ReplicaHeartbeat(db.Model):
+    # Birincilde periyodik olarak güncellenen tek satır; replikadaki değeri replikasyon gecikmesini gösterir
+    __tablename__ = 'replica_heartbeat'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    beat_at = db.Column(db.DateTime, nullable=False)
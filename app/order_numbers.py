@@ -0,0 +1,196 @@
+# app/order_numbers.py
+# Zamana göre sıralı, düğüm (süreç) bazlı, çakışmasız sipariş numaraları.
+#
+# Eskiden numara uuid4'ün ilk 8 hex karakteriydi (32 rastgele bit): on binlerce siparişte benzersiz
+# indekste çakışmaya ve başarısız ödemelere yol açıyor, rastgele anahtarlar da B-tree'yi
+# parçalıyordu. Yeni numara 64 bitlik bir değerdir:
+#
+#   41 bit: ORDER_NUMBER_EPOCH'tan beri geçen milisaniye (~69 yıl)
+#   10 bit: düğüm id'si (0-1023), aynı anda çalışan her süreç için farklı
+#   12 bit: aynı milisaniyedeki sıra (düğüm başına milisaniyede 4096 numara)
+#
+# ve 13 karakterlik Crockford base32 (0-9, A-Z; I, L, O, U hariç) olarak yazılır. Alfabe ASCII
+# sırasında olduğundan numaraların metin sırası üretim sırasıdır; yeni siparişler indeksin sonuna
+# eklenir. Numara üretmek veritabanına gitmez:
+# - Düğüm id'si ORDER_NUMBER_NODE_ID ile sabitlenebilir (tek sunucu, testler). Verilmezse süreç
+#   ilk numarada order_number_nodes tablosundan ORDER_NUMBER_LEASE_SECONDS süreli bir id kiralar
+#   ve sürenin yarısı dolunca yeniler. Kiralama ayrı bir bağlantıda, çağıranın transaction'ından
+#   bağımsız commit edilir. fork sonrası çocuk süreç ebeveynin id'sini kullanmaz, kendi id'sini alır.
+# - Saat geri giderse veya bir milisaniyede sıra taşarsa mantıksal saat son değerden ilerletilir;
+#   numaralar süreç içinde her zaman artar.
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import OrderNumberNode
+
+DEFAULTS = {
+    'ORDER_NUMBER_NODE_ID': None,
+    'ORDER_NUMBER_LEASE_SECONDS': 3600,
+}
+
+# 2025-01-01T00:00:00Z, milisaniye
+ORDER_NUMBER_EPOCH = 1735689600000
+
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+MAX_NODES = 1 << NODE_BITS
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WIDTH = 13  # 65 bit / 5
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+
+
+class OrderNumberError(Exception):
+    """Raised when no node id can be leased for this process."""
+
+
+def encode(value):
+    """Fixed-width Crockford base32; text order equals numeric order."""
+    chars = []
+    for _ in range(WIDTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(order_number):
+    """(milliseconds since the Unix epoch, node id, sequence) of a generated order number."""
+    value = 0
+    for char in order_number:
+        value = value * 32 + ALPHABET.index(char)
+    return ((value >> (NODE_BITS + SEQUENCE_BITS)) + ORDER_NUMBER_EPOCH,
+            (value >> SEQUENCE_BITS) & (MAX_NODES - 1), value & MAX_SEQUENCE)
+
+
+class OrderNumberGenerator:
+    """Thread-safe generator for one node id; needs no database access."""
+
+    def __init__(self, node_id, clock=time.time):
+        if not 0 <= node_id < MAX_NODES:
+            raise ValueError(f'Order number node id must be between 0 and {MAX_NODES - 1}.')
+        self.node_id = node_id
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_value(self):
+        with self._lock:
+            now_ms = int(self._clock() * 1000) - ORDER_NUMBER_EPOCH
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < MAX_SEQUENCE:
+                # Aynı milisaniye veya geri giden saat: son zaman damgasında kalınır
+                self._sequence += 1
+            else:
+                # Sıra taştı: beklemek yerine mantıksal saat bir milisaniye ilerletilir
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+
+    def next(self):
+        return encode(self.next_value())
+
+
+def generate_batch(node_id, count):
+    """count numbers from a fresh generator (used by the multi-process throughput test)."""
+    generator = OrderNumberGenerator(node_id)
+    return [generator.next() for _ in range(count)]
+
+
+# --- Düğüm id kiralama --------------------------------------------------------------------------
+
+def _owner():
+    return f'{socket.gethostname()}:{os.getpid()}'[:100]
+
+
+def _lease(owner, ttl, current=None):
+    """Renews `current` or leases a free node id; returns it. Each attempt commits on its own connection."""
+    table = OrderNumberNode.__table__
+    now = datetime.utcnow()
+    until = now + timedelta(seconds=ttl)
+    if current is not None:
+        with db.engine.begin() as conn:
+            renewed = conn.execute(update(table).where(table.c.id == current, table.c.owner == owner)
+                                   .values(leased_until=until)).rowcount
+        if renewed == 1:
+            return current
+    with db.engine.begin() as conn:
+        rows = conn.execute(select(table.c.id, table.c.leased_until)).all()
+    used = {node_id for node_id, _ in rows}
+    expired = sorted((leased_until, node_id) for node_id, leased_until in rows if leased_until < now)
+    for _, node_id in expired:
+        with db.engine.begin() as conn:
+            taken = conn.execute(update(table).where(table.c.id == node_id, table.c.leased_until < now)
+                                 .values(owner=owner, leased_until=until)).rowcount
+        if taken == 1:
+            return node_id
+    for node_id in range(MAX_NODES):
+        if node_id in used:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(table).values(id=node_id, owner=owner, leased_until=until))
+            return node_id
+        except IntegrityError:
+            continue  # aynı anda başka bir süreç aldı
+    raise OrderNumberError(f'All {MAX_NODES} order number node ids are leased.')
+
+
+class _ProcessNode:
+    """The generator of this process plus its lease; recreated after a fork."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pid = None
+        self.generator = None
+        self.owner = None
+        self.renew_at = None
+
+    def get(self):
+        fixed = current_app.config.get('ORDER_NUMBER_NODE_ID', DEFAULTS['ORDER_NUMBER_NODE_ID'])
+        with self._lock:
+            if self.pid != os.getpid():
+                self.pid, self.generator, self.renew_at = os.getpid(), None, None
+                self.owner = _owner()
+            if fixed is not None:
+                if self.generator is None or self.generator.node_id != fixed:
+                    self.generator, self.renew_at = OrderNumberGenerator(fixed), None
+                return self.generator
+            if self.renew_at is None or time.monotonic() >= self.renew_at:
+                ttl = current_app.config.get('ORDER_NUMBER_LEASE_SECONDS', DEFAULTS['ORDER_NUMBER_LEASE_SECONDS'])
+                node_id = _lease(self.owner, ttl, self.generator.node_id if self.generator else None)
+                if self.generator is None or self.generator.node_id != node_id:
+                    self.generator = OrderNumberGenerator(node_id)
+                self.renew_at = time.monotonic() + ttl / 2
+            return self.generator
+
+    def release(self):
+        """Gives the leased node id back (worker shutdown); the next process can take it at once."""
+        with self._lock:
+            if self.generator is None or self.pid != os.getpid() or self.renew_at is None:
+                return
+            table = OrderNumberNode.__table__
+            with db.engine.begin() as conn:
+                conn.execute(update(table).where(table.c.id == self.generator.node_id, table.c.owner == self.owner)
+                             .values(leased_until=datetime.utcnow()))
+            self.generator = None
+
+
+_node = _ProcessNode()
+
+
+def new_order_number():
+    """A new unique, time-ordered order number. Call inside an app context."""
+    return _node.get().next()
+
+
+def release_node():
+    _node.release()
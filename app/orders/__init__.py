@@ -3,4 +3,4 @@ from flask import Blueprint
 
 bp = Blueprint('orders', __name__, template_folder='templates', url_prefix='/orders')
 
-from app.orders import routes
\ No newline at end of file
+from app.orders import routes, commands
\ No newline at end of file
@@ -0,0 +1,251 @@
+# app/orders/bulk.py
+# Toplu sipariş alımı (EDI / marketplace beslemeleri).
+# Sepet akışındaki create_order'ın aksine burada satırlar tek tek ORM nesnesi olarak
+# işlenmez: stok tek sorguda okunur, Order/OrderItem satırları toplu INSERT ile eklenir
+# ve stok düşümleri ürün başına toplanarak tek bir executemany UPDATE ile uygulanır.
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import insert, select, update, bindparam
+
+from app import db
+from app.models import Product, Order, OrderItem, OrderItemAllocation, User
+from app.utils import chunked
+from app.ledger import record_movements, MOVEMENT_SALE
+from app.cdc import record_changes, OP_INSERT, OP_UPDATE
+from app.allocation import Allocator, AllocationError, load_stock_matrix, apply_allocations, split_allocations
+from app.order_numbers import new_order_number
+from app.concurrency import matched_rows
+
+MODE_ALL_OR_NOTHING = 'all_or_nothing'
+MODE_BEST_EFFORT = 'best_effort'
+INGEST_MODES = (MODE_ALL_OR_NOTHING, MODE_BEST_EFFORT)
+
+
+class BulkIngestError(Exception):
+    """Raised when a batch cannot be ingested at all (bad payload or stock race)."""
+
+
+def _load_products(product_ids):
+    """Returns {product_id: (name, price, quantity_in_stock)} for the given ids."""
+    products = {}
+    for chunk in chunked(product_ids):
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.price, Product.quantity_in_stock)
+            .where(Product.id.in_(chunk))
+        ).all()
+        for row in rows:
+            products[row.id] = (row.name, row.price, row.quantity_in_stock)
+    return products
+
+
+def _load_user_ids(user_ids):
+    found = set()
+    for chunk in chunked(user_ids):
+        found.update(db.session.execute(select(User.id).where(User.id.in_(chunk))).scalars())
+    return found
+
+
+def _parse_lines(raw_order):
+    """Normalizes the 'items' of one payload order; returns (lines, errors)."""
+    errors = []
+    lines = []
+    raw_items = raw_order.get('items') if isinstance(raw_order, dict) else None
+    if not raw_items or not isinstance(raw_items, list):
+        return [], ['Order has no items.']
+    for line_no, raw_item in enumerate(raw_items, start=1):
+        try:
+            product_id = int(raw_item['product_id'])
+            quantity = int(raw_item['quantity'])
+            price = raw_item.get('price')
+            price = Decimal(str(price)) if price is not None else None
+        except (KeyError, TypeError, ValueError, InvalidOperation, AttributeError):
+            errors.append(f'Line {line_no}: product_id and quantity must be integers, price must be a number.')
+            continue
+        if quantity <= 0:
+            errors.append(f'Line {line_no}: quantity must be at least 1.')
+            continue
+        if price is not None and price <= 0:
+            errors.append(f'Line {line_no}: price must be greater than 0.')
+            continue
+        lines.append({'product_id': product_id, 'quantity': quantity, 'price': price})
+    return lines, errors
+
+
+def ingest_orders(raw_orders, default_user_id, mode=MODE_ALL_OR_NOTHING):
+    """
+    Validates and inserts a batch of orders in a single transaction.
+
+    Each payload order is a dict: {'reference': str (optional), 'user_id': int (optional),
+    'notes': str (optional), 'items': [{'product_id': int, 'quantity': int, 'price': number (optional)}]}.
+    Lines without a price are charged the current Product.price.
+
+    In 'all_or_nothing' mode a single rejected order aborts the whole batch; in 'best_effort'
+    mode rejected orders are reported and the rest are committed. Returns a report dict with
+    one result entry per payload order, in payload order.
+    """
+    if mode not in INGEST_MODES:
+        raise BulkIngestError(f"Unknown ingest mode '{mode}'. Use one of: {', '.join(INGEST_MODES)}.")
+    if not isinstance(raw_orders, list) or not raw_orders:
+        raise BulkIngestError('Payload must contain a non-empty list of orders.')
+
+    # 1) Yapısal doğrulama, hiç sorgu atmadan
+    parsed = []
+    for index, raw_order in enumerate(raw_orders):
+        lines, errors = _parse_lines(raw_order)
+        raw_order = raw_order if isinstance(raw_order, dict) else {}
+        user_id = raw_order.get('user_id', default_user_id)
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            errors.append('user_id must be an integer.')
+        parsed.append({
+            'index': index,
+            'reference': raw_order.get('reference'),
+            'user_id': user_id,
+            'notes': raw_order.get('notes'),
+            'lines': lines,
+            'errors': errors,
+        })
+
+    # 2) Tüm ürünlerin stok/fiyat bilgisi ve kullanıcılar tek seferde
+    products = _load_products({line['product_id'] for entry in parsed for line in entry['lines']})
+    known_users = _load_user_ids({entry['user_id'] for entry in parsed if isinstance(entry['user_id'], int)})
+
+    # 3) Siparişler payload sırasıyla, kalan stok bellekte düşülerek doğrulanır ve kaynak depolar
+    #    aynı sırayla tüm dalga için tek bir stok matrisi üzerinden seçilir
+    available = {product_id: info[2] for product_id, info in products.items()}
+    allocator = Allocator(load_stock_matrix(products))
+    for entry in parsed:
+        if entry['errors']:
+            continue
+        if entry['user_id'] not in known_users:
+            entry['errors'].append(f"User {entry['user_id']} does not exist.")
+        requested = defaultdict(int)
+        for line in entry['lines']:
+            if line['product_id'] not in products:
+                entry['errors'].append(f"Product {line['product_id']} does not exist.")
+            else:
+                requested[line['product_id']] += line['quantity']
+        for product_id, quantity in requested.items():
+            if available[product_id] < quantity:
+                entry['errors'].append(
+                    f'Not enough stock for "{products[product_id][0]}" (ID: {product_id}). '
+                    f'Requested {quantity}, only {available[product_id]} available.')
+        if not entry['errors']:
+            entry['plan'] = allocator.allocate(dict(requested))
+            if entry['plan'] is None:
+                entry['errors'].append('Stock could not be allocated across warehouses.')
+                continue
+            for product_id, quantity in requested.items():
+                available[product_id] -= quantity
+
+    accepted = [entry for entry in parsed if not entry['errors']]
+    rejected_count = len(parsed) - len(accepted)
+    if mode == MODE_ALL_OR_NOTHING and rejected_count:
+        accepted = []
+
+    # 4) Toplu INSERT ve ürün başına toplanmış stok düşümü; hepsi tek transaction
+    if accepted:
+        order_rows = []
+        for entry in accepted:
+            total = Decimal('0.00')
+            for line in entry['lines']:
+                if line['price'] is None:
+                    line['price'] = products[line['product_id']][1]
+                total += line['quantity'] * line['price']
+            entry['order_number'] = new_order_number()
+            entry['total_amount'] = total
+            order_rows.append({
+                'order_number': entry['order_number'],
+                'user_id': entry['user_id'],
+                'status': 'Pending',
+                'total_amount': total,
+                'notes': entry['notes'],
+            })
+
+        try:
+            inserted = db.session.execute(
+                insert(Order).returning(Order.id, Order.order_number, sort_by_parameter_order=True),
+                order_rows
+            ).all()
+            order_ids = {row.order_number: row.id for row in inserted}
+
+            item_rows = []
+            item_pieces = []
+            decrements = defaultdict(int)
+            for entry in accepted:
+                entry['order_id'] = order_ids[entry['order_number']]
+                lines = [(line['product_id'], line['quantity']) for line in entry['lines']]
+                for line, pieces in zip(entry['lines'], split_allocations(lines, entry['plan'])):
+                    item_rows.append({
+                        'order_id': entry['order_id'],
+                        'product_id': line['product_id'],
+                        'quantity': line['quantity'],
+                        'price_at_order': line['price'],
+                    })
+                    item_pieces.append((entry['order_number'], line['product_id'], pieces))
+                    decrements[line['product_id']] += line['quantity']
+            item_ids = db.session.execute(
+                insert(OrderItem).returning(OrderItem.id, sort_by_parameter_order=True), item_rows
+            ).scalars().all()
+
+            allocation_rows = []
+            movement_rows = []
+            for item_id, (order_number, product_id, pieces) in zip(item_ids, item_pieces):
+                for warehouse_id, quantity in pieces:
+                    allocation_rows.append({'order_item_id': item_id, 'warehouse_id': warehouse_id,
+                                            'quantity': quantity})
+                    movement_rows.append({'product_id': product_id, 'movement_type': MOVEMENT_SALE,
+                                          'quantity': -quantity, 'warehouse_id': warehouse_id,
+                                          'reference': order_number})
+            db.session.execute(insert(OrderItemAllocation), allocation_rows)
+            apply_allocations([allocation for entry in accepted for allocation in entry['plan']])
+            record_movements(movement_rows)
+
+            # Koşullu UPDATE: doğrulamadan sonra stok başka bir işlemle düştüyse satır güncellenmez
+            products_table = Product.__table__
+            stock_update = update(products_table) \
+                .where(products_table.c.id == bindparam('b_product_id')) \
+                .where(products_table.c.quantity_in_stock >= bindparam('b_quantity')) \
+                .values(quantity_in_stock=products_table.c.quantity_in_stock - bindparam('b_quantity'),
+                        version_id=products_table.c.version_id + 1)
+            matched = matched_rows(
+                stock_update,
+                [{'b_product_id': product_id, 'b_quantity': quantity} for product_id, quantity in decrements.items()]
+            )
+            if matched < len(decrements):
+                raise BulkIngestError('Stock changed while the batch was being ingested. No orders were created.')
+            record_changes('orders', OP_INSERT, (dict(row, id=order_ids[row['order_number']]) for row in order_rows))
+            record_changes('order_items', OP_INSERT, (dict(row, id=item_id) for item_id, row in zip(item_ids, item_rows)))
+            record_changes('products', OP_UPDATE, ({'id': product_id} for product_id in decrements),
+                           changed=('quantity_in_stock', 'version_id'))
+            db.session.commit()
+        except AllocationError:
+            db.session.rollback()
+            raise BulkIngestError('Warehouse stock changed while the batch was being ingested. No orders were created.')
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # 5) Sipariş başına sonuç raporu
+    accepted_indexes = {entry['index'] for entry in accepted}
+    results = []
+    for entry in parsed:
+        result = {'index': entry['index'], 'reference': entry['reference']}
+        if entry['index'] in accepted_indexes:
+            result.update(status='created', order_id=entry['order_id'], order_number=entry['order_number'],
+                          total_amount=float(entry['total_amount']))
+        elif entry['errors']:
+            result.update(status='rejected', errors=entry['errors'])
+        else:
+            result.update(status='aborted', errors=['Batch aborted because another order was rejected.'])
+        results.append(result)
+
+    return {
+        'mode': mode,
+        'received': len(parsed),
+        'created': len(accepted),
+        'rejected': rejected_count,
+        'results': results,
+    }
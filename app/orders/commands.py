@@ -0,0 +1,97 @@
+# app/orders/commands.py
+# Orders blueprint'ine ait CLI komutları: `flask orders <komut>`
+import json
+import time
+
+import click
+from flask import current_app
+
+from app import db
+from app.orders import bp
+from app.orders.bulk import ingest_orders, BulkIngestError, INGEST_MODES, MODE_ALL_OR_NOTHING
+from app.orders.status import transition_orders, StatusTransitionError, ORDER_STATUSES
+from app.models import User
+from app.waves import plan_waves, WavePlannerBusy, DEFAULTS as WAVE_DEFAULTS
+from app.archive import archive_orders, ArchiveError
+
+
+@bp.cli.command('ingest')
+@click.argument('payload_file', type=click.File('r', encoding='utf-8'))
+@click.option('--user', 'username', required=True,
+              help='Username the orders are placed for when an order has no user_id.')
+@click.option('--mode', type=click.Choice(INGEST_MODES), default=MODE_ALL_OR_NOTHING, show_default=True)
+@click.option('--report', 'report_file', type=click.File('w', encoding='utf-8'), default=None,
+              help='Write the per-order JSON report to this file instead of stdout.')
+def ingest_command(payload_file, username, mode, report_file):
+    """Ingest a JSON file of orders (a list, or an object with an "orders" list)."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"User '{username}' not found.")
+    payload = json.load(payload_file)
+    raw_orders = payload.get('orders') if isinstance(payload, dict) else payload
+    try:
+        report = ingest_orders(raw_orders, default_user_id=user.id, mode=mode)
+    except BulkIngestError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Received {report['received']} orders: {report['created']} created, "
+               f"{report['rejected']} rejected ({mode}).", err=True)
+    click.echo(json.dumps(report, indent=2), file=report_file)
+
+
+
+@bp.cli.command('transition')
+@click.argument('new_status', type=click.Choice(ORDER_STATUSES))
+@click.argument('ids_file', type=click.File('r', encoding='utf-8'))
+def transition_command(new_status, ids_file):
+    """Move the orders listed in IDS_FILE (one id per line, '-' for stdin) to NEW_STATUS."""
+    order_ids = [line.strip() for line in ids_file if line.strip()]
+    try:
+        report = transition_orders(order_ids, new_status)
+    except StatusTransitionError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{report['updated']}/{report['requested']} orders moved to {new_status}, "
+               f"{len(report['skipped'])} skipped, {len(report['not_found'])} not found, "
+               f"{report['restocked_units']} units restocked across {report['restocked_products']} products.")
+
+
+@bp.cli.command('plan-waves')
+@click.option('--loop', is_flag=True, help='Keep running, planning every --interval seconds.')
+@click.option('--interval', type=float, default=None,
+              help='Seconds between runs with --loop (default: WAVE_INTERVAL_SECONDS).')
+def plan_waves_command(loop, interval):
+    """Batch new pending orders into pick waves and release full or overdue waves."""
+    interval = interval or current_app.config.get('WAVE_INTERVAL_SECONDS', WAVE_DEFAULTS['WAVE_INTERVAL_SECONDS'])
+    while True:
+        try:
+            summary = plan_waves()
+            click.echo(f"{summary['new_orders']} new orders planned, {summary['waves_created']} waves created, "
+                       f"{len(summary['released'])} released in {summary['seconds']}s.")
+        except WavePlannerBusy as e:
+            click.echo(str(e), err=True)
+        except Exception:
+            if not loop:
+                raise
+            # Geçici hatalar (ör. kopan bağlantı) zamanlanmış işi sonlandırmaz; sonraki turda yeniden denenir
+            db.session.rollback()
+            current_app.logger.exception('Wave planner run failed; retrying in %ss.', interval)
+        finally:
+            db.session.remove()
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@bp.cli.command('archive')
+@click.option('--days', type=int, default=None,
+              help='Archive closed orders older than this many days (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None, help='Orders moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches; rerun to continue.')
+def archive_command(days, batch_size, max_batches):
+    """Move old Delivered/Cancelled/Returned orders to the archive tables in batches."""
+    try:
+        summary = archive_orders(days=days, batch_size=batch_size, max_batches=max_batches)
+    except ArchiveError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{summary['orders']} orders ({summary['items']} lines) older than {summary['cutoff']} archived "
+               f"in {summary['batches']} batches, {summary['seconds']}s."
+               + ('' if summary['done'] else ' Stopped at --max-batches; run again to continue.'))
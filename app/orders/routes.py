@@ -1,17 +1,115 @@
 # app/orders/routes.py
-from flask import render_template, redirect, url_for, flash, session, abort, request, current_app
+from flask import render_template, redirect, url_for, flash, session, abort, request, current_app, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
 from app.orders import bp
-from app.models import Product, Order, OrderItem, User
+from app.orders.bulk import ingest_orders, BulkIngestError, MODE_ALL_OR_NOTHING
+from app.orders.status import transition_orders, StatusTransitionError, ConcurrentStatusChangeError, \
+    ALLOWED_TRANSITIONS
+from app.models import Product, Order, OrderItem, OrderItemAllocation, User, PickWave
+from app.concurrency import run_with_retry, StockConflictError
+from app.ledger import record_movements, mark_stock_accounted, MOVEMENT_SALE
+from app.allocation import allocate_wave, apply_allocations, split_allocations, AllocationError
+from app.forms import EmptyForm
+from app.picking import generate_pick_lists
+from app.order_numbers import new_order_number
+from app.waves import plan_waves, WavePlannerBusy
+from app.decorators import role_required, manager_or_admin_required, admission_controlled
 # from app.forms import OrderForm # Henüz OrderForm kullanmıyoruz
 
-import uuid  # For unique order numbers
 import traceback  # For detailed error logging
 
 
+def _place_order_from_cart(cart):
+    """
+    Checks stock, creates the order with its items and decrements stock, then commits.
+    Returns (order, None) on success or (None, (message, category)) when the cart is invalid.
+    Product.version_id makes the commit fail with StaleDataError if stock changed concurrently.
+    """
+    new_order = Order(
+        order_number=new_order_number(),
+        user_id=current_user.id,
+        status='Pending'
+        # shipping_address=form.shipping_address.data (if using OrderForm)
+        # notes=form.notes.data (if using OrderForm)
+    )
+
+    total_order_amount = 0.0
+    items_to_process = []  # To store product and quantity for stock update after checks
+
+    # Stok kritik yol: ürün önbelleği kullanılmaz. Sepetteki tüm ürünler birincilden tek sorguyla
+    # kimlik haritasına yüklenir; aşağıdaki get'ler veritabanına gitmez.
+    product_ids = [int(product_id_str) for product_id_str in cart]
+    db.session.scalars(select(Product).where(Product.id.in_(product_ids))).all()
+
+    # First pass: Check stock and gather items
+    for product_id_str, item_data in cart.items():
+        product_id = int(product_id_str)
+        product = db.session.get(Product, product_id)
+
+        if not product:
+            return None, (f"Product '{item_data.get('name', 'Unknown')}' (ID: {product_id}) could not be found. Order creation failed.",
+                          "danger")
+
+        quantity_ordered = int(item_data['quantity'])  # Ensure quantity is int
+        price_at_order = float(item_data['price'])  # Ensure price is float
+
+        if product.quantity_in_stock < quantity_ordered:
+            return None, (f'Not enough stock for "{product.name}". Only {product.quantity_in_stock} available. Please update your cart. Order creation failed.',
+                          'danger')
+
+        items_to_process.append({
+            'product_obj': product,  # Store the actual product object
+            'quantity': quantity_ordered,
+            'price_at_order': price_at_order
+        })
+        total_order_amount += quantity_ordered * price_at_order
+
+    if not items_to_process:  # Should not happen if cart was not empty and no errors above
+        return None, ('No valid items to process for the order.', 'warning')
+
+    # Kaynak depoların seçimi: mümkünse tek depodan, değilse stok/kapasiteye göre bölünerek
+    plan = allocate_wave([{item['product_obj'].id: item['quantity'] for item in items_to_process}])[0]
+    if plan is None:
+        return None, ('Stock for your cart could not be allocated across our warehouses. Please try again.', 'danger')
+    product_ids = [item['product_obj'].id for item in items_to_process]
+    mark_stock_accounted(product_ids)  # depo stoğu ve defter satırları burada yazılıyor
+    apply_allocations(plan)
+
+    # If all checks passed, proceed to create order and items, and update stock
+    new_order.total_amount = total_order_amount
+    db.session.add(new_order)  # Add order to session first
+
+    line_pieces = split_allocations([(item['product_obj'].id, item['quantity']) for item in items_to_process], plan)
+    movement_rows = []
+    for item_info, pieces in zip(items_to_process, line_pieces):
+        order_item = OrderItem(
+            order_ref=new_order,  # Corresponds to backref in Order.items
+            product_details=item_info['product_obj'],  # Corresponds to backref in Product.order_items
+            quantity=item_info['quantity'],
+            price_at_order=item_info['price_at_order']
+        )
+        for warehouse_id, quantity in pieces:
+            order_item.allocations.append(OrderItemAllocation(warehouse_id=warehouse_id, quantity=quantity))
+            movement_rows.append({'product_id': item_info['product_obj'].id, 'movement_type': MOVEMENT_SALE,
+                                  'quantity': -quantity, 'warehouse_id': warehouse_id,
+                                  'reference': new_order.order_number})
+        new_order.items.append(order_item)  # This also stages order_item for addition
+
+        # Update stock (UPDATE ... WHERE id = ? AND version_id = ?)
+        item_info['product_obj'].quantity_in_stock -= item_info['quantity']
+
+    record_movements(movement_rows)
+    db.session.commit()  # Commit all changes: new order, new order_items, updated product stocks
+    return new_order, None
+
+
 @bp.route('/create', methods=['GET', 'POST'])
 @login_required
+@admission_controlled(('checkout', lambda: 1 if request.method == 'POST' else 0))  # yalnızca POST sipariş verir
 def create_order():
     cart = session.get('cart', {})
     if not cart:
@@ -20,72 +118,14 @@ def create_order():
 
     if request.method == 'POST':
         try:
-            new_order = Order(
-                order_number=str(uuid.uuid4()).split('-')[0].upper(),
-                user_id=current_user.id,
-                status='Pending'
-                # shipping_address=form.shipping_address.data (if using OrderForm)
-                # notes=form.notes.data (if using OrderForm)
-            )
-
-            total_order_amount = 0.0
-            items_to_process = []  # To store product and quantity for stock update after checks
-
-            # First pass: Check stock and gather items
-            for product_id_str, item_data in cart.items():
-                product_id = int(product_id_str)
-                product = db.session.get(Product, product_id)
-
-                if not product:
-                    flash(
-                        f"Product '{item_data.get('name', 'Unknown')}' (ID: {product_id}) could not be found. Order creation failed.",
-                        "danger")
-                    # No rollback here yet, just redirect
-                    return redirect(url_for('cart.view_cart'))
-
-                quantity_ordered = int(item_data['quantity'])  # Ensure quantity is int
-                price_at_order = float(item_data['price'])  # Ensure price is float
-
-                if product.quantity_in_stock < quantity_ordered:
-                    flash(
-                        f'Not enough stock for "{product.name}". Only {product.quantity_in_stock} available. Please update your cart. Order creation failed.',
-                        'danger')
-                    return redirect(url_for('cart.view_cart'))
-
-                items_to_process.append({
-                    'product_obj': product,  # Store the actual product object
-                    'quantity': quantity_ordered,
-                    'price_at_order': price_at_order
-                })
-                total_order_amount += quantity_ordered * price_at_order
-
-            if not items_to_process:  # Should not happen if cart was not empty and no errors above
-                flash('No valid items to process for the order.', 'warning')
+            # Stok eşzamanlı değiştiyse (StaleDataError) sepet taze verilerle yeniden doğrulanır
+            new_order, error = run_with_retry('create_order', lambda: _place_order_from_cart(cart),
+                                              retry_on=(StaleDataError, AllocationError))
+            if error:
+                db.session.rollback()
+                flash(*error)
                 return redirect(url_for('cart.view_cart'))
 
-            # If all checks passed, proceed to create order and items, and update stock
-            new_order.total_amount = total_order_amount
-            db.session.add(new_order)  # Add order to session first
-
-            for item_info in items_to_process:
-                order_item = OrderItem(
-                    # DÜZELTİLMİŞ KISIM: Doğru backref isimlerini kullan
-                    order_ref=new_order,  # Corresponds to backref in Order.items
-                    product_details=item_info['product_obj'],  # Corresponds to backref in Product.order_items
-                    quantity=item_info['quantity'],
-                    price_at_order=item_info['price_at_order']
-                )
-                # Adding order_item to new_order.items collection is usually handled by SQLAlchemy
-                # when new_order is added to session, due to the relationship and cascade settings.
-                # Explicitly adding can be done if needed: db.session.add(order_item)
-                # Or append to the collection if that's preferred for clarity:
-                new_order.items.append(order_item)  # This also stages order_item for addition
-
-                # Update stock
-                item_info['product_obj'].quantity_in_stock -= item_info['quantity']
-
-            db.session.commit()  # Commit all changes: new order, new order_items, updated product stocks
-
             # Clear the cart from session
             session.pop('cart', None)
             session.modified = True
@@ -93,6 +133,9 @@ def create_order():
             flash(f'Your order #{new_order.order_number} has been placed successfully!', 'success')
             return redirect(url_for('orders.order_detail', order_id=new_order.id))
 
+        except StockConflictError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('cart.view_cart'))
         except Exception as e:
             db.session.rollback()  # Rollback in case of any error during the process
             current_app.logger.error(f"Order creation error: {e}\n{traceback.format_exc()}")
@@ -138,9 +181,14 @@ def list_orders():
     orders_pagination = query.order_by(Order.order_date.desc()) \
         .paginate(page=page, per_page=10, error_out=False)
     orders_items = orders_pagination.items
+    # Sayfadaki siparişlerin kalem sayıları tek gruplu sorguyla (sipariş başına COUNT yerine)
+    item_counts = dict(db.session.query(OrderItem.order_id, func.count(OrderItem.id))
+                       .filter(OrderItem.order_id.in_([order.id for order in orders_items]))
+                       .group_by(OrderItem.order_id).all()) if orders_items else {}
     return render_template('orders/list_orders.html',
                            title='My Orders' if current_user.role != 'Admin' else 'All Orders',
                            orders=orders_items,
+                           item_counts=item_counts,
                            pagination=orders_pagination)
 
 
@@ -151,4 +199,114 @@ def order_detail(order_id):
     # Allow user to see their own order, or admin to see any order
     if order.user_id != current_user.id and current_user.role != 'Admin':  # Replace 'Admin'
         abort(403)  # Forbidden
-    return render_template('orders/order_detail.html', title=f'Order #{order.order_number}', order=order)
\ No newline at end of file
+    items = order.items.options(joinedload(OrderItem.product_details)).all()
+    return render_template('orders/order_detail.html', title=f'Order #{order.order_number}', order=order,
+                           items=items,
+                           status_form=EmptyForm(),
+                           next_statuses=ALLOWED_TRANSITIONS.get(order.status, ()))
+
+
+@bp.route('/<int:order_id>/status', methods=['POST'])
+@login_required
+@manager_or_admin_required
+def update_order_status(order_id):
+    form = EmptyForm()
+    if not form.validate_on_submit():
+        abort(400)
+    new_status = request.form.get('new_status', '')
+    try:
+        report = transition_orders([order_id], new_status)
+    except StatusTransitionError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('orders.order_detail', order_id=order_id))
+    if report['not_found']:
+        abort(404)
+    if report['updated']:
+        flash(f'Order status updated to {new_status}.', 'success')
+    else:
+        flash(f"Order cannot be moved from {report['skipped'][0]['status']} to {new_status}.", 'warning')
+    return redirect(url_for('orders.order_detail', order_id=order_id))
+
+
+PICKING_ROLES = ['Admin', 'WarehouseManager', 'InventoryStaff']
+
+
+def _pick_list_args():
+    return {'max_orders': request.args.get('limit', type=int),
+            'warehouse_id': request.args.get('warehouse', type=int),
+            'wave_id': request.args.get('wave', type=int)}
+
+
+@bp.route('/pick-lists')
+@login_required
+@role_required(PICKING_ROLES, cost='reports')
+def pick_lists():
+    # Bekleyen siparişlerin depo bazında, raf rotasına göre sıralanmış yazdırılabilir toplama listeleri
+    args = _pick_list_args()
+    result = generate_pick_lists(**args)
+    title = f"Pick Lists: Wave #{args['wave_id']}" if args['wave_id'] else 'Pick Lists'
+    return render_template('orders/pick_lists.html', title=title, result=result)
+
+
+@bp.route('/api/pick-lists')
+@login_required
+@role_required(PICKING_ROLES, cost='reports')
+def api_pick_lists():
+    return jsonify(generate_pick_lists(**_pick_list_args()))
+
+
+@bp.route('/waves', methods=['GET', 'POST'])
+@login_required
+@role_required(PICKING_ROLES)
+def waves():
+    form = EmptyForm()
+    if form.validate_on_submit():
+        # Zamanlanmış planlayıcıyı beklemeden hemen bir çalışma
+        if current_user.role not in ('Admin', 'WarehouseManager'):
+            abort(403)
+        try:
+            summary = plan_waves()
+            flash(f"{summary['new_orders']} new orders planned, {len(summary['released'])} waves released.", 'success')
+        except WavePlannerBusy as e:
+            flash(str(e), 'warning')
+        return redirect(url_for('orders.waves'))
+    recent = PickWave.query.options(joinedload(PickWave.warehouse)) \
+        .order_by(PickWave.status, PickWave.id.desc()).limit(50).all()
+    return render_template('orders/waves.html', title='Pick Waves', waves=recent, form=form)
+
+
+@bp.route('/api/bulk', methods=['POST'])
+@login_required
+@role_required(['Admin', 'WarehouseManager', 'SalesTeam'], cost='bulk')
+def bulk_ingest_orders():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object with an "orders" list.'}), 400
+    mode = payload.get('mode', MODE_ALL_OR_NOTHING)
+    try:
+        report = ingest_orders(payload.get('orders'), default_user_id=current_user.id, mode=mode)
+    except BulkIngestError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Bulk order ingestion error: {e}\n{traceback.format_exc()}")
+        return jsonify({'error': 'An error occurred while ingesting the batch. No orders were created.'}), 500
+    # Hepsi-ya-hiç modunda reddedilen bir sipariş varsa 422, aksi halde 200
+    status_code = 422 if report['mode'] == MODE_ALL_OR_NOTHING and report['rejected'] else 200
+    return jsonify(report), status_code
+
+
+
+@bp.route('/api/status', methods=['POST'])
+@login_required
+@role_required(['Admin', 'WarehouseManager'], cost='bulk')
+def bulk_update_order_status():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('order_ids'), list):
+        return jsonify({'error': 'Request body must be a JSON object with "order_ids" and "status".'}), 400
+    try:
+        report = transition_orders(payload['order_ids'], payload.get('status'))
+    except ConcurrentStatusChangeError as e:
+        return jsonify({'error': str(e)}), 409
+    except StatusTransitionError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report), 200
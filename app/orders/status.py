@@ -0,0 +1,150 @@
+# app/orders/status.py
+# Sipariş durum akışı: Pending → Processing → Shipped → Delivered, ayrıca Cancelled / Returned.
+# Geçişler seçili siparişler üzerinde tek bir set-based UPDATE ile yapılır; iptal ve iadelerde
+# stok, kalem kalem değil ürün başına toplanmış miktarlarla geri yüklenir.
+from collections import defaultdict
+
+from sqlalchemy import select, update, bindparam, func
+
+from app import db
+from app.models import Product, Order, OrderItem, OrderItemAllocation
+from app.utils import chunked
+from app.ledger import record_movements, MOVEMENT_RETURN
+from app.cdc import record_changes, OP_UPDATE
+from app.allocation import restore_allocations
+
+ORDER_STATUSES = ('Pending', 'Processing', 'Shipped', 'Delivered', 'Cancelled', 'Returned')
+
+# Mevcut durum -> geçilebilecek durumlar. Cancelled ve Returned son durumlardır.
+ALLOWED_TRANSITIONS = {
+    'Pending': ('Processing', 'Cancelled'),
+    'Processing': ('Shipped', 'Cancelled'),
+    'Shipped': ('Delivered', 'Returned'),
+    'Delivered': ('Returned',),
+    'Cancelled': (),
+    'Returned': (),
+}
+
+# Bu durumlara geçen siparişlerin kalemleri stoğa geri döner
+STOCK_RESTORING_STATUSES = ('Cancelled', 'Returned')
+
+
+class StatusTransitionError(Exception):
+    """Raised when a transition request is invalid."""
+
+
+class ConcurrentStatusChangeError(StatusTransitionError):
+    """Raised when selected orders changed status between the read and the UPDATE."""
+
+
+def allowed_source_statuses(new_status):
+    return [status for status, targets in ALLOWED_TRANSITIONS.items() if new_status in targets]
+
+
+def transition_orders(order_ids, new_status):
+    """
+    Moves the given orders to new_status in one transaction.
+
+    Only orders whose current status allows the transition are updated; the others are
+    reported as skipped. When new_status restores stock, quantities of the transitioned
+    orders' items are summed per product and written back with one UPDATE per product.
+    """
+    if new_status not in ORDER_STATUSES:
+        raise StatusTransitionError(f"Unknown order status '{new_status}'.")
+    try:
+        order_ids = sorted({int(order_id) for order_id in order_ids})
+    except (TypeError, ValueError):
+        raise StatusTransitionError('order_ids must be a list of integers.')
+    if not order_ids:
+        raise StatusTransitionError('No orders selected.')
+
+    sources = allowed_source_statuses(new_status)
+    restores_stock = new_status in STOCK_RESTORING_STATUSES
+
+    current_statuses = {}
+    for chunk in chunked(order_ids):
+        current_statuses.update(db.session.execute(
+            select(Order.id, Order.status).where(Order.id.in_(chunk))
+        ).all())
+
+    eligible = [order_id for order_id in order_ids if current_statuses.get(order_id) in sources]
+    restored = defaultdict(int)
+    restored_allocations = []
+    movement_rows = []
+    try:
+        for chunk in chunked(eligible):
+            # Durum koşulu WHERE içinde de tekrarlanır; okuma ile yazma arasında başka bir
+            # işlem siparişi değiştirdiyse satır sayısı tutmaz ve transaction geri alınır.
+            result = db.session.execute(
+                update(Order)
+                .where(Order.id.in_(chunk), Order.status.in_(sources))
+                .values(status=new_status)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount is not None and 0 <= result.rowcount < len(chunk):
+                raise ConcurrentStatusChangeError('Some orders changed status concurrently. No orders were updated.')
+            if restores_stock:
+                quantities = db.session.execute(
+                    select(Order.order_number, OrderItem.product_id, func.sum(OrderItem.quantity))
+                    .join(Order, OrderItem.order_id == Order.id)
+                    .where(OrderItem.order_id.in_(chunk))
+                    .group_by(Order.order_number, OrderItem.product_id)
+                ).all()
+                allocated = db.session.execute(
+                    select(Order.order_number, OrderItem.product_id, OrderItemAllocation.warehouse_id,
+                           func.sum(OrderItemAllocation.quantity))
+                    .join(OrderItem, OrderItemAllocation.order_item_id == OrderItem.id)
+                    .join(Order, OrderItem.order_id == Order.id)
+                    .where(OrderItem.order_id.in_(chunk))
+                    .group_by(Order.order_number, OrderItem.product_id, OrderItemAllocation.warehouse_id)
+                ).all()
+                pieces = defaultdict(list)
+                for order_number, product_id, warehouse_id, quantity in allocated:
+                    pieces[(order_number, product_id)].append((warehouse_id, int(quantity)))
+                for order_number, product_id, quantity in quantities:
+                    quantity = int(quantity)
+                    restored[product_id] += quantity
+                    # Dağıtım kaydı olmayan (eski) siparişlerin stoğu depoya atanmamış stok olarak döner
+                    order_pieces = pieces.get((order_number, product_id), [])
+                    unallocated = quantity - sum(piece_quantity for _, piece_quantity in order_pieces)
+                    if unallocated > 0:
+                        order_pieces = order_pieces + [(None, unallocated)]
+                    for warehouse_id, piece_quantity in order_pieces:
+                        restored_allocations.append((product_id, warehouse_id, piece_quantity))
+                        movement_rows.append({'product_id': product_id, 'movement_type': MOVEMENT_RETURN,
+                                              'quantity': piece_quantity, 'warehouse_id': warehouse_id,
+                                              'reference': f'{order_number} ({new_status})'})
+
+        if restored:
+            products_table = Product.__table__
+            db.session.execute(
+                update(products_table)
+                .where(products_table.c.id == bindparam('b_product_id'))
+                .values(quantity_in_stock=products_table.c.quantity_in_stock + bindparam('b_quantity'),
+                        version_id=products_table.c.version_id + 1),
+                [{'b_product_id': product_id, 'b_quantity': quantity} for product_id, quantity in restored.items()]
+            )
+            restore_allocations(restored_allocations)
+            record_movements(movement_rows)
+            record_changes('products', OP_UPDATE, ({'id': product_id} for product_id in restored),
+                           changed=('quantity_in_stock', 'version_id'))
+        record_changes('orders', OP_UPDATE, ({'id': order_id, 'status': new_status} for order_id in eligible),
+                       changed=('status',))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    eligible_set = set(eligible)
+    skipped = [{'order_id': order_id, 'status': current_statuses[order_id]}
+               for order_id in order_ids if order_id in current_statuses and order_id not in eligible_set]
+    return {
+        'status': new_status,
+        'requested': len(order_ids),
+        'updated': len(eligible),
+        'updated_order_ids': eligible,
+        'skipped': skipped,
+        'not_found': [order_id for order_id in order_ids if order_id not in current_statuses],
+        'restocked_products': len(restored),
+        'restocked_units': sum(restored.values()),
+    }
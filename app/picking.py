@@ -0,0 +1,215 @@
+# app/picking.py
+# Siparişler için toplama (pick) listeleri.
+#
+# Bekleyen siparişlerin (veya bir toplama dalgasının, app/waves.py) kalemleri tek sorguda okunur ve toplanacakları depoya göre gruplanır:
+# kalemin dağıtım kaydı (OrderItemAllocation) varsa onun deposu, yoksa ürünün ana deposu. Her depo
+# için bir liste çıkar; aynı raftaki (Product.bin) kalemler tek durakta birleşir, her satırda hangi
+# siparişe kaç adet ayrılacağı yazılır (toplu toplama).
+#
+# Raf kodu "koridor-bölme[-kat]" biçimindedir (A-03, B-12-2). Koridor harfi x, bölme numarası y
+# koordinatını verir; kat yürüme mesafesini etkilemez. Rota depo girişinden (0, 0) başlayıp orada
+# biter ve koridorlar arasında dik açılı (Manhattan) mesafeyle ölçülür. Önce en yakın komşu ile bir
+# tur kurulur, sonra 2-opt ile PICK_OPTIMIZE_SECONDS süresince iyileştirilir. Rafı olmayan veya
+# kodu çözülemeyen kalemler rotaya girmez, listenin sonunda ayrıca gösterilir.
+import re
+import time
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app import db
+from app.models import Order, OrderItem, OrderItemAllocation, Product, WarehouseLocation
+
+DEFAULTS = {
+    'PICK_MAX_ORDERS': 500,
+    'PICK_AISLE_SPACING': 3.0,      # metre, komşu koridorlar arası
+    'PICK_BAY_SPACING': 1.0,        # metre, aynı koridordaki komşu bölmeler arası
+    'PICK_WALK_SPEED': 1.0,         # metre / saniye
+    'PICK_SECONDS_PER_LINE': 10,    # bir duraktaki her ürün satırı için toplama süresi
+    'PICK_OPTIMIZE_SECONDS': 0.2,   # liste başına 2-opt süre sınırı
+}
+
+BIN_PATTERN = re.compile(r'^([A-Z]{1,3})-?(\d{1,4})(?:-?(\d{1,3}))?$')
+
+UNASSIGNED_NAME = 'Unassigned stock'
+
+PickLine = namedtuple('PickLine', 'order_id order_number order_date warehouse_id bin product_id name sku quantity')
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+def normalize_bin(code):
+    """Bin code as stored in Product.bin: trimmed and upper-cased, None for empty."""
+    code = (code or '').strip().upper()
+    return code or None
+
+
+def parse_bin(code):
+    """(aisle, bay, level) of a bin code such as 'A-03-2' (aisle A = 1), or None if it does not parse."""
+    match = BIN_PATTERN.match(normalize_bin(code) or '')
+    if match is None:
+        return None
+    aisle = 0
+    for letter in match.group(1):
+        aisle = aisle * 26 + ord(letter) - ord('A') + 1
+    return aisle, int(match.group(2)), int(match.group(3) or 0)
+
+
+def _distance_matrix(points):
+    coords = np.asarray(points, dtype=float).reshape(-1, 2)
+    return np.abs(coords[:, None, :] - coords[None, :, :]).sum(axis=2)
+
+
+def _tour_length(tour, dist):
+    return float(dist[tour, np.roll(tour, -1)].sum())
+
+
+def _nearest_neighbour(dist):
+    """Closed tour over all points starting at index 0 (the depot)."""
+    n = len(dist)
+    tour = [0]
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[0] = False
+    for _ in range(n - 1):
+        row = np.where(unvisited, dist[tour[-1]], np.inf)
+        nxt = int(row.argmin())
+        tour.append(nxt)
+        unvisited[nxt] = False
+    return np.array(tour)
+
+
+def _two_opt(tour, dist, deadline):
+    """
+    Improves a closed tour in place by reversing segments while that shortens it. For each first
+    edge every second edge is scored at once with NumPy; stops at a local optimum or the deadline.
+    """
+    n = len(tour)
+    if n < 4:
+        return tour
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(n - 2):
+            a, b = tour[i], tour[i + 1]
+            j = np.arange(i + 2, n if i > 0 else n - 1)
+            c, d = tour[j], tour[(j + 1) % n]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            best = int(delta.argmin())
+            if delta[best] < -1e-9:
+                jb = j[best]
+                tour[i + 1:jb + 1] = tour[i + 1:jb + 1][::-1]
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return tour
+
+
+def plan_route(bins):
+    """
+    bins: [(aisle, bay)]. Returns (visiting order as indexes into bins, nearest-neighbour distance,
+    optimized distance) in metres, for a walk from the depot through every bin and back.
+    """
+    if not bins:
+        return [], 0.0, 0.0
+    aisle_spacing, bay_spacing = _setting('PICK_AISLE_SPACING'), _setting('PICK_BAY_SPACING')
+    points = [(0.0, 0.0)] + [(aisle * aisle_spacing, bay * bay_spacing) for aisle, bay in bins]
+    dist = _distance_matrix(points)
+    tour = _nearest_neighbour(dist)
+    initial = _tour_length(tour, dist)
+    tour = _two_opt(tour, dist, time.perf_counter() + _setting('PICK_OPTIMIZE_SECONDS'))
+    return [int(stop) - 1 for stop in tour[1:]], initial, _tour_length(tour, dist)
+
+
+def order_pick_lines(order_ids):
+    """
+    Pick lines (order_id, order_number, order_date, warehouse_id, bin, product_id, name, sku, quantity)
+    of the orders selected by order_ids (a subquery of order ids), in one query. The warehouse is the
+    allocation's; items without allocations (older orders) are picked from the product's home warehouse.
+    """
+    rows = db.session.execute(
+        select(Order.id, Order.order_number, Order.order_date, OrderItem.quantity, OrderItem.product_id,
+               Product.name, Product.sku, Product.bin, Product.warehouse_id.label('home_id'),
+               OrderItemAllocation.id.label('allocation_id'), OrderItemAllocation.warehouse_id,
+               OrderItemAllocation.quantity.label('allocated'))
+        .join(order_ids, order_ids.c.id == Order.id)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .outerjoin(OrderItemAllocation, OrderItemAllocation.order_item_id == OrderItem.id)
+    ).all()
+    lines = []
+    for row in rows:
+        if row.allocation_id is None:
+            source, quantity = row.home_id, row.quantity
+        else:
+            source, quantity = row.warehouse_id, row.allocated
+        lines.append(PickLine(row.id, row.order_number, row.order_date, source, row.bin, row.product_id,
+                              row.name, row.sku, quantity))
+    return lines
+
+
+def _stop_lines(entries):
+    products = {}
+    for entry in entries:
+        line = products.setdefault(entry.product_id, {'product_id': entry.product_id, 'name': entry.name,
+                                                      'sku': entry.sku, 'quantity': 0, 'orders': defaultdict(int)})
+        line['quantity'] += entry.quantity
+        line['orders'][entry.order_number] += entry.quantity
+    return [dict(line, orders=sorted(line['orders'].items())) for line in
+            sorted(products.values(), key=lambda line: (line['name'], line['product_id']))]
+
+
+def _pick_list(warehouse_id, name, entries):
+    by_bin, unlocated = defaultdict(list), []
+    for entry in entries:
+        code = normalize_bin(entry.bin)
+        (by_bin[code] if parse_bin(code) else unlocated).append(entry)
+    codes = sorted(by_bin)
+    order, initial, distance = plan_route([parse_bin(code)[:2] for code in codes])
+    stops = [{'bin': codes[index], 'lines': _stop_lines(by_bin[codes[index]])} for index in order]
+    unlocated_lines = _stop_lines(unlocated)
+    line_count = sum(len(stop['lines']) for stop in stops) + len(unlocated_lines)
+    walk_seconds = distance / _setting('PICK_WALK_SPEED')
+    return {
+        'warehouse_id': warehouse_id, 'warehouse': name,
+        'orders': len({entry.order_id for entry in entries}), 'units': sum(entry.quantity for entry in entries),
+        'stops': stops, 'unlocated': unlocated_lines,
+        'distance_m': round(distance, 1), 'nearest_neighbour_distance_m': round(initial, 1),
+        'walk_seconds': round(walk_seconds),
+        'pick_seconds': round(walk_seconds + line_count * _setting('PICK_SECONDS_PER_LINE')),
+    }
+
+
+def generate_pick_lists(max_orders=None, warehouse_id=None, wave_id=None):
+    """
+    One pick list per warehouse for the oldest pending orders (at most max_orders / PICK_MAX_ORDERS),
+    or for the orders of one wave. Returns {'orders', 'lists', 'compute_ms'}; compute_ms covers the
+    query and route planning.
+    """
+    started = time.perf_counter()
+    if wave_id is not None:
+        orders = select(Order.id).where(Order.wave_id == wave_id,
+                                        Order.status.notin_(('Cancelled', 'Returned'))).subquery()
+    else:
+        # Sıfır veya negatif limit LIMIT -1 (sınırsız) olmasın diye en az 1
+        max_orders = max(1, min(max_orders or _setting('PICK_MAX_ORDERS'), _setting('PICK_MAX_ORDERS')))
+        orders = select(Order.id).where(Order.status == 'Pending') \
+            .order_by(Order.order_date, Order.id).limit(max_orders).subquery()
+    by_warehouse = defaultdict(list)
+    for line in order_pick_lines(orders):
+        if warehouse_id is None or line.warehouse_id == warehouse_id:
+            by_warehouse[line.warehouse_id].append(line)
+    located = [w for w in by_warehouse if w is not None]
+    names = {}
+    if located:
+        names = {row.id: row.name or row.address for row in db.session.execute(
+            select(WarehouseLocation.id, WarehouseLocation.name, WarehouseLocation.address)
+            .where(WarehouseLocation.id.in_(located)))}
+    lists = [_pick_list(w, names.get(w, UNASSIGNED_NAME), by_warehouse[w])
+             for w in sorted(by_warehouse, key=lambda w: (w is None, w or 0))]
+    order_count = len({line.order_id for lines in by_warehouse.values() for line in lines})
+    return {'orders': order_count, 'lists': lists,
+            'compute_ms': round((time.perf_counter() - started) * 1000, 1)}
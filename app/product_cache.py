@@ -0,0 +1,171 @@
+# app/product_cache.py
+# Ürünlerin id ile okunan, süreç içinde paylaşılan değişmez özetleri (read-through önbellek).
+#
+# Sepete ekleme, sepet güncelleme ve ürün sayfası her istekte db.session.get(Product, id) ile
+# veritabanına gidiyordu; oturumlar istek başına olduğu için kimlik haritası istekler arasında
+# işe yaramaz. Bu modül ürünün gösterilen alanlarını (ad, fiyat, stok, eşik, tedarikçi/depo adı
+# ...) ProductSnapshot adlı değişmez bir namedtuple olarak sınırlı bir LRU'da tutar:
+# - Eksik id'ler tek bir "id IN (...)" sorgusuyla (tedarikçi ve depo adlarıyla birlikte) okunur.
+# - Aynı süreçte ORM ile değişen veya silinen ürünler commit sonrası önbellekten düşer. Core
+#   UPDATE/DELETE'lerin hangi satırlara dokunduğu bilinmediğinden commit sonrası tüm önbellek
+#   temizlenir; tedarikçi/depo değişikliklerinde de (özetlerdeki adlar için) aynısı yapılır.
+# - Her geçersiz kılma bir nesil sayacını artırır. Okuma sırasında nesil değiştiyse okunan özetler
+#   önbelleğe yazılmaz; ayrıca var olan kayıt yalnızca aynı veya daha yeni version_id ile
+#   değiştirilir. Böylece yazmadan önce başlamış bir okuma eski özeti geri koyamaz.
+# - Diğer işçi süreçlerindeki yazmalar en fazla PRODUCT_CACHE_SECONDS gecikmeyle görülür.
+#
+# Stok açısından kritik yollar (sipariş oluşturma, stok düşme) önbelleği kullanmaz: ORM nesnesini
+# birincil veritabanından okur ve version_id korumalı UPDATE yapar. Önbellekteki stok yalnızca
+# gösterim ve ön kontrol içindir.
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from sqlalchemy import event, select, func
+
+from app import db
+from app.models import Product, Supplier, WarehouseLocation
+
+DEFAULTS = {
+    'PRODUCT_CACHE_SIZE': 20000,
+    'PRODUCT_CACHE_SECONDS': 30,
+}
+
+_STALE_KEY = 'product_cache_stale_ids'
+_CLEAR_KEY = 'product_cache_clear'
+
+ProductSnapshot = namedtuple('ProductSnapshot', [
+    'id', 'name', 'sku', 'bin', 'category', 'description', 'price', 'quantity_in_stock',
+    'low_stock_threshold', 'expiry_date', 'created_at', 'updated_at', 'version_id',
+    'supplier_id', 'supplier_name', 'warehouse_id', 'warehouse_name',
+])
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+class ProductCache:
+    """Thread-safe LRU of product id -> ProductSnapshot with a maximum entry age."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, product_id, max_age):
+        with self._lock:
+            entry = self._entries.get(product_id)
+            if entry is None or time.monotonic() - entry[0] >= max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(product_id)
+            self.hits += 1
+            return entry[1]
+
+    def put_many(self, snapshots, generation, max_size):
+        """Stores snapshots read while the cache was at `generation`; ignored if it moved on since."""
+        now = time.monotonic()
+        with self._lock:
+            if generation != self.generation:
+                return
+            for snapshot in snapshots:
+                current = self._entries.get(snapshot.id)
+                if current is not None and current[1].version_id > snapshot.version_id:
+                    continue
+                self._entries[snapshot.id] = (now, snapshot)
+                self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, product_ids=None):
+        """Drops the given ids, or everything when product_ids is None."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if product_ids is None:
+                self._entries.clear()
+            for product_id in product_ids or ():
+                self._entries.pop(product_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'invalidations': self.invalidations}
+
+
+product_cache = ProductCache()
+
+
+def _load(product_ids):
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.sku, Product.bin, Product.category, Product.description,
+               Product.price, Product.quantity_in_stock, Product.low_stock_threshold, Product.expiry_date,
+               Product.created_at, Product.updated_at, Product.version_id, Product.supplier_id,
+               Supplier.name, Product.warehouse_id,
+               func.coalesce(WarehouseLocation.name, WarehouseLocation.address))
+        .outerjoin(Supplier, Supplier.id == Product.supplier_id)
+        .outerjoin(WarehouseLocation, WarehouseLocation.id == Product.warehouse_id)
+        .where(Product.id.in_(list(product_ids)))).all()
+    return [ProductSnapshot(*row) for row in rows]
+
+
+def get_products(product_ids, fresh=False):
+    """
+    {id: ProductSnapshot} for the given ids; unknown ids are left out. Cached ids cost nothing,
+    the rest are fetched in one query. fresh=True skips the cache lookup (the result is still stored).
+    """
+    max_age = _setting('PRODUCT_CACHE_SECONDS')
+    found, missing = {}, []
+    for product_id in dict.fromkeys(product_ids):
+        snapshot = None if fresh else product_cache.get(product_id, max_age)
+        if snapshot is None:
+            missing.append(product_id)
+        else:
+            found[product_id] = snapshot
+    if missing:
+        generation = product_cache.generation
+        fetched = _load(missing)
+        product_cache.put_many(fetched, generation, _setting('PRODUCT_CACHE_SIZE'))
+        found.update((snapshot.id, snapshot) for snapshot in fetched)
+    return found
+
+
+def get_product(product_id, fresh=False):
+    return get_products([product_id], fresh=fresh).get(product_id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _note_changed_products(session, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            session.info.setdefault(_STALE_KEY, set()).add(obj.id)
+        elif isinstance(obj, (Supplier, WarehouseLocation)):
+            session.info[_CLEAR_KEY] = True
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _note_core_writes(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in ('products', 'suppliers', 'warehouse_locations'):
+            orm_execute_state.session.info[_CLEAR_KEY] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    stale = session.info.pop(_STALE_KEY, None)
+    if session.info.pop(_CLEAR_KEY, None):
+        product_cache.invalidate()
+    elif stale:
+        product_cache.invalidate(stale)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_changed_products(session, previous_transaction):
+    session.info.pop(_STALE_KEY, None)
+    session.info.pop(_CLEAR_KEY, None)
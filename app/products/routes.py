@@ -1,20 +1,49 @@
 # app/products/routes.py
-from flask import render_template, redirect, url_for, flash, request, abort
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify
 from flask_login import login_required
-from sqlalchemy import case
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
+from app.concurrency import conflict_metrics
+from app.ledger import stock_on_hand_at
 from app.products import bp
-from app.models import Product, Supplier, WarehouseLocation
+from app.models import Product, ArchivedOrderItem
+from app.lookups import cached_choices, label_for
+from app.scan import resolve_one, resolve_batch, ScanError
+from app.product_cache import get_product
 from app.forms import ProductForm, EmptyForm
 from app.decorators import admin_required, can_manage_core_data, can_view_general_data
 
 
+def lookup_fields(form):
+    """Template data of the supplier/warehouse pickers: cached <select> choices, or a typeahead."""
+    fields = {}
+    for field, kind, empty in (('supplier_id', 'supplier', '--- Select Supplier (Optional) ---'),
+                               ('warehouse_id', 'warehouse', '--- Select Warehouse (Optional) ---')):
+        choices = cached_choices(kind)
+        fields[field] = {'choices': choices, 'empty': empty, 'url': url_for(f'{kind}s.lookup_{kind}s'),
+                         'label': label_for(kind, form[field].data) if choices is None and not form[field].errors
+                         else None}
+    return fields
+
+
 @bp.route('/')
 @login_required
 @can_view_general_data  # All defined roles can view the list
 def list_products():
     page = request.args.get('page', 1, type=int)
-    products_pagination = Product.query.order_by(Product.name.asc()).paginate(
+    # ABC/XYZ sınıfına göre filtre (ör. ?abc=A&xyz=Z)
+    abc = request.args.get('abc') if request.args.get('abc') in ('A', 'B', 'C') else None
+    xyz = request.args.get('xyz') if request.args.get('xyz') in ('X', 'Y', 'Z') else None
+    # Tedarikçi ve depo adları satır başına ayrı sorgu yerine aynı sorguda yüklenir
+    query = Product.query.options(joinedload(Product.supplier_details), joinedload(Product.storage_location))
+    if abc:
+        query = query.filter(Product.abc_class == abc)
+    if xyz:
+        query = query.filter(Product.xyz_class == xyz)
+    products_pagination = query.order_by(Product.name.asc()).paginate(
         page=page, per_page=10, error_out=False
     )
     products_items = products_pagination.items
@@ -24,7 +53,8 @@ def list_products():
                            title='Products',
                            products=products_items,
                            pagination=products_pagination,
-                           delete_forms=delete_forms)
+                           delete_forms=delete_forms,
+                           abc=abc, xyz=xyz)
 
 
 @bp.route('/add', methods=['GET', 'POST'])
@@ -32,22 +62,13 @@ def list_products():
 @can_manage_core_data  # Only Admin or WarehouseManager can add
 def add_product():
     form = ProductForm()
-    form.supplier_id.choices = [(0, '--- Select Supplier (Optional) ---')] + \
-                               [(s.id, s.name) for s in Supplier.query.order_by(Supplier.name.asc()).all()]
-    warehouse_order_criteria = [
-        case((WarehouseLocation.name == None, 1), else_=0),
-        WarehouseLocation.name.asc(), WarehouseLocation.address.asc()
-    ]
-    form.warehouse_id.choices = [(0, '--- Select Warehouse (Optional) ---')] + \
-                                [(w.id, w.name if w.name else w.address) for w in
-                                 WarehouseLocation.query.order_by(*warehouse_order_criteria).all()]
     if form.validate_on_submit():
         new_product = Product(
-            name=form.name.data, category=form.category.data if form.category.data else None,
+            name=form.name.data, sku=form.sku.data, bin=form.bin.data, category=form.category.data if form.category.data else None,
             quantity_in_stock=form.quantity_in_stock.data, price=form.price.data,
             expiry_date=form.expiry_date.data, description=form.description.data if form.description.data else None,
-            supplier_id=form.supplier_id.data if form.supplier_id.data != 0 else None,
-            warehouse_id=form.warehouse_id.data if form.warehouse_id.data != 0 else None,
+            supplier_id=form.supplier_id.data or None,
+            warehouse_id=form.warehouse_id.data or None,
             purchase_price=form.purchase_price.data if hasattr(form,
                                                                'purchase_price') and form.purchase_price.data is not None else None,
             low_stock_threshold=form.low_stock_threshold.data if hasattr(form,
@@ -57,60 +78,103 @@ def add_product():
         db.session.commit()
         flash(f'Product "{new_product.name}" has been added successfully!', 'success')
         return redirect(url_for('products.list_products'))
-    return render_template('products/product_form.html', title='Add New Product', form=form, legend='New Product')
+    return render_template('products/product_form.html', title='Add New Product', form=form, legend='New Product',
+                           lookups=lookup_fields(form))
 
 
 @bp.route('/<int:product_id>')
 @login_required
 @can_view_general_data  # All defined roles can view details
 def product_detail(product_id):
-    product = db.session.get(Product, product_id) or abort(404)
+    product = get_product(product_id) or abort(404)
     return render_template('products/product_detail.html', title=product.name, product=product)
 
 
+@bp.route('/<int:product_id>/stock_at')
+@login_required
+@can_view_general_data
+def stock_at(product_id):
+    # ?at=YYYY-MM-DD veya YYYY-MM-DDTHH:MM[:SS] (UTC); verilmezse şu an
+    at_arg = request.args.get('at')
+    try:
+        at = datetime.fromisoformat(at_arg) if at_arg else datetime.utcnow()
+    except ValueError:
+        return jsonify({'error': "Invalid 'at' parameter. Use YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS."}), 400
+    return jsonify({'product_id': product_id, 'at': at.isoformat(), 'quantity': stock_on_hand_at(product_id, at)})
+
+
+@bp.route('/scan/<path:code>')
+@login_required
+@can_view_general_data
+def scan(code):
+    # El terminali araması: yalnızca id, sku, ad ve depo (önbellekten); stok için ürün sayfası kullanılır
+    summary = resolve_one(code)
+    if summary is None:
+        return jsonify({'error': 'Unknown SKU.', 'code': code}), 404
+    return jsonify(summary)
+
+
+@bp.route('/scan/batch', methods=['POST'])
+@login_required
+@can_view_general_data
+def scan_batch():
+    # {"codes": ["...", ...]} -> {"found": {sku: özet}, "missing": [...]}; önbellekte olmayanlar tek sorguda
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object with a "codes" list.'}), 400
+    try:
+        found, missing = resolve_batch(payload.get('codes'))
+    except ScanError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'found': found, 'missing': missing})
+
+
 @bp.route('/<int:product_id>/edit', methods=['GET', 'POST'])
 @login_required
 @can_manage_core_data  # Only Admin or WarehouseManager can edit
 def edit_product(product_id):
     product_to_edit = db.session.get(Product, product_id) or abort(404)
-    form = ProductForm()
-    form.supplier_id.choices = [(0, '--- Select Supplier (Optional) ---')] + \
-                               [(s.id, s.name) for s in Supplier.query.order_by(Supplier.name.asc()).all()]
-    warehouse_order_criteria = [
-        case((WarehouseLocation.name == None, 1), else_=0),
-        WarehouseLocation.name.asc(), WarehouseLocation.address.asc()
-    ]
-    form.warehouse_id.choices = [(0, '--- Select Warehouse (Optional) ---')] + \
-                                [(w.id, w.name if w.name else w.address) for w in
-                                 WarehouseLocation.query.order_by(*warehouse_order_criteria).all()]
+    form = ProductForm(product_id=product_id)
     if form.validate_on_submit():
+        conflict_metrics.record('edit_product', 'attempts')
+        if form.version_id.data and form.version_id.data != str(product_to_edit.version_id):
+            # Form açıldıktan sonra ürün başka biri (veya bir sipariş) tarafından değiştirilmiş
+            conflict_metrics.record('edit_product', 'conflicts')
+            form.version_id.data = product_to_edit.version_id
+            flash(f'"{product_to_edit.name}" was changed by someone else while you were editing '
+                  f'(stock is now {product_to_edit.quantity_in_stock}). Review your values and save again.',
+                  'warning')
+            return render_template('products/product_form.html', title='Edit Product', form=form,
+                                   legend=f'Edit: {product_to_edit.name}', lookups=lookup_fields(form))
         product_to_edit.name = form.name.data
+        product_to_edit.sku = form.sku.data
+        product_to_edit.bin = form.bin.data
         product_to_edit.category = form.category.data if form.category.data else None
         product_to_edit.quantity_in_stock = form.quantity_in_stock.data
         product_to_edit.price = form.price.data
         product_to_edit.expiry_date = form.expiry_date.data
         product_to_edit.description = form.description.data if form.description.data else None
-        product_to_edit.supplier_id = form.supplier_id.data if form.supplier_id.data != 0 else None
-        product_to_edit.warehouse_id = form.warehouse_id.data if form.warehouse_id.data != 0 else None
+        product_to_edit.supplier_id = form.supplier_id.data or None
+        product_to_edit.warehouse_id = form.warehouse_id.data or None
         if hasattr(form,
                    'purchase_price'): product_to_edit.purchase_price = form.purchase_price.data if form.purchase_price.data is not None else product_to_edit.purchase_price
         if hasattr(form,
                    'low_stock_threshold'): product_to_edit.low_stock_threshold = form.low_stock_threshold.data if form.low_stock_threshold.data is not None else product_to_edit.low_stock_threshold
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            conflict_metrics.record('edit_product', 'conflicts')
+            flash('Product was changed by someone else while saving. Your changes were not applied; please try again.',
+                  'warning')
+            return redirect(url_for('products.edit_product', product_id=product_id))
+        conflict_metrics.record('edit_product', 'succeeded')
         flash(f'Product "{product_to_edit.name}" has been updated successfully!', 'info')
         return redirect(url_for('products.list_products'))
     elif request.method == 'GET':
         form.process(obj=product_to_edit)
-        if product_to_edit.supplier_id:
-            form.supplier_id.data = product_to_edit.supplier_id
-        else:
-            form.supplier_id.data = 0
-        if product_to_edit.warehouse_id:
-            form.warehouse_id.data = product_to_edit.warehouse_id
-        else:
-            form.warehouse_id.data = 0
     return render_template('products/product_form.html', title='Edit Product', form=form,
-                           legend=f'Edit: {product_to_edit.name}')
+                           legend=f'Edit: {product_to_edit.name}', lookups=lookup_fields(form))
 
 
 @bp.route('/<int:product_id>/delete', methods=['POST'])
@@ -119,7 +183,8 @@ def edit_product(product_id):
 def delete_product(product_id):
     product_to_delete = db.session.get(Product, product_id) or abort(404)
     product_name = product_to_delete.name
-    if product_to_delete.order_items.first():
+    if product_to_delete.order_items.first() or db.session.scalar(
+            select(ArchivedOrderItem.id).where(ArchivedOrderItem.product_id == product_id).limit(1)):
         flash(f'Product "{product_name}" cannot be deleted because it is part of existing orders.', 'danger')
         return redirect(url_for('products.list_products'))
     db.session.delete(product_to_delete)
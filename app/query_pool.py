@@ -0,0 +1,158 @@
+# app/query_pool.py
+# Birbirinden bağımsız okuma sorgularını sınırlı bir iş parçacığı havuzunda, her biri havuzdan
+# alınan ayrı bir bağlantıda olmak üzere aynı anda çalıştırır (ör. dashboard sayaçları).
+# Toplam süre en yavaş sorguya yaklaşır. Süresi (DASHBOARD_QUERY_TIMEOUT) dolan sorgunun yerine
+# varsayılan değeri kullanılır ve sayfa geri kalan sonuçlarla çizilir.
+#
+# Bekleme süresi tüm sorgular için ortak bir son tarihtir. Vazgeçilen sorgunun bağlantıyı ve havuz
+# iş parçacığını tutmaya devam etmemesi için aynı süre veritabanına da sorgu zaman aşımı olarak
+# verilir: PostgreSQL'de SET LOCAL statement_timeout, MySQL'de MAX_EXECUTION_TIME ipucu, MS SQL'de
+# (pyodbc) bağlantının sorgu zaman aşımı. Bunları desteklemeyen veritabanlarında (SQLite) sorgu
+# arka planda biter; yük altında yeni sayfalar terk edilmiş işlerin arkasında kuyruğa girmesin diye
+# aynı anda çalışan/bekleyen sorgu sayısı DASHBOARD_QUERY_MAX_IN_FLIGHT ile sınırlıdır, sınır
+# doluyken gelen sorgular beklemeden varsayılan değerle gösterilir.
+import math
+import threading
+from collections import namedtuple, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool, SingletonThreadPool
+
+from app import db
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 2.0  # saniye
+DEFAULT_MAX_IN_FLIGHT = 16
+
+QueryTask = namedtuple('QueryTask', 'kind statement default')
+
+
+def scalar(statement, default=0):
+    """Single value (COUNT/SUM...); None results become the default."""
+    return QueryTask('scalar', statement, default)
+
+
+def scalars(statement, default=()):
+    """List of ORM objects, e.g. select(Order)... Only column attributes are usable afterwards."""
+    return QueryTask('scalars', statement, list(default))
+
+
+def rows(statement, default=()):
+    """List of result rows."""
+    return QueryTask('rows', statement, list(default))
+
+
+class QueryPoolMetrics:
+    """Per-query counters of runs and timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'runs': 0, 'timeouts': 0, 'errors': 0, 'rejected': 0})
+
+    def record(self, name, event):
+        with self._lock:
+            self._counters[name][event] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+
+query_pool_metrics = QueryPoolMetrics()
+_executor_lock = threading.Lock()
+
+
+def _executor(app):
+    executor = app.extensions.get('query_pool')
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get('query_pool')
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=app.config.get('DASHBOARD_QUERY_WORKERS', DEFAULT_WORKERS),
+                                              thread_name_prefix='query-pool')
+                app.extensions['query_pool_slots'] = threading.BoundedSemaphore(
+                    app.config.get('DASHBOARD_QUERY_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))
+                app.extensions['query_pool'] = executor
+    return executor
+
+
+def _with_timeout(session, statement, timeout):
+    # Sorgu zaman aşımı veritabanında uygulanır; süresi dolan sorgu sunucuda iptal edilir
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        session.execute(text(f'SET LOCAL statement_timeout = {max(int(timeout * 1000), 1)}'))
+    elif dialect == 'mysql' and hasattr(statement, 'prefix_with'):
+        statement = statement.prefix_with(f'/*+ MAX_EXECUTION_TIME({max(int(timeout * 1000), 1)}) */')
+    elif dialect == 'mssql':
+        session.connection().connection.dbapi_connection.timeout = max(math.ceil(timeout), 1)
+    return statement
+
+
+def _run(engine, task, timeout=None):
+    with Session(bind=engine) as session:
+        statement = task.statement if timeout is None else _with_timeout(session, task.statement, timeout)
+        try:
+            result = session.execute(statement)
+            if task.kind == 'scalar':
+                value = result.scalar()
+                return task.default if value is None else value
+            if task.kind == 'scalars':
+                return result.scalars().all()
+            return result.all()
+        finally:
+            if timeout is not None and engine.dialect.name == 'mssql':
+                # pyodbc zaman aşımı bağlantıda kalır; havuza dönmeden önce kaldırılır
+                session.connection().connection.dbapi_connection.timeout = 0
+
+
+def run_concurrently(tasks, timeout=None):
+    """
+    tasks: {name: QueryTask}. Returns ({name: result}, [names that timed out or failed]).
+    Uses the engine the request's session would read from (read replica aware). Single-connection
+    pools (in-memory SQLite) cannot be used from several threads; tasks then run one by one.
+    """
+    app = current_app._get_current_object()
+    timeout = timeout if timeout is not None else app.config.get('DASHBOARD_QUERY_TIMEOUT', DEFAULT_TIMEOUT)
+    engine = db.session.get_bind()
+    results, degraded = {}, []
+
+    if isinstance(engine.pool, (StaticPool, SingletonThreadPool)):
+        for name, task in tasks.items():
+            query_pool_metrics.record(name, 'runs')
+            results[name] = _run(engine, task)
+        return results, degraded
+
+    executor = _executor(app)
+    slots = app.extensions['query_pool_slots']
+    futures = {}
+    for name, task in tasks.items():
+        if not slots.acquire(blocking=False):
+            # Havuz önceki (ör. zaman aşımına uğramış) sorgularla dolu; bu sayfa beklemez
+            query_pool_metrics.record(name, 'rejected')
+            results[name] = task.default
+            degraded.append(name)
+            continue
+        futures[name] = executor.submit(_run, engine, task, timeout)
+        futures[name].add_done_callback(lambda future: slots.release())
+    wait(futures.values(), timeout=timeout)
+    for name, future in futures.items():
+        query_pool_metrics.record(name, 'runs')
+        if not future.done():
+            # Kuyruktaysa hiç çalışmaz; çalışıyorsa veritabanı zaman aşımıyla (desteklenen
+            # veritabanlarında) iptal edilir, edilemezse arka planda tamamlanır
+            future.cancel()
+            query_pool_metrics.record(name, 'timeouts')
+            app.logger.warning(f"Query '{name}' did not finish within {timeout}s; showing a default value.")
+            results[name] = tasks[name].default
+            degraded.append(name)
+        elif future.exception() is not None:
+            query_pool_metrics.record(name, 'errors')
+            app.logger.error(f"Query '{name}' failed: {future.exception()}")
+            results[name] = tasks[name].default
+            degraded.append(name)
+        else:
+            results[name] = future.result()
+    return results, degraded
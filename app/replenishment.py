@@ -0,0 +1,259 @@
+# app/replenishment.py
+# Sipariş geçmişinden talep tahmini ve yeniden sipariş önerileri.
+#
+# Ürün başına günlük talep tek bir gruplu sorguyla (ürün, gün) çekilip ürün x gün NumPy matrisine
+# yerleştirilir; tahmin, güvenlik stoğu, yeniden sipariş noktası (ROP) ve ekonomik sipariş
+# miktarı (EOQ) tüm ürünler için tek seferde vektörel olarak hesaplanır:
+#   tahmin (günlük)  : son N günün hareketli ortalaması (sma) veya üstel düzeltme (ses)
+#   güvenlik stoğu   : z * σ(günlük talep) * √(tedarik süresi)
+#   ROP              : tahmin * tedarik süresi + güvenlik stoğu
+#   EOQ              : √(2 * yıllık talep * sipariş maliyeti / (elde tutma oranı * birim maliyet))
+# Eldeki stok ROP'a inmiş ürünler için max(EOQ, ROP - eldeki stok) kadar sipariş önerilir ve
+# öneriler tedarikçiye göre gruplanır.
+import math
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, update, func, cast, bindparam, Date
+
+from app import db
+from app.models import Product, Supplier
+from app.orders.status import STOCK_RESTORING_STATUSES
+from app.cdc import record_changes, OP_UPDATE
+from app.archive import order_item_history
+
+FORECAST_SMA = 'sma'
+FORECAST_SES = 'ses'
+FORECAST_METHODS = (FORECAST_SMA, FORECAST_SES)
+
+# Config'te tanımlı değilse kullanılan varsayılanlar
+DEFAULTS = {
+    'REPLENISHMENT_HISTORY_DAYS': 90,
+    'REPLENISHMENT_METHOD': FORECAST_SES,
+    'REPLENISHMENT_SMA_WINDOW': 28,
+    'REPLENISHMENT_SES_ALPHA': 0.3,
+    'REPLENISHMENT_SERVICE_LEVEL': 0.95,
+    'REPLENISHMENT_LEAD_TIME_DAYS': 7,
+    'REPLENISHMENT_ORDER_COST': 50.0,
+    'REPLENISHMENT_HOLDING_RATE': 0.25,
+}
+
+
+class ReplenishmentError(Exception):
+    """Raised when forecast parameters are invalid."""
+
+
+def _setting(name, value=None):
+    if value is not None:
+        return value
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+def _day_bucket(column):
+    # SQLite'ta CAST(... AS DATE) sayısal bir değer döndürür; orada date() kullanılır
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class ProductTable:
+    """Columnar view of every product: ids (sorted), stock, supplier, lead time and unit cost."""
+
+    def __init__(self, rows, default_lead_time):
+        count = len(rows)
+        self.ids = np.fromiter((r.id for r in rows), dtype=np.int64, count=count)
+        self.names = [r.name for r in rows]
+        self.on_hand = np.fromiter((r.quantity_in_stock or 0 for r in rows), dtype=np.float64, count=count)
+        self.supplier_ids = [r.supplier_id for r in rows]
+        self.lead_time = np.fromiter(
+            (r.lead_time_days if r.lead_time_days is not None else default_lead_time for r in rows),
+            dtype=np.float64, count=count)
+        self.unit_cost = np.fromiter(
+            (float(r.purchase_price if r.purchase_price is not None else r.price or 0) for r in rows),
+            dtype=np.float64, count=count)
+        self.low_stock_threshold = np.fromiter((r.low_stock_threshold or 0 for r in rows), dtype=np.int64,
+                                               count=count)
+
+
+def load_products(default_lead_time):
+    rows = db.session.connection().execute(
+        select(Product.id, Product.name, Product.quantity_in_stock, Product.supplier_id, Product.price,
+               Product.purchase_price, Product.low_stock_threshold, Supplier.lead_time_days)
+        .outerjoin(Supplier, Product.supplier_id == Supplier.id)
+        .order_by(Product.id)
+    ).all()
+    return ProductTable(rows, default_lead_time)
+
+
+def load_daily_demand(product_ids, history_days, end=None):
+    """
+    Returns a (len(product_ids), history_days) matrix of units ordered per product and day, the
+    last column being the day of `end`. product_ids must be sorted. Cancelled/returned orders are
+    not demand. One grouped query; the caller's product list defines the row order.
+    """
+    end = end or datetime.utcnow()
+    first_day = end.date() - timedelta(days=history_days - 1)
+    # Talep geçmişi arşivlenmiş siparişleri de kapsar (app/archive.py)
+    items = order_item_history(start=datetime.combine(first_day, time.min), end=end,
+                               exclude_statuses=STOCK_RESTORING_STATUSES)
+    day = _day_bucket(items.c.order_date).label('day')
+    # Yüz binlerce satır dönebilir; ORM sonuç katmanı atlanıp doğrudan Core ile okunur
+    rows = db.session.connection().execute(
+        select(items.c.product_id, day, func.sum(items.c.quantity))
+        .group_by(items.c.product_id, day)
+    ).all()
+
+    demand = np.zeros((len(product_ids), history_days), dtype=np.float64)
+    if not rows:
+        return demand
+    row_products = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    offsets = np.fromiter(((_as_date(r[1]) - first_day).days for r in rows), dtype=np.intp, count=len(rows))
+    quantities = np.fromiter((r[2] or 0 for r in rows), dtype=np.float64, count=len(rows))
+    positions = np.searchsorted(product_ids, row_products)
+    positions = np.minimum(positions, len(product_ids) - 1)
+    known = (product_ids[positions] == row_products) & (offsets >= 0) & (offsets < history_days)
+    np.add.at(demand, (positions[known], offsets[known]), quantities[known])
+    return demand
+
+
+def forecast_daily_demand(demand, method, sma_window, ses_alpha):
+    """Vectorized one-step daily forecast for every row of the demand matrix."""
+    days = demand.shape[1]
+    if method == FORECAST_SMA:
+        return demand[:, -min(sma_window, days):].mean(axis=1)
+    if method == FORECAST_SES:
+        # l_t = α x_t + (1 - α) l_{t-1}, l_0 = x_0  =>  son seviye, talep matrisinin sabit bir
+        # ağırlık vektörüyle çarpımıdır (tek matris-vektör çarpımı)
+        age = np.arange(days - 1, -1, -1, dtype=np.float64)  # en eski gün: days-1
+        weights = ses_alpha * (1.0 - ses_alpha) ** age
+        weights[0] = (1.0 - ses_alpha) ** (days - 1)
+        return demand @ weights
+    raise ReplenishmentError(f"Unknown forecast method '{method}'. Use one of: {', '.join(FORECAST_METHODS)}.")
+
+
+class ReorderPlan:
+    """Per-product replenishment figures (NumPy arrays aligned with products.ids) and the parameters used."""
+
+    def __init__(self, products, parameters, forecast, sigma, safety_stock, reorder_point, eoq, order_quantity):
+        self.products = products
+        self.parameters = parameters
+        self.forecast = forecast
+        self.sigma = sigma
+        self.safety_stock = safety_stock
+        self.reorder_point = reorder_point
+        self.eoq = eoq
+        self.order_quantity = order_quantity
+
+    @property
+    def suggested(self):
+        return np.nonzero(self.order_quantity > 0)[0]
+
+    def by_supplier(self):
+        """Suggestions grouped by supplier: [{'supplier_id', 'supplier_name', 'lines', 'total_units', 'total_cost'}]."""
+        products = self.products
+        names = dict(db.session.execute(select(Supplier.id, Supplier.name)).all())
+        groups = defaultdict(list)
+        for i in self.suggested:
+            groups[products.supplier_ids[i]].append({
+                'product_id': int(products.ids[i]),
+                'product_name': products.names[i],
+                'on_hand': int(products.on_hand[i]),
+                'daily_forecast': round(float(self.forecast[i]), 2),
+                'safety_stock': int(math.ceil(self.safety_stock[i])),
+                'reorder_point': int(math.ceil(self.reorder_point[i])),
+                'eoq': int(math.ceil(self.eoq[i])),
+                'order_quantity': int(self.order_quantity[i]),
+                'unit_cost': round(float(products.unit_cost[i]), 2),
+                'lead_time_days': int(products.lead_time[i]),
+            })
+        result = []
+        for supplier_id, lines in groups.items():
+            lines.sort(key=lambda line: line['on_hand'] - line['reorder_point'])
+            result.append({
+                'supplier_id': supplier_id,
+                'supplier_name': names.get(supplier_id, 'No supplier'),
+                'lines': lines,
+                'total_units': sum(line['order_quantity'] for line in lines),
+                'total_cost': round(sum(line['order_quantity'] * line['unit_cost'] for line in lines), 2),
+            })
+        result.sort(key=lambda group: (group['supplier_id'] is None, group['supplier_name']))
+        return result
+
+
+def compute_reorder_plan(method=None, history_days=None, service_level=None, end=None):
+    """
+    Forecasts demand for every product from its order history and computes safety stock, reorder
+    point, EOQ and a suggested order quantity. Settings fall back to the REPLENISHMENT_* config keys.
+    """
+    method = _setting('REPLENISHMENT_METHOD', method)
+    history_days = int(_setting('REPLENISHMENT_HISTORY_DAYS', history_days))
+    service_level = float(_setting('REPLENISHMENT_SERVICE_LEVEL', service_level))
+    sma_window = int(_setting('REPLENISHMENT_SMA_WINDOW'))
+    ses_alpha = float(_setting('REPLENISHMENT_SES_ALPHA'))
+    order_cost = float(_setting('REPLENISHMENT_ORDER_COST'))
+    holding_rate = float(_setting('REPLENISHMENT_HOLDING_RATE'))
+    if method not in FORECAST_METHODS:
+        raise ReplenishmentError(f"Unknown forecast method '{method}'. Use one of: {', '.join(FORECAST_METHODS)}.")
+    if not 2 <= history_days <= 730:
+        raise ReplenishmentError('History must be between 2 and 730 days.')
+    if not 0.5 <= service_level < 1:
+        raise ReplenishmentError('Service level must be between 0.5 and 0.999.')
+    if not 0 < ses_alpha <= 1 or sma_window < 1:
+        raise ReplenishmentError('Invalid smoothing settings.')
+
+    products = load_products(int(_setting('REPLENISHMENT_LEAD_TIME_DAYS')))
+    demand = load_daily_demand(products.ids, history_days, end=end)
+
+    forecast = forecast_daily_demand(demand, method, sma_window, ses_alpha)
+    sigma = demand.std(axis=1, ddof=1)
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * sigma * np.sqrt(products.lead_time)
+    reorder_point = forecast * products.lead_time + safety_stock
+
+    holding_cost = holding_rate * products.unit_cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.where(holding_cost > 0, np.sqrt(2.0 * forecast * 365.0 * order_cost / holding_cost), 0.0)
+    needs_order = (forecast > 0) & (products.on_hand <= reorder_point)
+    order_quantity = np.where(needs_order, np.ceil(np.maximum(eoq, reorder_point - products.on_hand)), 0)
+    order_quantity = order_quantity.astype(np.int64)
+
+    parameters = {'method': method, 'history_days': history_days, 'service_level': service_level,
+                  'sma_window': sma_window, 'ses_alpha': ses_alpha, 'order_cost': order_cost,
+                  'holding_rate': holding_rate}
+    return ReorderPlan(products, parameters, forecast, sigma, safety_stock, reorder_point, eoq, order_quantity)
+
+
+def apply_reorder_points(plan):
+    """
+    Writes each forecasted product's reorder point to Product.low_stock_threshold with one
+    executemany UPDATE (bumping version_id). Products without demand keep their threshold.
+    Returns the number of products updated.
+    """
+    products = plan.products
+    thresholds = np.ceil(plan.reorder_point).astype(np.int64)
+    changed = np.nonzero((plan.forecast > 0) & (thresholds != products.low_stock_threshold))[0]
+    if not changed.size:
+        return 0
+    table = Product.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_product_id'))
+        .values(low_stock_threshold=bindparam('b_threshold'), version_id=table.c.version_id + 1),
+        [{'b_product_id': int(products.ids[i]), 'b_threshold': int(thresholds[i])} for i in changed]
+    )
+    record_changes('products', OP_UPDATE,
+                   ({'id': int(products.ids[i]), 'low_stock_threshold': int(thresholds[i])} for i in changed),
+                   changed=('low_stock_threshold', 'version_id'))
+    db.session.commit()
+    return int(changed.size)
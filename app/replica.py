@@ -0,0 +1,200 @@
+# app/replica.py
+# Rapor sorgularının salt okunur replikaya yönlendirilmesi.
+#
+# SQLALCHEMY_BINDS içinde 'replica' anahtarıyla bir veritabanı tanımlıysa, @read_replica ile
+# işaretlenen view'lardaki SELECT sorguları replika engine'ine gider. Aynı istek içinde bir yazma
+# (flush, INSERT/UPDATE/DELETE) yapılırsa oturum transaction sonuna kadar birincil veritabanına
+# sabitlenir (kendi yazdığını okuma).
+#
+# Gecikme, birincilde periyodik olarak güncellenen replica_heartbeat satırının replikada görünen
+# değerinden ölçülür (üst sınır: şimdi - replikadaki son nabız). Gecikme REPLICA_MAX_LAG_SECONDS'ı
+# aşarsa, replika ulaşılamıyorsa ya da sorgu sırasında hata verirse istek birincil üzerinde
+# çalıştırılır.
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError
+
+REPLICA_BIND_KEY = 'replica'
+_READ_KEY = 'read_replica_bind'
+_PINNED_KEY = 'read_replica_pinned'
+_USED_KEY = 'read_replica_used'
+
+# Async view'larda (app/async_db.py) kullanılacak bind; senkron oturum yerine bu değişkene bakılır
+_async_bind = ContextVar('read_replica_async_bind', default=None)
+
+DEFAULTS = {
+    'REPLICA_MAX_LAG_SECONDS': 30,
+    'REPLICA_CHECK_INTERVAL': 5,
+    'REPLICA_RETRY_AFTER': 30,
+}
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends reads to the replica bind while a read_replica view runs."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        bind_key = self.info.get(_READ_KEY)
+        if bind is None and bind_key and not self.info.get(_PINNED_KEY):
+            if self._flushing or (clause is not None and not getattr(clause, 'is_select', False)):
+                self.info[_PINNED_KEY] = True
+            else:
+                engine = self._db.engines.get(bind_key)
+                if engine is not None:
+                    self.info[_USED_KEY] = True
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@sa.event.listens_for(RoutingSession, 'after_commit')
+@sa.event.listens_for(RoutingSession, 'after_soft_rollback')
+def _unpin(session, *args):
+    session.info.pop(_PINNED_KEY, None)
+
+
+class ReplicaRouter:
+    """Per-app replica health (heartbeat lag, cached) and routing counters."""
+
+    def __init__(self, app):
+        self.max_lag = app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULTS['REPLICA_MAX_LAG_SECONDS'])
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', DEFAULTS['REPLICA_CHECK_INTERVAL'])
+        self.retry_after = app.config.get('REPLICA_RETRY_AFTER', DEFAULTS['REPLICA_RETRY_AFTER'])
+        self.configured = REPLICA_BIND_KEY in (app.config.get('SQLALCHEMY_BINDS') or {})
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._lag = None
+        self._down_until = 0.0
+        self._counters = {'replica_requests': 0, 'fallback_lagging': 0, 'fallback_unavailable': 0,
+                          'fallback_error': 0}
+
+    def record(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def measure_lag(self, db):
+        """Writes a heartbeat on the primary and returns seconds since the newest heartbeat the replica has."""
+        from app.models import ReplicaHeartbeat
+        table = ReplicaHeartbeat.__table__
+        now = datetime.utcnow()
+        with db.engines[None].begin() as conn:
+            if not conn.execute(sa.update(table).where(table.c.id == 1).values(beat_at=now)).rowcount:
+                conn.execute(sa.insert(table).values(id=1, beat_at=now))
+        with db.engines[REPLICA_BIND_KEY].connect() as conn:
+            beat_at = conn.execute(sa.select(table.c.beat_at).where(table.c.id == 1)).scalar()
+        return (now - beat_at).total_seconds() if beat_at else None
+
+    def lag(self, db):
+        """Cached replica lag in seconds; None when the replica is unreachable or has no heartbeat yet."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._down_until:
+                return None
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._lag
+            self._checked_at = now  # aynı anda yalnızca bir iş parçacığı ölçer
+        try:
+            lag = self.measure_lag(db)
+        except DBAPIError as e:
+            current_app.logger.warning(f'Read replica health check failed: {e}')
+            self.mark_down()
+            return None
+        with self._lock:
+            self._lag = lag
+        return lag
+
+    def mark_down(self):
+        with self._lock:
+            self._lag = None
+            self._down_until = time.monotonic() + self.retry_after
+
+    def choose(self, db, max_lag=None):
+        """True when reads may go to the replica now; records why not otherwise."""
+        if not self.configured:
+            return False
+        lag = self.lag(db)
+        if lag is None:
+            self.record('fallback_unavailable')
+            return False
+        if lag > (self.max_lag if max_lag is None else max_lag):
+            self.record('fallback_lagging')
+            return False
+        self.record('replica_requests')
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self._counters)
+            data.update({'configured': self.configured, 'lag_seconds': self._lag, 'max_lag_seconds': self.max_lag,
+                         'down': time.monotonic() < self._down_until})
+            return data
+
+
+def init_app(app):
+    app.extensions['replica_router'] = ReplicaRouter(app)
+
+
+def current_async_bind():
+    return _async_bind.get()
+
+
+def read_replica(view=None, max_lag=None):
+    """
+    Runs the view's SELECTs on the read replica when it is configured and fresh enough
+    (max_lag overrides REPLICA_MAX_LAG_SECONDS). Falls back to the primary otherwise, and
+    re-runs the view on the primary if the replica fails mid-request. Works for async views too.
+    """
+    def decorator(f):
+        if inspect.iscoroutinefunction(f):
+            @wraps(f)
+            async def decorated_coroutine(*args, **kwargs):
+                db = current_app.extensions['sqlalchemy']
+                router = current_app.extensions.get('replica_router')
+                if router is None or not router.choose(db, max_lag):
+                    return await f(*args, **kwargs)
+                token = _async_bind.set(REPLICA_BIND_KEY)
+                try:
+                    return await f(*args, **kwargs)
+                except DBAPIError as e:
+                    current_app.logger.warning(f'Read replica query failed, retrying on primary: {e}')
+                    router.mark_down()
+                    router.record('fallback_error')
+                    _async_bind.set(None)
+                    return await f(*args, **kwargs)
+                finally:
+                    _async_bind.reset(token)
+
+            return decorated_coroutine
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            db = current_app.extensions['sqlalchemy']
+            router = current_app.extensions.get('replica_router')
+            if router is None or not router.choose(db, max_lag):
+                return f(*args, **kwargs)
+            session = db.session()
+            session.info[_READ_KEY] = REPLICA_BIND_KEY
+            try:
+                return f(*args, **kwargs)
+            except DBAPIError as e:
+                if not session.info.get(_USED_KEY) or session.info.get(_PINNED_KEY):
+                    raise
+                current_app.logger.warning(f'Read replica query failed, retrying on primary: {e}')
+                router.mark_down()
+                router.record('fallback_error')
+                session.rollback()
+                session.info.pop(_READ_KEY, None)
+                return f(*args, **kwargs)
+            finally:
+                session.info.pop(_READ_KEY, None)
+                session.info.pop(_USED_KEY, None)
+
+        return decorated_function
+
+    return decorator(view) if view is not None else decorator
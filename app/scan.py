@@ -0,0 +1,163 @@
+# app/scan.py
+# El terminali (barkod okuyucu) taramaları için SKU çözümleme.
+#
+# Product.sku benzersiz ve indekslidir. Tarama uç noktaları yalnızca küçük, nadiren değişen bir
+# özet (id, sku, ad, depo) döndürür; stok gibi sık değişen alanlar bilerek dahil edilmez. Özetler
+# süreç içindeki sınırlı bir LRU önbellekte tutulur, böylece tekrar eden taramalar veritabanına
+# gitmez. Önbellek, aynı süreçteki ORM yazmalarında commit sonrası ilgili SKU'lar için temizlenir;
+# diğer süreçlerde en fazla SCAN_CACHE_SECONDS eski kalabilir. Toplu tarama önbellekte olmayan
+# kodları tek bir "sku IN (...)" sorgusuyla çözer.
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event, select, inspect
+
+from app import db
+from app.models import Product
+
+DEFAULTS = {
+    'SCAN_CACHE_SIZE': 50000,
+    'SCAN_CACHE_SECONDS': 300,
+    'SCAN_BATCH_MAX': 1000,
+}
+
+# Özetteki alanlar; bunlardan biri değişince önbellek kaydı geçersiz olur
+SUMMARY_COLUMNS = ('id', 'sku', 'name', 'warehouse_id')
+
+_STALE_KEY = 'scan_stale_skus'
+
+
+class ScanError(Exception):
+    """Raised for invalid scan requests (e.g. too many codes in one batch)."""
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+def normalize_sku(code):
+    """Scanner input as stored in Product.sku: surrounding whitespace removed, None for empty."""
+    code = (code or '').strip()
+    return code or None
+
+
+class ScanCache:
+    """Thread-safe LRU of SKU -> summary dict with a maximum entry age."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sku, max_age):
+        with self._lock:
+            entry = self._entries.get(sku)
+            if entry is None or time.monotonic() - entry[0] >= max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sku)
+            self.hits += 1
+            return entry[1]
+
+    def put_many(self, summaries, max_size):
+        now = time.monotonic()
+        with self._lock:
+            for summary in summaries:
+                self._entries[summary['sku']] = (now, summary)
+                self._entries.move_to_end(summary['sku'])
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, skus=None):
+        with self._lock:
+            if skus is None:
+                self._entries.clear()
+            for sku in skus or ():
+                self._entries.pop(sku, None)
+
+    def snapshot(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+scan_cache = ScanCache()
+
+
+def _summaries(skus):
+    columns = [getattr(Product, name) for name in SUMMARY_COLUMNS]
+    rows = db.session.execute(select(*columns).where(Product.sku.in_(skus))).all()
+    return [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+
+
+def resolve(codes):
+    """
+    {sku: summary} for the given scanned codes; unknown codes are left out. Cached codes cost
+    nothing, the rest are fetched in a single query.
+    """
+    max_age = _setting('SCAN_CACHE_SECONDS')
+    found, missing = {}, []
+    for sku in dict.fromkeys(filter(None, map(normalize_sku, codes))):
+        summary = scan_cache.get(sku, max_age)
+        if summary is None:
+            missing.append(sku)
+        else:
+            found[sku] = summary
+    if missing:
+        fetched = _summaries(missing)
+        scan_cache.put_many(fetched, _setting('SCAN_CACHE_SIZE'))
+        found.update((summary['sku'], summary) for summary in fetched)
+    return found
+
+
+def resolve_one(code):
+    return resolve([code]).get(normalize_sku(code))
+
+
+def resolve_batch(codes):
+    """(found {sku: summary}, missing [codes]) for one batch submission."""
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        raise ScanError('"codes" must be a list of strings.')
+    if len(codes) > _setting('SCAN_BATCH_MAX'):
+        raise ScanError(f'At most {_setting("SCAN_BATCH_MAX")} codes can be submitted at once.')
+    found = resolve(codes)
+    missing = [code for code in dict.fromkeys(codes) if normalize_sku(code) not in found]
+    return found, missing
+
+
+def warm_scan_cache():
+    """Loads the summaries of the most recently updated products with a SKU (up to SCAN_CACHE_SIZE)."""
+    columns = [getattr(Product, name) for name in SUMMARY_COLUMNS]
+    rows = db.session.execute(select(*columns).where(Product.sku != None)
+                              .order_by(Product.updated_at.desc()).limit(_setting('SCAN_CACHE_SIZE'))).all()
+    # En son güncellenenler LRU'nun sıcak ucunda kalsın diye ters sırada eklenir
+    scan_cache.put_many([dict(zip(SUMMARY_COLUMNS, row)) for row in reversed(rows)], _setting('SCAN_CACHE_SIZE'))
+    return len(rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _note_changed_skus(session, flush_context):
+    stale = None
+    for obj in (*session.dirty, *session.deleted):
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or any(state.attrs[name].history.has_changes() for name in SUMMARY_COLUMNS):
+            stale = stale if stale is not None else session.info.setdefault(_STALE_KEY, set())
+            # SKU değiştiyse hem eski hem yeni değer önbellekten düşer
+            history = state.attrs.sku.history
+            stale.update(sku for sku in (*history.deleted, *history.unchanged, *history.added) if sku)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    stale = session.info.pop(_STALE_KEY, None)
+    if stale:
+        scan_cache.invalidate(stale)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _forget_changed_skus(session, previous_transaction):
+    session.info.pop(_STALE_KEY, None)
@@ -1,11 +1,12 @@
 # app/suppliers/routes.py
-from flask import render_template, redirect, url_for, flash, request, abort
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify
 from flask_login import login_required
 from app import db
 from app.suppliers import bp
 from app.models import Supplier, Product
 from app.forms import SupplierForm, EmptyForm
 from app.decorators import can_view_general_data, can_manage_core_data, admin_required
+from app.lookups import search
 
 
 @bp.route('/')
@@ -25,6 +26,15 @@ def list_suppliers():
                            delete_forms=delete_forms)
 
 
+@bp.route('/lookup')
+@login_required
+@can_view_general_data
+def lookup_suppliers():
+    # Typeahead için önek araması: ?q=<ad başlangıcı>&limit=<en fazla 100>
+    return jsonify({'results': search('supplier', request.args.get('q', '').strip(),
+                                      request.args.get('limit', type=int))})
+
+
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @can_manage_core_data  # Manage for Admin, WM
@@ -40,7 +50,8 @@ def add_supplier():
                 contact=form.contact_name.data if form.contact_name.data else None,  # Modelde 'contact'
                 # contact_email=form.contact_email.data if hasattr(form, 'contact_email') and form.contact_email.data else None, # Eğer modelde varsa
                 # contact_phone=form.contact_phone.data if hasattr(form, 'contact_phone') and form.contact_phone.data else None, # Eğer modelde varsa
-                address=form.address.data if form.address.data else None
+                address=form.address.data if form.address.data else None,
+                lead_time_days=form.lead_time_days.data
             )
             db.session.add(new_supplier)
             db.session.commit()
@@ -69,6 +80,7 @@ def edit_supplier(supplier_id):
         # if hasattr(form, 'contact_email'): supplier_to_edit.contact_email = form.contact_email.data if form.contact_email.data else None
         # if hasattr(form, 'contact_phone'): supplier_to_edit.contact_phone = form.contact_phone.data if form.contact_phone.data else None
         supplier_to_edit.address = form.address.data if form.address.data else None
+        supplier_to_edit.lead_time_days = form.lead_time_days.data
         db.session.commit()
         flash(f'Supplier "{supplier_to_edit.name}" has been updated successfully!', 'info')
         return redirect(url_for('suppliers.list_suppliers'))
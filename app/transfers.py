@@ -0,0 +1,241 @@
+# app/transfers.py
+# Depolar arası toplu stok transferi.
+#
+# Transfer, (ürün veya SKU, kaynak depo, hedef depo, miktar) satırlarından oluşur ve tek transaction
+# içinde uygulanır:
+#   - Satırlar (ürün, depo) bazında toplanır; stok alan depoların satırları kilitlenir (FOR UPDATE,
+#     id sırasıyla) ve kapasite, tüm depoların mevcut doluluğunu getiren tek bir gruplu sorguyla,
+#     transferin net etkisi eklenerek kontrol edilir. Eşzamanlı transferler aynı depoya sırayla girer.
+#   - Kaynak depo stoğu koşullu toplu UPDATE ile düşülür (WHERE quantity >= miktar); stok yetmezse
+#     transfer hiç uygulanmaz. Hedefte satırı olanlar toplu UPDATE ile artırılır, olmayanlar eklenir.
+#   - Ürün toplamı (Product.quantity_in_stock) değişmez; her satır için kaynakta -, hedefte +
+#     'transfer' defter kaydı yazılır.
+#   - update_home=True ise ana deposu (Product.warehouse_id) kaynak depo olan ve oradaki stoğu
+#     tamamen taşınan ürünlerin ana deposu hedef depo olur; yalnızca ana deposu gerçekten değişenler
+#     raporlanır ve değişiklik akışına yazılır.
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, update, insert, func, bindparam, exists
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Product, WarehouseLocation, WarehouseStock
+from app.ledger import record_movements, MOVEMENT_TRANSFER
+from app.cdc import record_changes, OP_UPDATE
+from app.concurrency import run_with_retry, matched_rows
+from app.scan import resolve, normalize_sku, scan_cache
+from app.utils import chunked
+
+MAX_REPORTED_ERRORS = 20
+
+
+class TransferError(Exception):
+    """Raised when a transfer is invalid (bad lines, missing stock, capacity exceeded)."""
+
+
+class TransferConflict(Exception):
+    """Raised when a target stock row was created concurrently; the transfer is retried."""
+
+
+def _int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate(moves):
+    """Returns [(product_id, from_warehouse_id, to_warehouse_id, quantity)] or raises TransferError."""
+    if not isinstance(moves, list) or not moves:
+        raise TransferError('"moves" must be a non-empty list.')
+    errors, parsed = [], []
+    for index, move in enumerate(moves):
+        if not isinstance(move, dict):
+            errors.append(f'Line {index + 1}: must be an object.')
+            continue
+        source, target, qty = move.get('from_warehouse_id'), move.get('to_warehouse_id'), move.get('quantity')
+        if not (_int(source) and _int(target)):
+            errors.append(f'Line {index + 1}: from_warehouse_id and to_warehouse_id must be integers.')
+        elif source == target:
+            errors.append(f'Line {index + 1}: source and target warehouse are the same.')
+        elif not _int(qty) or qty <= 0:
+            errors.append(f'Line {index + 1}: quantity must be a positive integer.')
+        elif move.get('product_id') is None and normalize_sku(move.get('sku')) is None:
+            errors.append(f'Line {index + 1}: product_id or sku is required.')
+        elif move.get('product_id') is not None and not _int(move['product_id']):
+            errors.append(f'Line {index + 1}: product_id must be an integer.')
+        else:
+            parsed.append((index, move.get('product_id'), normalize_sku(move.get('sku')), source, target, qty))
+
+    skus = resolve([sku for _, product_id, sku, *_ in parsed if product_id is None])
+    product_ids = {product_id for _, product_id, *_ in parsed if product_id is not None}
+    existing = set()
+    for chunk in chunked(product_ids):
+        existing.update(db.session.execute(select(Product.id).where(Product.id.in_(chunk))).scalars())
+    warehouse_ids = {w for _, _, _, source, target, _ in parsed for w in (source, target)}
+    known_warehouses = set(db.session.execute(select(WarehouseLocation.id)
+                                              .where(WarehouseLocation.id.in_(warehouse_ids))).scalars()) \
+        if warehouse_ids else set()
+
+    result = []
+    for index, product_id, sku, source, target, qty in parsed:
+        if product_id is None:
+            if sku not in skus:
+                errors.append(f'Line {index + 1}: unknown SKU "{sku}".')
+                continue
+            product_id = skus[sku]['id']
+        elif product_id not in existing:
+            errors.append(f'Line {index + 1}: product {product_id} does not exist.')
+            continue
+        missing = [w for w in (source, target) if w not in known_warehouses]
+        if missing:
+            errors.append(f'Line {index + 1}: warehouse {missing[0]} does not exist.')
+            continue
+        result.append((product_id, source, target, qty))
+    if errors:
+        more = f' (and {len(errors) - MAX_REPORTED_ERRORS} more)' if len(errors) > MAX_REPORTED_ERRORS else ''
+        raise TransferError(' '.join(errors[:MAX_REPORTED_ERRORS]) + more)
+    return result
+
+
+def warehouse_occupancy(warehouse_ids):
+    """{warehouse_id: (capacity, occupancy)} for the given warehouses in one grouped query."""
+    rows = db.session.execute(
+        select(WarehouseLocation.id, WarehouseLocation.capacity, func.coalesce(func.sum(WarehouseStock.quantity), 0))
+        .outerjoin(WarehouseStock, WarehouseStock.warehouse_id == WarehouseLocation.id)
+        .where(WarehouseLocation.id.in_(list(warehouse_ids)))
+        .group_by(WarehouseLocation.id, WarehouseLocation.capacity)
+    ).all()
+    return {warehouse_id: (capacity, int(occupancy)) for warehouse_id, capacity, occupancy in rows}
+
+
+def _lock_warehouses(warehouse_ids):
+    """Locks the given warehouse rows (in id order, to avoid deadlocks) until the transaction ends."""
+    # SQL Server FOR UPDATE yazmaz; kilit tablo ipucuyla alınır
+    if warehouse_ids:
+        db.session.execute(select(WarehouseLocation.id).where(WarehouseLocation.id.in_(sorted(warehouse_ids)))
+                           .order_by(WarehouseLocation.id).with_for_update()
+                           .with_hint(WarehouseLocation, 'WITH (UPDLOCK, ROWLOCK)', 'mssql')).all()
+
+
+def _check_capacity(net_by_warehouse):
+    # Doluluk okunmadan önce stok alan depolar kilitlenir; aksi halde eşzamanlı iki transfer aynı
+    # boş alanı görüp kapasiteyi birlikte aşabilir
+    _lock_warehouses([warehouse_id for warehouse_id, net in net_by_warehouse.items() if net > 0])
+    occupancy = warehouse_occupancy(net_by_warehouse)
+    report, errors = {}, []
+    for warehouse_id, net in sorted(net_by_warehouse.items()):
+        capacity, before = occupancy[warehouse_id]
+        after = before + net
+        report[warehouse_id] = {'capacity': capacity, 'occupancy_before': before, 'occupancy_after': after}
+        # Kapasitesi tanımsız (veya 0) depolar kapasite raporundaki gibi sınırsız sayılır
+        if net > 0 and capacity and after > capacity:
+            errors.append(f'Warehouse {warehouse_id} would hold {after} units, above its capacity of {capacity}.')
+    if errors:
+        raise TransferError(' '.join(errors))
+    return report
+
+
+def _existing_stock_rows(pairs):
+    """Set of (product_id, warehouse_id) pairs that already have a warehouse_stock row."""
+    found = set()
+    by_product = defaultdict(set)
+    for product_id, warehouse_id in pairs:
+        by_product[product_id].add(warehouse_id)
+    for chunk in chunked(by_product):
+        rows = db.session.execute(select(WarehouseStock.product_id, WarehouseStock.warehouse_id)
+                                  .where(WarehouseStock.product_id.in_(chunk))).all()
+        found.update((p, w) for p, w in rows if w in by_product[p])
+    return found
+
+
+def _transfer(moves, reference, update_home):
+    lines = _validate(moves)
+    outgoing, incoming = defaultdict(int), defaultdict(int)
+    net_by_warehouse = defaultdict(int)
+    for product_id, source, target, qty in lines:
+        outgoing[(product_id, source)] += qty
+        incoming[(product_id, target)] += qty
+        net_by_warehouse[source] -= qty
+        net_by_warehouse[target] += qty
+    capacity = _check_capacity(net_by_warehouse)
+
+    stock = WarehouseStock.__table__
+    now = datetime.utcnow()
+    matched = matched_rows(
+        update(stock)
+        .where(stock.c.product_id == bindparam('b_product_id'), stock.c.warehouse_id == bindparam('b_warehouse_id'),
+               stock.c.quantity >= bindparam('b_quantity'))
+        .values(quantity=stock.c.quantity - bindparam('b_quantity'), updated_at=now),
+        [{'b_product_id': p, 'b_warehouse_id': w, 'b_quantity': q} for (p, w), q in outgoing.items()])
+    if matched < len(outgoing):
+        raise TransferError('Not enough stock in a source warehouse for at least one product. Nothing was moved.')
+
+    existing = _existing_stock_rows(incoming)
+    increments = [{'b_product_id': p, 'b_warehouse_id': w, 'b_quantity': q}
+                  for (p, w), q in incoming.items() if (p, w) in existing]
+    if increments:
+        db.session.execute(
+            update(stock)
+            .where(stock.c.product_id == bindparam('b_product_id'), stock.c.warehouse_id == bindparam('b_warehouse_id'))
+            .values(quantity=stock.c.quantity + bindparam('b_quantity'), updated_at=now),
+            increments)
+    new_rows = [{'product_id': p, 'warehouse_id': w, 'quantity': q}
+                for (p, w), q in incoming.items() if (p, w) not in existing]
+    if new_rows:
+        try:
+            db.session.execute(insert(stock), new_rows)
+        except IntegrityError:
+            raise TransferConflict()
+
+    rehomed = []
+    if update_home:
+        products = Product.__table__
+        moved_out = exists().where(stock.c.product_id == products.c.id, stock.c.warehouse_id == products.c.warehouse_id,
+                                   stock.c.quantity > 0)
+        candidates = {(p, source, target) for p, source, target, _ in lines}
+        # Yalnızca ana deposu kaynak depo olan ürünler taşınabilir; hedefte zaten duranlar sayılmaz
+        homes = {}
+        for chunk in chunked({p for p, _, _ in candidates}):
+            homes.update(db.session.execute(select(Product.id, Product.warehouse_id)
+                                            .where(Product.id.in_(chunk))).all())
+        candidates = {(p, s, t) for p, s, t in candidates if homes.get(p) == s}
+        if candidates:
+            db.session.execute(
+                update(products)
+                .where(products.c.id == bindparam('b_product_id'), products.c.warehouse_id == bindparam('b_source'),
+                       ~moved_out)
+                .values(warehouse_id=bindparam('b_target'), version_id=products.c.version_id + 1, updated_at=now),
+                [{'b_product_id': p, 'b_source': s, 'b_target': t} for p, s, t in candidates])
+        # Hangi ürünlerin taşındığı executemany'den okunamaz; kaynaktan hedef depoya geçenler sorgulanır
+        targets = {(p, t) for p, _, t in candidates}
+        for chunk in chunked({p for p, _ in targets}):
+            rows = db.session.execute(select(Product.id, Product.warehouse_id, Product.sku)
+                                      .where(Product.id.in_(chunk))).all()
+            rehomed.extend(row for row in rows if (row.id, row.warehouse_id) in targets)
+        record_changes('products', OP_UPDATE, ({'id': row.id, 'warehouse_id': row.warehouse_id} for row in rehomed),
+                       changed=('warehouse_id', 'version_id'))
+
+    reference = (reference or 'Bulk transfer')[:100]
+    record_movements([row for product_id, source, target, qty in lines for row in (
+        {'product_id': product_id, 'movement_type': MOVEMENT_TRANSFER, 'quantity': -qty,
+         'warehouse_id': source, 'reference': reference},
+        {'product_id': product_id, 'movement_type': MOVEMENT_TRANSFER, 'quantity': qty,
+         'warehouse_id': target, 'reference': reference})])
+    db.session.commit()
+    # Core UPDATE ORM olaylarını tetiklemez; tarama özetindeki depo alanı burada tazelenir
+    scan_cache.invalidate([row.sku for row in rehomed if row.sku])
+    return {'moves': len(lines), 'units': sum(qty for *_, qty in lines),
+            'products': len({product_id for product_id, *_ in lines}), 'rehomed_products': len(rehomed),
+            'warehouses': capacity}
+
+
+def transfer_stock(moves, reference=None, update_home=False):
+    """
+    moves: [{'product_id' or 'sku', 'from_warehouse_id', 'to_warehouse_id', 'quantity'}, ...].
+    Moves everything in one transaction or nothing; returns a summary with per-warehouse occupancy.
+    """
+    try:
+        return run_with_retry('transfer_stock', lambda: _transfer(moves, reference, update_home),
+                              retry_on=(TransferConflict,))
+    except TransferError:
+        db.session.rollback()
+        raise
@@ -0,0 +1,12 @@
+# app/utils.py
+# Birden fazla modülün kullandığı küçük veritabanı yardımcıları.
+
+# MS SQL Server tek bir ifadede en fazla 2100 parametre kabul eder; büyük IN (...) listeleri
+# bu boyutta parçalara bölünür.
+IN_CLAUSE_CHUNK_SIZE = 2000
+
+
+def chunked(values, size=IN_CLAUSE_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
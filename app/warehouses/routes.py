@@ -1,12 +1,18 @@
 # app/warehouses/routes.py
-from flask import render_template, redirect, url_for, flash, request, abort
-from flask_login import login_required
+from flask import render_template, redirect, url_for, flash, request, abort, jsonify
+from flask_login import login_required, current_user
 from sqlalchemy import case
 from app import db
 from app.warehouses import bp
-from app.models import WarehouseLocation, Product
+from app.models import WarehouseLocation, Product, CycleCount, WarehouseStock
 from app.forms import WarehouseLocationForm, EmptyForm
-from app.decorators import can_view_general_data, can_manage_core_data, admin_required
+from app.decorators import can_view_general_data, can_manage_core_data, admin_required, role_required, \
+    manager_or_admin_required
+from app.concurrency import StockConflictError
+from app.cycle_count import open_count, submit_lines, variance_summary, list_variances, apply_count, cancel_count, \
+    CycleCountError, STATUS_OPEN
+from app.lookups import search, cached_choices
+from app.transfers import transfer_stock, warehouse_occupancy, TransferError
 
 @bp.route('/')
 @login_required
@@ -28,6 +34,14 @@ def list_warehouses():
                            pagination=warehouses_pagination,
                            delete_forms=delete_forms)
 
+@bp.route('/lookup')
+@login_required
+@can_view_general_data
+def lookup_warehouses():
+    # Typeahead için önek araması (adı olmayan depolarda adres): ?q=...&limit=...
+    return jsonify({'results': search('warehouse', request.args.get('q', '').strip(),
+                                      request.args.get('limit', type=int))})
+
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
 @can_manage_core_data # Manage for Admin, WM
@@ -86,8 +100,209 @@ def delete_warehouse(warehouse_id):
     if warehouse_to_delete.products_stored.first():
         flash(f'Warehouse "{warehouse_to_delete.name or warehouse_to_delete.address}" cannot be deleted because it has products stored in it.', 'danger')
         return redirect(url_for('warehouses.list_warehouses'))
+    if warehouse_to_delete.cycle_counts.first():
+        # Sayım geçmişi denetim kaydıdır; silinmez (cycle_counts.warehouse_id boş olamaz)
+        flash(f'Warehouse "{warehouse_to_delete.name or warehouse_to_delete.address}" cannot be deleted because it has cycle count history.', 'danger')
+        return redirect(url_for('warehouses.list_warehouses'))
+    if warehouse_to_delete.stock_levels.filter(WarehouseStock.quantity != 0).first():
+        # Transferle gelen veya ürünün deposu değişince kalan stok; önce taşınmalı
+        flash(f'Warehouse "{warehouse_to_delete.name or warehouse_to_delete.address}" cannot be deleted because it still holds stock.', 'danger')
+        return redirect(url_for('warehouses.list_warehouses'))
     warehouse_identifier = warehouse_to_delete.name or warehouse_to_delete.address
+    # Boşalmış depo stoğu satırları depoyla birlikte silinir (warehouse_stock.warehouse_id boş olamaz)
+    warehouse_to_delete.stock_levels.delete(synchronize_session=False)
     db.session.delete(warehouse_to_delete)
     db.session.commit()
     flash(f'Warehouse location "{warehouse_identifier}" has been deleted.', 'success')
-    return redirect(url_for('warehouses.list_warehouses'))
\ No newline at end of file
+    return redirect(url_for('warehouses.list_warehouses'))
+
+
+# --- Sayım (cycle count) ---------------------------------------------------------------------
+
+COUNTING_ROLES = ['Admin', 'WarehouseManager', 'InventoryStaff']
+VARIANCES_PER_PAGE = 50
+
+
+def _parse_sku_lines(text, qty_key, error):
+    # Form girişi: her satırda "SKU,miktar" (veya "#ürün_id,miktar"); boş satırlar atlanır
+    lines = []
+    for number, raw in enumerate((text or '').splitlines(), 1):
+        if not raw.strip():
+            continue
+        code, _, qty = raw.rpartition(',')
+        code, qty = code.strip(), qty.strip()
+        if not code or not qty.lstrip('-').isdigit():
+            raise error(f'Line {number}: expected "SKU,quantity".')
+        if code.startswith('#') and code[1:].isdigit():
+            lines.append({'product_id': int(code[1:]), qty_key: int(qty)})
+        else:
+            lines.append({'sku': code, qty_key: int(qty)})
+    return lines
+
+
+def _parse_count_text(text):
+    return _parse_sku_lines(text, 'counted_qty', CycleCountError)
+
+
+@bp.route('/<int:warehouse_id>/counts', methods=['GET', 'POST'])
+@login_required
+@role_required(COUNTING_ROLES)
+def cycle_counts(warehouse_id):
+    warehouse = db.session.get(WarehouseLocation, warehouse_id) or abort(404)
+    form = EmptyForm()
+    if form.validate_on_submit():
+        try:
+            count = open_count(warehouse_id, user_id=current_user.id)
+        except CycleCountError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('warehouses.cycle_counts', warehouse_id=warehouse_id))
+        flash(f'Cycle count #{count.id} opened. Submit counted quantities below.', 'success')
+        return redirect(url_for('warehouses.cycle_count_detail', count_id=count.id))
+    counts = CycleCount.query.filter_by(warehouse_id=warehouse_id).order_by(CycleCount.created_at.desc()).limit(20).all()
+    return render_template('warehouses/cycle_counts.html', title=f'Cycle Counts: {warehouse.name or warehouse.address}',
+                           warehouse=warehouse, counts=counts, form=form)
+
+
+@bp.route('/counts/<int:count_id>')
+@login_required
+@role_required(COUNTING_ROLES)
+def cycle_count_detail(count_id):
+    count = db.session.get(CycleCount, count_id) or abort(404)
+    include_uncounted = request.args.get('uncounted') == '1'
+    page = max(request.args.get('page', 1, type=int), 1)
+    summary = variance_summary(count, include_uncounted)
+    variances = list_variances(count, include_uncounted, limit=VARIANCES_PER_PAGE,
+                               offset=(page - 1) * VARIANCES_PER_PAGE) if count.status == STATUS_OPEN else []
+    return render_template('warehouses/cycle_count.html', title=f'Cycle Count #{count.id}', count=count,
+                           summary=summary, variances=variances, include_uncounted=include_uncounted, page=page,
+                           per_page=VARIANCES_PER_PAGE, form=EmptyForm())
+
+
+@bp.route('/counts/<int:count_id>/lines', methods=['POST'])
+@login_required
+@role_required(COUNTING_ROLES)
+def submit_cycle_count_lines(count_id):
+    # JSON: {"lines": [{"sku" | "product_id", "counted_qty"}, ...], "replace": false}; form: "lines" metni
+    count = db.session.get(CycleCount, count_id) or abort(404)
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Request body must be a JSON object with a "lines" list.'}), 400
+        try:
+            result = submit_lines(count, payload.get('lines'), user_id=current_user.id,
+                                  replace=bool(payload.get('replace')))
+        except CycleCountError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
+    form = EmptyForm()
+    if not form.validate_on_submit():
+        abort(400)
+    try:
+        result = submit_lines(count, _parse_count_text(request.form.get('lines')), user_id=current_user.id,
+                              replace=request.form.get('replace') == '1')
+        flash(f"{result['accepted']} lines for {result['products']} products recorded.", 'success')
+    except CycleCountError as e:
+        flash(str(e), 'danger')
+    return redirect(url_for('warehouses.cycle_count_detail', count_id=count_id))
+
+
+@bp.route('/counts/<int:count_id>/variances')
+@login_required
+@role_required(COUNTING_ROLES)
+def cycle_count_variances(count_id):
+    count = db.session.get(CycleCount, count_id) or abort(404)
+    include_uncounted = request.args.get('uncounted') == '1'
+    limit = min(request.args.get('limit', 1000, type=int), 10000)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify({'summary': variance_summary(count, include_uncounted),
+                    'variances': list_variances(count, include_uncounted, limit=limit, offset=offset)})
+
+
+@bp.route('/counts/<int:count_id>/apply', methods=['POST'])
+@login_required
+@manager_or_admin_required
+def apply_cycle_count(count_id):
+    count = db.session.get(CycleCount, count_id) or abort(404)
+    form = EmptyForm()
+    if not form.validate_on_submit():
+        abort(400)
+    # "Apply selected": yalnızca işaretlenen ürünlerin farkları uygulanır, diğerleri atılır
+    product_ids = request.form.getlist('product_id', type=int) if request.form.get('selected') == '1' else None
+    if product_ids == []:
+        flash('Select the adjustments to apply.', 'warning')
+        return redirect(url_for('warehouses.cycle_count_detail', count_id=count_id))
+    try:
+        count = apply_count(count, include_uncounted=request.form.get('uncounted') == '1', product_ids=product_ids)
+    except (CycleCountError, StockConflictError) as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('warehouses.cycle_count_detail', count_id=count_id))
+    flash(f'Cycle count #{count.id} applied: {count.adjusted_products} products adjusted '
+          f'(net {count.net_adjustment:+d} units).', 'success')
+    return redirect(url_for('warehouses.cycle_counts', warehouse_id=count.warehouse_id))
+
+
+@bp.route('/counts/<int:count_id>/cancel', methods=['POST'])
+@login_required
+@manager_or_admin_required
+def cancel_cycle_count(count_id):
+    count = db.session.get(CycleCount, count_id) or abort(404)
+    form = EmptyForm()
+    if not form.validate_on_submit():
+        abort(400)
+    try:
+        cancel_count(count)
+        flash(f'Cycle count #{count.id} cancelled.', 'info')
+    except CycleCountError as e:
+        flash(str(e), 'warning')
+    return redirect(url_for('warehouses.cycle_counts', warehouse_id=count.warehouse_id))
+
+
+# --- Depolar arası toplu transfer ------------------------------------------------------------
+
+@bp.route('/transfer', methods=['GET', 'POST'])
+@login_required
+@manager_or_admin_required
+def transfer():
+    form = EmptyForm()
+    if form.validate_on_submit():
+        source = request.form.get('from_warehouse_id', type=int)
+        target = request.form.get('to_warehouse_id', type=int)
+        try:
+            moves = [dict(line, from_warehouse_id=source, to_warehouse_id=target)
+                     for line in _parse_sku_lines(request.form.get('lines'), 'quantity', TransferError)]
+            result = transfer_stock(moves, reference=request.form.get('reference', '').strip() or None,
+                                    update_home=request.form.get('update_home') == '1')
+        except (TransferError, StockConflictError) as e:
+            flash(str(e), 'danger')
+            return render_template('warehouses/transfer.html', title='Transfer Stock', form=form,
+                                   warehouses=cached_choices('warehouse'), occupancy=None, source=source,
+                                   target=target)
+        flash(f"Moved {result['units']} units of {result['products']} products "
+              f"({result['rehomed_products']} re-homed).", 'success')
+        return redirect(url_for('warehouses.transfer', source=source, target=target))
+    source, target = request.args.get('source', type=int), request.args.get('target', type=int)
+    occupancy = warehouse_occupancy([w for w in (source, target) if w]) if source or target else None
+    return render_template('warehouses/transfer.html', title='Transfer Stock', form=form,
+                           warehouses=cached_choices('warehouse'), occupancy=occupancy, source=source, target=target)
+
+
+@bp.route('/api/transfers', methods=['POST'])
+@login_required
+@role_required(['Admin', 'WarehouseManager'], cost='bulk')
+def api_transfer():
+    # {"moves": [{"sku" | "product_id", "from_warehouse_id", "to_warehouse_id", "quantity"}, ...],
+    #  "reference": "...", "update_home": false}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Request body must be a JSON object with a "moves" list.'}), 400
+    reference = payload.get('reference')
+    if reference is not None and not isinstance(reference, str):
+        return jsonify({'error': '"reference" must be a string.'}), 400
+    try:
+        result = transfer_stock(payload.get('moves'), reference=reference,
+                                update_home=bool(payload.get('update_home')))
+    except TransferError as e:
+        return jsonify({'error': str(e)}), 400
+    except StockConflictError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(result), 200
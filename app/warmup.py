@@ -0,0 +1,107 @@
+# app/warmup.py
+# Bir işçi süreci istek almaya başlamadan önce yapılan ısınma adımları (gunicorn.conf.py ->
+# post_worker_init). Bağlantı havuzu doldurulur, tüm Jinja şablonları derlenip önbelleğe alınır ve
+# kayıtlı önbellekler (replika gecikmesi, ABC/XYZ sınıflandırması...) hesaplanır; böylece işçinin
+# ilk istekleri bu maliyetleri ödemez. Başka modüller register_warmup() ile adım ekleyebilir.
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+DEFAULTS = {
+    'WARMUP_CONNECTIONS': 4,
+    'WARMUP_CACHES': True,
+}
+
+_cache_steps = []
+
+
+def register_warmup(func):
+    """Registers func(app) as a cache warmup step; runs inside an app context. Usable as a decorator."""
+    _cache_steps.append(func)
+    return func
+
+
+def _setting(app, name):
+    return app.config.get(name, DEFAULTS[name])
+
+
+def dispose_engines(app, close=True):
+    """
+    Drops pooled connections of every engine. After a fork use close=False: the parent's
+    connections are left alone and the child simply opens its own.
+    """
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose(close=close)
+
+
+def warm_connections(app, count):
+    """Opens up to count connections per engine (never beyond the pool size) and returns them to the pool."""
+    opened = 0
+    for engine in app.extensions['sqlalchemy'].engines.values():
+        size = getattr(engine.pool, 'size', None)
+        wanted = min(count, size()) if callable(size) else 1
+        connections = []
+        try:
+            for _ in range(wanted):
+                conn = engine.connect()
+                connections.append(conn)
+                conn.execute(text('SELECT 1'))
+        finally:
+            for conn in connections:
+                conn.close()
+        opened += len(connections)
+    return opened
+
+
+def warm_templates(app):
+    """Compiles every HTML template into the Jinja environment's cache; returns the number compiled."""
+    env = app.jinja_env
+    names = [name for name in env.list_templates() if name.endswith('.html')]
+    if env.cache is not None and getattr(env.cache, 'capacity', len(names)) < len(names):
+        app.logger.warning(f'Jinja cache holds {env.cache.capacity} templates, {len(names)} exist.')
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+@register_warmup
+def _replica_lag(app):
+    router = app.extensions.get('replica_router')
+    if router is not None and router.configured:
+        router.lag(app.extensions['sqlalchemy'])
+
+
+@register_warmup
+def _classification(app):
+    from app.classification import get_classification
+    get_classification()
+
+
+@register_warmup
+def _scan_cache(app):
+    from app.scan import warm_scan_cache
+    warm_scan_cache()
+
+
+def warm_up(app):
+    """Runs all warmup steps and returns a summary; failing steps are logged and skipped."""
+    started = time.perf_counter()
+    summary = {'connections': 0, 'templates': warm_templates(app), 'caches': []}
+    with app.app_context():
+        try:
+            summary['connections'] = warm_connections(app, _setting(app, 'WARMUP_CONNECTIONS'))
+        except SQLAlchemyError as e:
+            app.logger.error(f'Connection pool warmup failed: {e}')
+        if _setting(app, 'WARMUP_CACHES'):
+            for step in _cache_steps:
+                try:
+                    step(app)
+                    summary['caches'].append(step.__name__.lstrip('_'))
+                except Exception as e:
+                    app.logger.error(f'Cache warmup step {step.__name__} failed: {e}')
+                finally:
+                    app.extensions['sqlalchemy'].session.remove()
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
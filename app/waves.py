@@ -0,0 +1,218 @@
+# app/waves.py
+# Bekleyen siparişler için dalga (wave) planlayıcısı.
+#
+# Planlayıcı zamanlanmış bir iş olarak çalışır (`flask orders plan-waves`, --loop ile
+# WAVE_INTERVAL_SECONDS aralıkla) ve her çalışmada yalnızca son çalışmadan sonra gelen siparişlere
+# bakar: wave_planner_state'teki imleçten (en son incelenen sipariş id'si) büyük id'li, henüz dalgası
+# olmayan bekleyen siparişler okunur. İmleç WAVE_LOOKBACK_IDS kadar geriden başlar; böylece daha
+# küçük id ile ama imleçten sonra commit edilen siparişler de kaçmaz.
+#
+# Her yeni sipariş, ağırlıklı deposundaki (en çok adetin toplanacağı depo) dolmamış "Building"
+# dalgalardan ürün kümesiyle en çok ortak ürünü olana eklenir (eşitlikte daha dolu olana); ortak
+# ürünler aynı raf durağında birlikte toplanır. Hiçbiriyle ortak ürünü yoksa, depoda WAVE_MAX_OPEN
+# açık dalga olana kadar yeni dalga açılır; sonra en dolu dalgaya eklenir. WAVE_SIZE siparişe
+# ulaşan veya en eski siparişi WAVE_CUTOFF_MINUTES'tan uzun süredir bekleyen dalgalar serbest
+# bırakılır: siparişleri Processing'e geçer ve dalganın toplama listesi hazırlanabilir.
+#
+# Aynı anda iki planlayıcı çalışırsa imleç koşullu UPDATE ile ilerletildiği için biri geri alınır.
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, func, bindparam
+
+from app import db
+from app.models import Order, OrderItem, PickWave, WavePlannerState
+from app.picking import order_pick_lines
+
+DEFAULTS = {
+    'WAVE_SIZE': 25,
+    'WAVE_MAX_OPEN': 4,
+    'WAVE_CUTOFF_MINUTES': 30,
+    'WAVE_INTERVAL_SECONDS': 300,
+    'WAVE_BATCH_MAX': 5000,
+    'WAVE_LOOKBACK_IDS': 1000,
+}
+
+STATUS_BUILDING = 'Building'
+STATUS_RELEASED = 'Released'
+
+RELEASE_ORDER_STATUS = 'Processing'
+
+_STATE_ID = 1
+
+
+class WavePlannerBusy(Exception):
+    """Raised when another planner run advanced the cursor first; this run's changes are rolled back."""
+
+
+def _setting(name):
+    return current_app.config.get(name, DEFAULTS[name])
+
+
+class _Wave:
+    """A building wave while planning: its product set, order count and oldest order date."""
+
+    def __init__(self, wave, skus=(), orders=0, oldest=None):
+        self.wave = wave
+        self.skus = set(skus)
+        self.orders = orders
+        self.oldest = oldest
+        self.new_orders = []
+
+
+def _state():
+    state = db.session.get(WavePlannerState, _STATE_ID)
+    if state is None:
+        state = WavePlannerState(id=_STATE_ID, last_order_id=0)
+        db.session.add(state)
+        db.session.flush()
+    return state
+
+
+def _building_waves():
+    """{warehouse_id: [_Wave]} for the building waves, with the products of their pending orders."""
+    waves = {wave.id: _Wave(wave) for wave in PickWave.query.filter_by(status=STATUS_BUILDING)}
+    if not waves:
+        return {}
+    stats = db.session.execute(
+        select(Order.wave_id, func.count(Order.id), func.min(Order.order_date))
+        .where(Order.wave_id.in_(list(waves)), Order.status == 'Pending')
+        .group_by(Order.wave_id)).all()
+    for wave_id, orders, oldest in stats:
+        waves[wave_id].orders, waves[wave_id].oldest = orders, oldest
+    rows = db.session.execute(
+        select(Order.wave_id, OrderItem.product_id).distinct()
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.wave_id.in_(list(waves)), Order.status == 'Pending')).all()
+    for wave_id, product_id in rows:
+        waves[wave_id].skus.add(product_id)
+    by_warehouse = {}
+    for planned in waves.values():
+        by_warehouse.setdefault(planned.wave.warehouse_id, []).append(planned)
+    return by_warehouse
+
+
+def _new_orders(cursor):
+    """{order_id: (warehouse_id, product ids, order_date)} for unplanned pending orders past the cursor."""
+    order_ids = select(Order.id).where(Order.id > cursor - _setting('WAVE_LOOKBACK_IDS'), Order.wave_id == None,
+                                       Order.status == 'Pending') \
+        .order_by(Order.id).limit(_setting('WAVE_BATCH_MAX')).subquery()
+    units, skus, dates = {}, {}, {}
+    for line in order_pick_lines(order_ids):
+        units.setdefault(line.order_id, Counter())[line.warehouse_id] += line.quantity
+        skus.setdefault(line.order_id, set()).add(line.product_id)
+        dates[line.order_id] = line.order_date
+    return {order_id: (units[order_id].most_common(1)[0][0], skus[order_id], dates[order_id])
+            for order_id in sorted(units)}
+
+
+def _place(waves, warehouse_id, skus, size, max_open):
+    """The wave an order joins (most shared products, then fullest), or None to open a new wave."""
+    candidates = [planned for planned in waves.get(warehouse_id, ()) if planned.orders < size]
+    if not candidates:
+        return None
+    best = max(candidates, key=lambda planned: (len(planned.skus & skus), planned.orders))
+    if not best.skus & skus and len(candidates) < max_open:
+        return None
+    return best
+
+
+def _assign(now):
+    state = _state()
+    cursor = state.last_order_id
+    size = _setting('WAVE_SIZE')
+    waves = _building_waves()
+    orders = _new_orders(cursor)
+
+    created = 0
+    for order_id, (warehouse_id, skus, order_date) in orders.items():
+        planned = _place(waves, warehouse_id, skus, size, _setting('WAVE_MAX_OPEN'))
+        if planned is None:
+            planned = _Wave(PickWave(warehouse_id=warehouse_id, status=STATUS_BUILDING, created_at=now))
+            db.session.add(planned.wave)
+            waves.setdefault(warehouse_id, []).append(planned)
+            created += 1
+        planned.skus |= skus
+        planned.orders += 1
+        planned.oldest = min(planned.oldest or order_date, order_date)
+        planned.new_orders.append(order_id)
+    db.session.flush()
+
+    changed = [planned for plans in waves.values() for planned in plans if planned.new_orders]
+    assignments = [{'b_order_id': order_id, 'b_wave_id': planned.wave.id}
+                   for planned in changed for order_id in planned.new_orders]
+    if assignments:
+        orders_table = Order.__table__
+        # Bu arada iptal edilen veya başka bir çalışmanın atadığı siparişler atlanır
+        db.session.execute(
+            update(orders_table)
+            .where(orders_table.c.id == bindparam('b_order_id'), orders_table.c.wave_id == None,
+                   orders_table.c.status == 'Pending')
+            .values(wave_id=bindparam('b_wave_id')),
+            assignments)
+
+    new_cursor = max([cursor, *orders])
+    result = db.session.execute(update(WavePlannerState)
+                                .where(WavePlannerState.id == _STATE_ID, WavePlannerState.last_order_id == cursor)
+                                .values(last_order_id=new_cursor, ran_at=now)
+                                .execution_options(synchronize_session=False))
+    if result.rowcount == 0:
+        raise WavePlannerBusy('Another wave planner run is in progress.')
+    for planned in changed:
+        planned.wave.order_count = planned.orders
+    db.session.commit()
+    return waves, {'new_orders': len(orders), 'waves_created': created, 'cursor': new_cursor}
+
+
+def _release(waves, now):
+    """Releases full waves and waves whose oldest order passed the cutoff; returns the released ids."""
+    # orders blueprint'i bu modülü import ettiği için burada import edilir
+    from app.orders.status import transition_orders, StatusTransitionError
+    size = _setting('WAVE_SIZE')
+    cutoff = now - timedelta(minutes=_setting('WAVE_CUTOFF_MINUTES'))
+    released = []
+    for planned in (planned for plans in waves.values() for planned in plans):
+        # Siparişleri iptal edilip boşalan dalgalar da kapatılır
+        if planned.orders and planned.orders < size and planned.oldest > cutoff:
+            continue
+        wave = planned.wave
+        order_ids = db.session.execute(select(Order.id).where(Order.wave_id == wave.id,
+                                                              Order.status == 'Pending')).scalars().all()
+        if order_ids:
+            try:
+                transition_orders(order_ids, RELEASE_ORDER_STATUS)
+            except StatusTransitionError as e:
+                # Sipariş durumları bu arada değişti; dalga bir sonraki çalışmada yeniden denenir
+                current_app.logger.warning(f'Wave #{wave.id} not released: {e}')
+                continue
+        lines, skus = db.session.execute(
+            select(func.count(OrderItem.id), func.count(func.distinct(OrderItem.product_id)))
+            .where(OrderItem.order_id.in_(order_ids))).one()
+        wave = db.session.get(PickWave, wave.id)
+        wave.status = STATUS_RELEASED
+        wave.released_at = now
+        wave.order_count = len(order_ids)
+        wave.line_count, wave.sku_count = lines, skus
+        db.session.commit()
+        released.append(wave.id)
+    return released
+
+
+def plan_waves(now=None):
+    """
+    One planner run: assigns new pending orders to waves, then releases the waves that are full or
+    past the cutoff. Returns {'new_orders', 'waves_created', 'released', 'cursor', 'seconds'}.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    try:
+        waves, summary = _assign(now)
+        summary['released'] = _release(waves, now)
+    except Exception:
+        # Serbest bırakma dalga başına commit eder; yalnızca yarım kalan dalganın değişiklikleri geri alınır
+        db.session.rollback()
+        raise
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return summary
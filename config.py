@@ -24,20 +24,123 @@ class Config:
     # Bu değer .env dosyasındaki DATABASE_URL değişkeninden okunmalıdır.
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
 
-    # Eğer .env dosyasında DATABASE_URL tanımlı değilse, bir uyarı verip
-    # geliştirme için varsayılan bir SQLite veritabanına geçebiliriz (opsiyonel).
-    # Ancak MS SQL Server kullanacağımız için .env dosyasında doğru şekilde tanımlanmış olması esastır.
-    if not SQLALCHEMY_DATABASE_URI:
-        print("UYARI: '.env' dosyasında 'DATABASE_URL' ortam değişkeni bulunamadı veya boş.")
-        print("Lütfen .env dosyanızı ve MS SQL Server bağlantı dizenizi kontrol edin.")
-        # Geliştirme kolaylığı için bir fallback tanımlanabilir, ama bu MS SQL projesi için pek mantıklı değil.
-        # SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app_fallback.db')
+    # DATABASE_URL tanımlı değilse create_app() bir uyarı kaydeder (import sırasında çıktı verilmez).
+    # MS SQL Server kullanacağımız için .env dosyasında doğru şekilde tanımlanmış olması esastır.
+    # Geliştirme kolaylığı için bir fallback tanımlanabilir, ama bu MS SQL projesi için pek mantıklı değil.
+    # SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'app_fallback.db')
 
 
     # SQLAlchemy'nin olay sistemini devre dışı bırakır, performansı artırabilir.
     # Genellikle False olarak ayarlanması önerilir.
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Salt okunur replika (opsiyonel). Tanımlıysa @read_replica ile işaretli rapor sorguları
+    # bu veritabanından okunur; gecikme sınırı aşılırsa veya replika erişilemezse birincile dönülür.
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS') or 30)
+    REPLICA_CHECK_INTERVAL = 5             # gecikme ölçümü (ve nabız yazımı) en fazla bu sıklıkta yapılır
+    REPLICA_RETRY_AFTER = 30               # hata veren replika bu kadar saniye kullanılmaz
+
+    # Rapor view'larını async SQLAlchemy engine'i üzerinde çalıştır (aiosqlite / aioodbc gerekir)
+    ASYNC_REPORTS = os.environ.get('ASYNC_REPORTS', '').lower() in ('1', 'true', 'yes')
+
+    # Dashboard sorguları sınırlı bir iş parçacığı havuzunda aynı anda çalışır (app/query_pool.py)
+    DASHBOARD_QUERY_WORKERS = 8
+    DASHBOARD_QUERY_TIMEOUT = 2.0          # saniye; süresi dolan sayaç varsayılan değerle gösterilir, sorgu veritabanında iptal edilir
+    DASHBOARD_QUERY_MAX_IN_FLIGHT = 16     # aynı anda çalışan/bekleyen en fazla sorgu; doluysa varsayılan değer
+
+    # Talep tahmini ve yeniden sipariş önerileri (app/replenishment.py)
+    REPLENISHMENT_HISTORY_DAYS = 90        # tahminde kullanılan sipariş geçmişi (gün)
+    REPLENISHMENT_METHOD = 'ses'           # 'sma' (hareketli ortalama) veya 'ses' (üstel düzeltme)
+    REPLENISHMENT_SMA_WINDOW = 28
+    REPLENISHMENT_SES_ALPHA = 0.3
+    REPLENISHMENT_SERVICE_LEVEL = 0.95     # güvenlik stoğu için hedef hizmet düzeyi
+    REPLENISHMENT_LEAD_TIME_DAYS = 7       # tedarikçide lead_time_days boşsa
+    REPLENISHMENT_ORDER_COST = 50.0        # sipariş başına sabit maliyet (EOQ)
+    REPLENISHMENT_HOLDING_RATE = 0.25      # yıllık elde tutma maliyeti / birim maliyet (EOQ)
+
+    # ABC/XYZ sınıflandırması (app/classification.py)
+    CLASSIFICATION_PERIOD_DAYS = 182
+    CLASSIFICATION_ABC_A = 0.80            # kümülatif ciro payı sınırları
+    CLASSIFICATION_ABC_B = 0.95
+    CLASSIFICATION_XYZ_X = 0.5             # haftalık talebin değişim katsayısı sınırları
+    CLASSIFICATION_XYZ_Y = 1.0
+    CLASSIFICATION_CACHE_SECONDS = 900     # içinde bulunulan dönemin sonucu bu süre önbellekte kalır
+
+    # Değişiklik akışı (app/cdc.py). CDC_DIR tanımlıysa commit edilen değişiklikler bu dizindeki
+    # NDJSON segmentlerine yazılır; tanımlı değilse yakalama tamamen kapalıdır.
+    CDC_DIR = os.environ.get('CDC_DIR')
+    CDC_SEGMENT_BYTES = 64 * 1024 * 1024   # segment bu boyutu aşınca yenisine geçilir
+    CDC_FLUSH_INTERVAL = 0.05              # saniye; bu süre içinde gelen değişiklikler tek fsync ile yazılır
+    CDC_BATCH_MAX = 5000                   # tek yazmadaki en fazla değişiklik
+
+    # Ürün formundaki tedarikçi/depo seçimi (app/lookups.py)
+    LOOKUP_SELECT_MAX = 200                # bundan fazla kayıt varsa <select> yerine typeahead kullanılır
+    LOOKUP_LIMIT = 20                      # typeahead aramasının döndürdüğü en fazla kayıt
+    LOOKUP_CACHE_SECONDS = 300             # seçenek listesi önbelleği; yazmalarda aynı süreçte hemen temizlenir
+
+    # El terminali SKU taramaları (app/scan.py)
+    SCAN_CACHE_SIZE = 50000                # süreç içi önbellekteki en fazla ürün özeti
+    SCAN_CACHE_SECONDS = 300               # diğer süreçlerdeki değişiklikler en geç bu sürede görünür
+    SCAN_BATCH_MAX = 1000                  # tek toplu taramadaki en fazla kod
+
+    # Sipariş numaraları: zaman sıralı, düğüm bazlı (app/order_numbers.py)
+    # Sabit düğüm id'si (0-1023). Boşsa her süreç order_number_nodes tablosundan bir id kiralar.
+    ORDER_NUMBER_NODE_ID = int(os.environ['ORDER_NUMBER_NODE_ID']) if os.environ.get('ORDER_NUMBER_NODE_ID') else None
+    ORDER_NUMBER_LEASE_SECONDS = 3600      # kiralama süresi; yarısı dolunca yenilenir
+
+    # Ürün özetleri önbelleği: sepet ve ürün sayfası (app/product_cache.py). Sipariş oluşturma kullanmaz.
+    PRODUCT_CACHE_SIZE = 20000             # süreç içi önbellekteki en fazla ürün özeti
+    PRODUCT_CACHE_SECONDS = 30             # diğer süreçlerdeki değişiklikler en geç bu sürede görünür
+
+    # Toplama listeleri ve rota planı (app/picking.py); raf kodu "koridor-bölme[-kat]"
+    PICK_MAX_ORDERS = 500                  # tek seferde listelenen en fazla bekleyen sipariş (en eskiler)
+    PICK_AISLE_SPACING = 3.0               # metre, komşu koridorlar arası
+    PICK_BAY_SPACING = 1.0                 # metre, aynı koridordaki komşu bölmeler arası
+    PICK_WALK_SPEED = 1.0                  # metre / saniye; tahmini yürüme süresi için
+    PICK_SECONDS_PER_LINE = 10             # her ürün satırı için toplama süresi
+    PICK_OPTIMIZE_SECONDS = 0.2            # liste başına 2-opt iyileştirme süre sınırı
+
+    # Toplama dalgası planlayıcısı (app/waves.py, `flask orders plan-waves --loop`)
+    WAVE_SIZE = 25                         # dalga başına en fazla sipariş; dolan dalga hemen serbest bırakılır
+    WAVE_MAX_OPEN = 4                      # depo başına aynı anda dolmakta olan en fazla dalga
+    WAVE_CUTOFF_MINUTES = 30               # en eski siparişi bu kadar bekleyen dalga dolmadan serbest bırakılır
+    WAVE_INTERVAL_SECONDS = 300            # --loop ile çalışmalar arası süre
+    WAVE_BATCH_MAX = 5000                  # tek çalışmada planlanan en fazla yeni sipariş
+    WAVE_LOOKBACK_IDS = 1000               # imleçten bu kadar geriden başlanır (geç commit edilen siparişler için)
+
+    # Sipariş arşivi (app/archive.py, `flask orders archive`); geçmiş raporları arşivle birleşimi okur
+    ARCHIVE_AFTER_DAYS = 180               # bu kadar eski Delivered/Cancelled/Returned siparişler taşınır (en az 31)
+    ARCHIVE_BATCH_SIZE = 500               # transaction başına taşınan sipariş
+
+    # Canlı gösterge paneli, server-sent events (app/live.py, /dashboard/stream). gthread işçisinde her
+    # açık akış LIVE_STREAM_SECONDS boyunca bir iş parçacığını tutar; akışlar diğer istekleri
+    # bekletmesin diye işçi iş parçacıklarının en fazla yarısını kullanabilir (sync işçide 0: canlı
+    # güncelleme kapalı). gevent işçisinde (WEB_WORKER_CLASS=gevent) akış bir greenlet'tir ve sınır
+    # işçi bağlantılarının (WEB_WORKER_CONNECTIONS) yarısıdır; yüzlerce panel bu işçiyle açılır.
+    LIVE_COALESCE_SECONDS = 0.5            # bu süre içindeki commit'ler tek hesaplamada birleşir
+    LIVE_REFRESH_SECONDS = 30              # diğer işçilerdeki değişiklikler için periyodik yenileme
+    LIVE_HEARTBEAT_SECONDS = 15            # boşta kalan akışa gönderilen yorum satırı aralığı
+    LIVE_STREAM_SECONDS = 300              # akış bu süre sonra kapanır; tarayıcı yeniden bağlanır
+    LIVE_MAX_SUBSCRIBERS = (int(os.environ.get('WEB_WORKER_CONNECTIONS') or 1000)
+                            if os.environ.get('WEB_WORKER_CLASS') == 'gevent'
+                            else int(os.environ.get('WEB_THREADS') or 4)) // 2  # işçi başına en fazla açık akış; aşılırsa 503
+    LIVE_QUEUE_SIZE = 100                  # abone başına bekleyen olay; dolarsa yavaş istemci düşürülür
+    LIVE_LOW_STOCK_LIST = 20               # olaylarda listelenen en fazla düşük stoklu ürün
+
+    # Ağır uç noktalar için kabul denetimi ve kullanıcı başına hız sınırı (app/admission.py).
+    # Sınırlar işçi süreci başınadır. Uç nokta sınıfları: reports, checkout, bulk (JSON API'leri).
+    ADMISSION_CONCURRENCY = {'reports': 4, 'checkout': 8, 'bulk': 2}  # sınıf başına aynı anda çalışan istek
+    ADMISSION_MAX_QUEUE = 16               # yuva bekleyen istek bunu aşarsa yenisi hemen 503 alır
+    ADMISSION_QUEUE_TIMEOUT = 0.5          # saniye; bu sürede yuva boşalmazsa 503
+    # (kova kapasitesi, saniyede eklenen jeton); kova boşsa 429 ve Retry-After döner
+    RATE_LIMITS = {'reports': (30, 0.5), 'checkout': (10, 0.2), 'bulk': (5, 0.05)}
+
+    # Üretim sunucusu işçilerinin ısınması (gunicorn.conf.py, app/warmup.py)
+    WARMUP_CONNECTIONS = int(os.environ.get('WEB_THREADS') or 4)  # işçi başına açılacak bağlantı
+    WARMUP_CACHES = True                   # sınıflandırma gibi önbellekleri istek gelmeden hesapla
+
     # İleride eklenebilecek diğer yapılandırma ayarları:
     # Örneğin: Mail sunucusu ayarları, dosya yükleme ayarları vb.
     # MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -45,4 +148,22 @@ class Config:
     # MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS') is not None
     # MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     # MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
-    # ADMINS = ['your-email@example.com']
\ No newline at end of file
+    # ADMINS = ['your-email@example.com']
+
+
+class TestConfig(Config):
+    """
+    Testler için yapılandırma: bellek içi SQLite, replika ve async raporlar kapalı,
+    formlarda CSRF kontrolü yok.
+    """
+    TESTING = True
+    SECRET_KEY = 'test-secret-key'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    WTF_CSRF_ENABLED = False
+    ASYNC_REPORTS = False
+    WARMUP_CACHES = False
+    CDC_DIR = None
+    # Canlı panel iş parçacığı testlerde yenileme yapmaz; testler refresh()'i doğrudan çağırır
+    LIVE_COALESCE_SECONDS = 3600
+    ORDER_NUMBER_NODE_ID = 1
@@ -0,0 +1,64 @@
+# gunicorn.conf.py
+# Üretim sunucusu ayarları: gunicorn -c gunicorn.conf.py wsgi:app  (yalnızca Linux/macOS)
+#
+# Uygulama ana süreçte bir kez yüklenir (preload_app), işçiler fork ile çoğaltılır; yüklenen modül
+# ve veriler işçiler arasında copy-on-write paylaşılır. Her işçi fork'tan sonra ana süreçten gelen
+# veritabanı bağlantılarını bırakır, app/warmup.py ile bağlantı havuzunu, Jinja şablonlarını ve
+# önbellekleri ısıtır, ardından "ready" kaydını yazar.
+#
+# Yeniden yükleme:
+#   kill -HUP <master>   ayarları yeniden okur, işçileri sırayla yenileriyle değiştirir (kod aynı kalır)
+#   kill -USR2 <master>  yeni kodla yeni bir ana süreç başlatır; hazır olunca eskisine -QUIT gönderin
+#   kill -TERM <master>  işçiler elindeki istekleri graceful_timeout içinde bitirip kapanır
+import multiprocessing
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count() * 2 + 1)
+threads = int(os.environ.get('WEB_THREADS') or 4)
+worker_class = os.environ.get('WEB_WORKER_CLASS') or ('gthread' if threads > 1 else 'sync')
+if worker_class == 'gevent':
+    # Her istek (ve her canlı panel akışı) bir greenlet'tir; açık akışlar işçiyi tıkamaz. Yama
+    # preload_app uygulamayı yüklemeden önce yapılır ki kilitler ve kuyruklar greenlet uyumlu olsun.
+    from gevent import monkey
+    monkey.patch_all()
+    worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS') or 1000)
+preload_app = True
+
+# Bellek büyümesini sınırlamak için her işçi bu kadar istekten sonra yenilenir; jitter
+# işçilerin aynı anda yeniden başlamasını önler.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS') or 1000)
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER') or 100)
+
+timeout = int(os.environ.get('WEB_TIMEOUT') or 60)
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT') or 30)
+keepalive = 5
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+
+
+def post_fork(server, worker):
+    # Ana süreçte açılmış bağlantılar işçiler arasında paylaşılamaz; havuzları kapatmadan boşalt
+    from app.warmup import dispose_engines
+    dispose_engines(worker.app.wsgi(), close=False)
+
+
+def post_worker_init(worker):
+    from app.warmup import warm_up
+    summary = warm_up(worker.app.wsgi())
+    worker.log.info('Worker %s ready in %.2fs: %d connections, %d templates, caches: %s',
+                    worker.pid, summary['seconds'], summary['connections'], summary['templates'],
+                    ', '.join(summary['caches']) or '-')
+
+
+def worker_exit(server, worker):
+    # Sipariş numarası düğüm id'sini bırak, sonra bağlantıları düzgün kapat (max_requests yenilemesi,
+    # HUP veya kapanış)
+    from app.order_numbers import release_node
+    from app.warmup import dispose_engines
+    app = worker.app.wsgi()
+    try:
+        with app.app_context():
+            release_node()
+    except Exception as e:
+        worker.log.warning('Order number node not released: %s', e)  # kiralama süresi dolunca boşalır
+    dispose_engines(app)
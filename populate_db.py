@@ -4,10 +4,11 @@ from faker import Faker
 import uuid
 from app import create_app, db
 from app.models import User, Supplier, WarehouseLocation, Product, Order, OrderItem
+from app.ledger import stock_movement_context, MOVEMENT_SALE
 
 # from sqlalchemy import func # Eğer func.random() gibi şeyler kullanıyorsanız
 
-app = create_app()
+app = create_app(components=('worker',))  # blueprint'ler ve formlar gerekmiyor
 app.app_context().push()
 
 fake = Faker()
@@ -277,7 +278,9 @@ def populate_orders_and_items(order_count=1500, items_per_order_range=(1, 4)):
                             prod_to_update.quantity_in_stock -= update_info['ordered_qty']
                             if prod_to_update.quantity_in_stock < 0: prod_to_update.quantity_in_stock = 0
                 try:
-                    db.session.commit()
+                    # Stok düşümleri deftere 'sale' hareketi olarak yazılır
+                    with stock_movement_context(MOVEMENT_SALE, reference='populate_db'):
+                        db.session.commit()
                     print(f"Committed {len(orders_batch_to_commit)} orders. Total processed: {i + 1}/{order_count}.")
                     orders_batch_to_commit = []
                 except Exception as e:
@@ -289,6 +292,18 @@ def populate_orders_and_items(order_count=1500, items_per_order_range=(1, 4)):
 
 if __name__ == '__main__':
     print("Deleting existing data (Users, Suppliers, Warehouses, Products, OrderItems, Orders)...")
+    db.session.execute(db.text("DELETE FROM stock_snapshots"))
+    db.session.execute(db.text("DELETE FROM stock_movements"))
+    db.session.execute(db.text("DELETE FROM archived_order_item_allocations"))
+    db.session.execute(db.text("DELETE FROM archived_order_items"))
+    db.session.execute(db.text("DELETE FROM archived_orders"))
+    db.session.execute(db.text("DELETE FROM cycle_count_lines"))
+    db.session.execute(db.text("DELETE FROM cycle_counts"))
+    db.session.execute(db.text("DELETE FROM order_item_allocations"))
+    db.session.execute(db.text("DELETE FROM warehouse_stock"))
+    db.session.execute(db.text("UPDATE orders SET wave_id = NULL"))
+    db.session.execute(db.text("DELETE FROM pick_waves"))
+    db.session.execute(db.text("DELETE FROM wave_planner_state"))
     db.session.execute(db.text("DELETE FROM order_items"))
     db.session.execute(db.text("DELETE FROM orders"))
     db.session.execute(db.text("DELETE FROM products"))
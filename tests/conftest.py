@@ -0,0 +1,104 @@
+# tests/conftest.py
+# Ortak fixture'lar: TestConfig ile (bellek içi SQLite) uygulama, her rolden bir kullanıcı ve
+# N+1 sorgularını ortaya çıkaracak kadar satır içeren örnek veri.
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import create_app, db
+from app.allocation import initialize_warehouse_stock
+from app.models import User, Supplier, WarehouseLocation, Product, Order, OrderItem
+from config import TestConfig
+
+ROLES = ('Admin', 'WarehouseManager', 'InventoryStaff', 'SalesTeam')
+PASSWORD = 'test-password'
+
+# Sayfalı listelerin (10 satır) en az bir sayfasını dolduracak kadar kayıt
+SUPPLIER_COUNT = 12
+WAREHOUSE_COUNT = 12
+PRODUCT_COUNT = 36
+ORDER_COUNT = 15
+ITEMS_PER_ORDER = 3
+
+
+def username_for(role):
+    return role.lower()
+
+
+def seed_data():
+    users = []
+    for role in ROLES:
+        user = User(username=username_for(role), email=f'{role.lower()}@example.com', role=role, name=role)
+        user.set_password(PASSWORD)
+        users.append(user)
+    suppliers = [Supplier(name=f'Supplier {i:02}', contact=f'contact{i}@example.com', lead_time_days=5 + i % 4)
+                 for i in range(SUPPLIER_COUNT)]
+    warehouses = [WarehouseLocation(name=f'Warehouse {i:02}', address=f'Address {i}', capacity=5000)
+                  for i in range(WAREHOUSE_COUNT)]
+    db.session.add_all(users + suppliers + warehouses)
+    db.session.flush()
+
+    today = date.today()
+    products = []
+    for i in range(PRODUCT_COUNT):
+        products.append(Product(
+            name=f'Product {i:02}', sku=f'SKU-{i:05}',
+            bin=f"{'ABCDEF'[i % 6]}-{i % 20 + 1:02}" if i % 10 else None, category=('Food', 'Tools', 'Office')[i % 3],
+            quantity_in_stock=(i * 7) % 40, low_stock_threshold=10,
+            price=Decimal('10.00') + i, purchase_price=Decimal('6.00') + i,
+            expiry_date=today + timedelta(days=(i % 9) * 10 - 20) if i % 2 else None,
+            supplier_id=suppliers[i % SUPPLIER_COUNT].id, warehouse_id=warehouses[i % WAREHOUSE_COUNT].id))
+    db.session.add_all(products)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(ORDER_COUNT):
+        order = Order(order_number=f'TEST-{i:04}', user_id=users[i % len(users)].id,
+                      order_date=now - timedelta(days=i * 3), status=('Pending', 'Processing', 'Shipped')[i % 3])
+        total = Decimal('0')
+        for j in range(ITEMS_PER_ORDER):
+            product = products[(i * ITEMS_PER_ORDER + j) % PRODUCT_COUNT]
+            order.items.append(OrderItem(product_id=product.id, quantity=1 + j, price_at_order=product.price))
+            total += product.price * (1 + j)
+        order.total_amount = total
+        db.session.add(order)
+    db.session.commit()
+    initialize_warehouse_stock()
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app(TestConfig)
+    # İstekler sırasında uygulama bağlamı açık kalmamalı; yoksa Flask her istekte onu yeniden
+    # kullanır ve oturum/kimlik haritası (ve giriş yapmış kullanıcı) istekler arasında paylaşılır.
+    # Bellek içi veritabanı tek bağlantılı (StaticPool) olduğundan veri bağlamlar arasında kalır.
+    with app.app_context():
+        db.create_all()
+        seed_data()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _sign_in(client, role):
+    response = client.post('/auth/login', data={'username': username_for(role), 'password': PASSWORD})
+    assert response.status_code == 302, f'Login as {role} failed'
+    return client
+
+
+@pytest.fixture
+def login(client):
+    """login(role) signs the test client in as the seeded user of that role."""
+    return lambda role: _sign_in(client, role)
+
+
+@pytest.fixture
+def client_for(app):
+    """client_for(role) returns a new test client signed in as that role (login shares one client)."""
+    return lambda role: _sign_in(app.test_client(), role)
@@ -0,0 +1,52 @@
+# tests/query_count.py
+# Bir blok içinde çalıştırılan SQL ifadelerini sayan yardımcılar. N+1 hatalarında (ör. şablonda
+# satır başına order.items.count()) ifade sayısı veriyle büyür ve bütçeyi aşar; hata mesajı
+# çalışan ifadeleri listeler.
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app import db
+
+
+class QueryCounter:
+    """Collects the SQL statements executed on the given engines while active."""
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._record)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def report(self):
+        return '\n'.join(f'{i:3}. {" ".join(statement.split())}' for i, statement in enumerate(self.statements, 1))
+
+
+def app_engines(app):
+    with app.app_context():
+        return list(db.engines.values())
+
+
+@contextmanager
+def assert_max_queries(app, max_count, label=''):
+    """Fails when the block runs more than max_count SQL statements; the failure lists them."""
+    with QueryCounter(app_engines(app)) as counter:
+        yield counter
+    if counter.count > max_count:
+        raise AssertionError(f'{label or "Block"} ran {counter.count} SQL statements, '
+                             f'expected at most {max_count}:\n{counter.report()}')
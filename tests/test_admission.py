@@ -0,0 +1,94 @@
+# tests/test_admission.py
+# Kabul denetimi: jeton kovası (429), eşzamanlılık kapısı ve kuyruk (503), route'lardaki maliyetler.
+import threading
+
+import pytest
+from flask import Flask
+
+from app import create_app, db
+from app.admission import AdmissionController, AdmissionRejected
+from config import TestConfig
+from conftest import seed_data
+
+
+def _controller(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return AdmissionController(app)
+
+
+def test_token_bucket_rejects_when_empty_and_refills():
+    controller = _controller(RATE_LIMITS={'reports': (3, 1000.0)})
+    controller.take_tokens('reports', 'user:1', 3)
+    controller.rate_limits['reports'] = (3, 0.5)  # yeniden dolmayı yavaşlat
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.take_tokens('reports', 'user:1', 2)
+    assert excinfo.value.status == 429
+    assert 0 < excinfo.value.retry_after <= 4
+    controller.take_tokens('reports', 'user:2', 3)  # kovalar kullanıcı başınadır
+    assert controller.snapshot()['reports']['rate_limited'] == 1
+
+
+def test_gate_queues_then_rejects():
+    controller = _controller(ADMISSION_CONCURRENCY={'reports': 1}, ADMISSION_MAX_QUEUE=1,
+                             ADMISSION_QUEUE_TIMEOUT=0.05)
+    controller.enter('reports')
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.enter('reports')  # kuyrukta bekler, süre dolar
+    assert excinfo.value.status == 503
+
+    released = threading.Timer(0.01, controller.leave, args=('reports',))
+    controller.queue_timeout = 1.0
+    released.start()
+    controller.enter('reports')  # yuva boşalınca kabul edilir
+    released.join()
+    controller.leave('reports')
+
+    stats = controller.snapshot()['reports']
+    assert stats['admitted'] == 2 and stats['rejected_timeout'] == 1
+    assert stats['in_flight'] == 0 and stats['queue_depth'] == 0 and stats['max_queue_depth'] == 1
+
+
+def test_full_queue_rejects_immediately():
+    controller = _controller(ADMISSION_CONCURRENCY={'bulk': 1}, ADMISSION_MAX_QUEUE=0)
+    controller.enter('bulk')
+    with pytest.raises(AdmissionRejected):
+        controller.enter('bulk')
+    assert controller.snapshot()['bulk']['rejected_queue_full'] == 1
+
+
+class TightLimitsConfig(TestConfig):
+    RATE_LIMITS = {'reports': (12, 0.001), 'bulk': (1, 0.001)}
+
+
+@pytest.fixture(scope='module')
+def app():
+    # conftest'teki app'in yerine geçer; client_for bu modülde sıkı sınırlı uygulamaya giriş yapar
+    app = create_app(TightLimitsConfig)
+    with app.app_context():
+        db.create_all()
+        seed_data()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+def test_expensive_report_uses_more_tokens(client_for):
+    client = client_for('SalesTeam')
+    assert client.get('/reports/recent_orders?days=330').status_code == 200  # 11 jeton
+    assert client.get('/reports/low_stock').status_code == 200
+    response = client.get('/reports/low_stock')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert client_for('InventoryStaff').get('/reports/low_stock').status_code == 200
+
+
+def test_json_api_gets_json_rejection(client_for):
+    client = client_for('WarehouseManager')
+    assert client.post('/orders/api/status', json={'order_ids': [], 'status': 'Shipped'}).status_code != 429
+    response = client.post('/orders/api/status', json={'order_ids': [], 'status': 'Shipped'})
+    assert response.status_code == 429
+    assert 'retry_after' in response.get_json()
+
+    metrics = client_for('Admin').get('/admin/metrics').get_json()['admission']
+    assert metrics['bulk']['rate_limited'] == 1 and metrics['reports']['rate_limited'] == 1
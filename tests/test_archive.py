@@ -0,0 +1,83 @@
+# tests/test_archive.py
+# Sipariş arşivi: eski kapanmış siparişler kalemleri ve dağılımlarıyla parça parça taşınır, açık
+# siparişler kalır, geçmiş raporları arşivi de okur.
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, func
+
+from app import db
+from app.models import Order, OrderItem, OrderItemAllocation, ArchivedOrder, ArchivedOrderItem, \
+    ArchivedOrderItemAllocation
+from app.archive import archive_orders, ArchiveError
+from app.main.routes import profitable_products_queries
+
+
+@pytest.fixture
+def old_orders(app):
+    created = []
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=200)
+        for index, status in enumerate(('Delivered', 'Cancelled', 'Returned', 'Delivered', 'Pending')):
+            order = Order(order_number=f'ARCH-{index:03}', user_id=1, status=status, order_date=old,
+                          total_amount=Decimal('2.00'))
+            item = OrderItem(product_id=index + 1, quantity=2, price_at_order=Decimal('1.00'))
+            order.items.append(item)
+            db.session.add(order)
+            db.session.flush()
+            db.session.add(OrderItemAllocation(order_item_id=item.id, warehouse_id=1, quantity=2))
+            created.append(order.id)
+        db.session.commit()
+    yield created
+    with app.app_context():
+        ArchivedOrderItemAllocation.query.delete()
+        ArchivedOrderItem.query.delete()
+        ArchivedOrder.query.delete()
+        for order in Order.query.filter(Order.id.in_(created)):
+            for item in order.items:
+                OrderItemAllocation.query.filter_by(order_item_id=item.id).delete()
+            db.session.delete(order)
+        db.session.commit()
+
+
+def _count(model, *where):
+    return db.session.scalar(select(func.count()).select_from(model).where(*where))
+
+
+def test_closed_orders_move_in_resumable_batches(app, old_orders):
+    *closed, pending = old_orders
+    with app.app_context():
+        profitable, most_sold = (db.session.execute(query).all() for query in profitable_products_queries())
+
+        first = archive_orders(days=180, batch_size=2, max_batches=1)
+        assert (first['orders'], first['items'], first['batches'], first['done']) == (2, 2, 1, False)
+        rest = archive_orders(days=180, batch_size=2)
+        assert (rest['orders'], rest['done']) == (2, True)
+
+        assert _count(Order, Order.id.in_(closed)) == 0
+        assert _count(OrderItem, OrderItem.order_id.in_(closed)) == 0
+        assert _count(ArchivedOrder, ArchivedOrder.id.in_(closed)) == 4
+        assert _count(ArchivedOrderItem, ArchivedOrderItem.order_id.in_(closed)) == 4
+        assert _count(ArchivedOrderItemAllocation) == 4
+        assert db.session.get(ArchivedOrder, closed[2]).status == 'Returned'
+        assert db.session.get(Order, pending).status == 'Pending'  # açık sipariş yerinde kalır
+
+        # Toplamlar arşivden sonra da aynı
+        assert [db.session.execute(query).all() for query in profitable_products_queries()] == [profitable, most_sold]
+        assert archive_orders(days=180)['orders'] == 0
+
+
+def test_history_report_lists_archived_orders(app, login, old_orders):
+    with app.app_context():
+        archive_orders(days=180)
+    response = login('Admin').get('/reports/recent_orders?days=365')
+    assert response.status_code == 200
+    assert b'ARCH-000' in response.data and b'Archived' in response.data
+    assert b'ARCH-004' in response.data
+
+
+def test_recent_orders_are_never_archived(app):
+    with app.app_context():
+        with pytest.raises(ArchiveError):
+            archive_orders(days=7)
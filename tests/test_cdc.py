@@ -0,0 +1,94 @@
+# tests/test_cdc.py
+# Değişiklik akışı: olaylar yalnızca commit'te yazılır, aynı satırın değişiklikleri tek olayda
+# birleşir, Core yolları record_changes ile bildirir, segmentler döner ve okuyucu imleçten devam eder.
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Supplier, Order, OrderItem
+from app.orders.status import transition_orders
+from app.cdc import ChangeLogWriter, read_changes, list_segments, CDCError
+
+
+@pytest.fixture
+def change_log(app, tmp_path):
+    writer = ChangeLogWriter(str(tmp_path), segment_bytes=64 * 1024, flush_interval=0.01, batch_max=1000,
+                             logger=app.logger)
+    app.extensions['cdc'] = writer
+    yield writer
+    writer.close()
+    app.extensions.pop('cdc')
+
+
+def _read(writer, cursor=None, limit=1000):
+    writer.close()  # kuyruktakiler yazılır; sonraki commit yazıcıyı yeniden başlatır
+    return read_changes(writer.directory, cursor, limit)
+
+
+def test_flushes_merge_and_only_commits_are_published(app, change_log):
+    with app.app_context():
+        supplier = db.session.get(Supplier, 1)
+        contact, address = supplier.contact, supplier.address
+        supplier.contact = 'CDC contact'
+        db.session.flush()
+        supplier.address = 'CDC address'
+        db.session.flush()
+        db.session.commit()
+
+        supplier.contact = 'Rolled back'
+        db.session.flush()
+        db.session.rollback()
+
+        supplier = db.session.get(Supplier, 1)
+        supplier.contact, supplier.address = contact, address
+        db.session.commit()
+
+    changes, _ = _read(change_log)
+    first, restored = [change for change in changes if change['table'] == 'suppliers']
+    assert (first['op'], first['pk'], first['changed']) == ('update', 1, ['address', 'contact'])
+    assert first['data']['contact'] == 'CDC contact' and first['data']['address'] == 'CDC address'
+    assert restored['data']['contact'] == contact  # geri alınan değişiklik akışta yok
+    assert first['tx'] != restored['tx']
+
+
+def test_core_paths_report_their_changes(app, change_log):
+    with app.app_context():
+        order = Order(order_number='CDC-CORE', user_id=1, status='Pending', total_amount=Decimal('1.00'))
+        order.items.append(OrderItem(product_id=1, quantity=1, price_at_order=Decimal('1.00')))
+        db.session.add(order)
+        db.session.commit()
+        order_id = order.id
+        try:
+            # Durum geçişi Core UPDATE ile yazar ve değişiklikleri record_changes ile bildirir
+            assert transition_orders([order_id], 'Processing')['updated'] == 1
+        finally:
+            db.session.delete(db.session.get(Order, order_id))
+            db.session.commit()
+
+    changes, _ = _read(change_log)
+    updates = [change for change in changes if change['table'] == 'orders' and change['op'] == 'update']
+    assert [(change['pk'], change['data']['status'], change['changed']) for change in updates] == \
+        [(order_id, 'Processing', ['status'])]
+
+
+def test_segments_rotate_and_reader_resumes_from_cursor(app, change_log):
+    change_log.segment_bytes = 1  # her yazma yeni segmente geçer
+    with app.app_context():
+        supplier = db.session.get(Supplier, 2)
+        contact = supplier.contact
+        for value in ('one', 'two', 'three', contact):
+            supplier.contact = value
+            db.session.commit()
+            change_log.close()  # her commit ayrı yazma
+
+    assert len(list_segments(change_log.directory)) == 4
+    everything, end = _read(change_log)
+    assert [change['data']['contact'] for change in everything] == ['one', 'two', 'three', contact]
+
+    first, cursor = read_changes(change_log.directory, limit=2)
+    rest, cursor = read_changes(change_log.directory, cursor)
+    assert first + rest == everything and cursor == end
+    assert read_changes(change_log.directory, cursor) == ([], cursor)  # yeni değişiklik yok
+    with pytest.raises(CDCError):
+        read_changes(change_log.directory, 'not-a-cursor')
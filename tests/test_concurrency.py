@@ -0,0 +1,52 @@
+# tests/test_concurrency.py
+# Koşullu toplu yazmalar: eşleşen satır sayısı, executemany satır sayısı güvenilmeyen sürücülerde de
+# doğru sayılır; stok (toplam ve depo bazında) hiçbir yoldan eksiye düşemez.
+import pytest
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Product, WarehouseStock
+from app.concurrency import matched_rows
+from app.allocation import apply_allocations, AllocationError
+
+
+@pytest.fixture(params=[True, False], ids=['executemany', 'per-row'])
+def multi_rowcount(request, app, monkeypatch):
+    # False: mssql+pyodbc gibi executemany satır sayısını bildirmeyen sürücü
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, 'supports_sane_multi_rowcount', request.param)
+    return request.param
+
+
+def test_matched_rows_counts_each_guarded_row(app, multi_rowcount):
+    table = Product.__table__
+    with app.app_context():
+        stock = dict(db.session.execute(select(table.c.id, table.c.quantity_in_stock)
+                                        .where(table.c.quantity_in_stock > 0).order_by(table.c.id).limit(3)).all())
+        first, second, third = stock
+        guarded = update(table).where(table.c.id == bindparam('b_id'),
+                                      table.c.quantity_in_stock >= bindparam('b_qty')) \
+            .values(quantity_in_stock=table.c.quantity_in_stock - bindparam('b_qty'))
+        rows = [{'b_id': first, 'b_qty': 1}, {'b_id': second, 'b_qty': stock[second] + 1}, {'b_id': third, 'b_qty': 1}]
+        assert matched_rows(guarded, rows) == 2  # ikinci ürünün koruması eşleşmedi
+        assert matched_rows(guarded, []) == 0
+        db.session.rollback()
+
+
+def test_stock_cannot_go_negative(app):
+    with app.app_context():
+        with pytest.raises(IntegrityError):
+            db.session.execute(update(Product).where(Product.id == 2)
+                               .values(quantity_in_stock=-1).execution_options(synchronize_session=False))
+        db.session.rollback()
+
+
+def test_short_warehouse_stock_fails_allocation(app, multi_rowcount):
+    with app.app_context():
+        rows = db.session.execute(select(WarehouseStock.product_id, WarehouseStock.warehouse_id, WarehouseStock.quantity)
+                                  .where(WarehouseStock.quantity > 0).order_by(WarehouseStock.id).limit(2)).all()
+        (p1, w1, q1), (p2, w2, q2) = rows
+        with pytest.raises(AllocationError):
+            apply_allocations([(p1, w1, 1), (p2, w2, q2 + 1)])
+        db.session.rollback()
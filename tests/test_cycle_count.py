@@ -0,0 +1,141 @@
+# tests/test_cycle_count.py
+# Depo sayımı: satır gönderimi (SKU veya id), SQL'de fark hesabı, farkların defterle birlikte uygulanması.
+import pytest
+from sqlalchemy import select, func
+
+from app import db
+from app.models import CycleCount, CycleCountLine, Product, WarehouseStock, StockMovement, WarehouseLocation
+
+# Sayımın yapılacağı depo ve ürünleri (conftest: ürün i, depo i % 12 + 1)
+WAREHOUSE_ID = 4
+
+
+def _stock(app):
+    with app.app_context():
+        rows = db.session.execute(select(WarehouseStock.product_id, WarehouseStock.quantity)
+                                  .where(WarehouseStock.warehouse_id == WAREHOUSE_ID)).all()
+        totals = dict(db.session.execute(select(Product.id, Product.quantity_in_stock)).all())
+    return dict(rows), totals
+
+
+@pytest.fixture
+def count_id(app, client_for):
+    client = client_for('InventoryStaff')
+    response = client.post(f'/warehouses/{WAREHOUSE_ID}/counts')
+    assert response.status_code == 302
+    with app.app_context():
+        count_id = db.session.scalar(select(CycleCount.id).where(CycleCount.warehouse_id == WAREHOUSE_ID,
+                                                                 CycleCount.status == 'Open'))
+    yield count_id
+    with app.app_context():
+        count = db.session.get(CycleCount, count_id)
+        if count.status == 'Open':
+            count.status = 'Cancelled'
+            db.session.commit()
+
+
+def test_count_is_reconciled_and_applied_with_ledger_entries(app, client_for, count_id):
+    stock_before, totals_before = _stock(app)
+    located = sorted(pid for pid, qty in stock_before.items() if qty > 0)
+    first, second, untouched = located[0], located[1], located[2]
+    with app.app_context():
+        first_sku = db.session.get(Product, first).sku
+
+    client = client_for('InventoryStaff')
+    lines = [{'sku': first_sku, 'counted_qty': 1}, {'sku': first_sku, 'counted_qty': 2},  # iki rafta
+             {'product_id': second, 'counted_qty': stock_before[second]},                 # fark yok
+             {'product_id': untouched, 'counted_qty': stock_before[untouched] + 5}]
+    response = client.post(f'/warehouses/counts/{count_id}/lines', json={'lines': lines})
+    assert response.get_json() == {'accepted': 4, 'products': 3}
+    # Yeniden sayım önceki satırların yerine geçer
+    client.post(f'/warehouses/counts/{count_id}/lines',
+                json={'lines': [{'product_id': untouched, 'counted_qty': stock_before[untouched] + 4}], 'replace': True})
+
+    data = client.get(f'/warehouses/counts/{count_id}/variances').get_json()
+    variances = {row['product_id']: row['variance'] for row in data['variances']}
+    assert variances == {first: 3 - stock_before[first], untouched: 4}
+    assert data['summary']['counted_products'] == 3 and data['summary']['variance_products'] == 2
+
+    assert client.post(f'/warehouses/counts/{count_id}/apply').status_code == 302  # sayım personeli uygulayamaz
+    response = client_for('WarehouseManager').post(f'/warehouses/counts/{count_id}/apply')
+    assert response.status_code == 302
+
+    stock_after, totals_after = _stock(app)
+    assert stock_after[first] == 3 and stock_after[untouched] == stock_before[untouched] + 4
+    assert totals_after[first] - totals_before[first] == 3 - stock_before[first]
+    assert totals_after[second] == totals_before[second]
+    with app.app_context():
+        movements = db.session.execute(select(StockMovement.product_id, StockMovement.quantity)
+                                       .where(StockMovement.reference == f'Cycle count #{count_id}')).all()
+        count = db.session.get(CycleCount, count_id)
+        assert count.status == 'Applied' and count.adjusted_products == 2
+    assert dict(movements) == variances
+
+
+def test_invalid_submission_is_rejected_as_a_whole(app, client_for, count_id):
+    client = client_for('InventoryStaff')
+    response = client.post(f'/warehouses/counts/{count_id}/lines',
+                           json={'lines': [{'sku': 'SKU-00003', 'counted_qty': 1},
+                                           {'sku': 'NO-SUCH-SKU', 'counted_qty': 1},
+                                           {'product_id': 3, 'counted_qty': -1}]})
+    assert response.status_code == 400
+    assert 'NO-SUCH-SKU' in response.get_json()['error'] and 'Line 3' in response.get_json()['error']
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(CycleCountLine)
+                                 .where(CycleCountLine.count_id == count_id)) == 0
+
+
+def test_uncounted_stock_counts_as_zero_only_on_request(app, client_for, count_id):
+    stock_before, _ = _stock(app)
+    located = [pid for pid, qty in stock_before.items() if qty > 0]
+    client = client_for('WarehouseManager')
+    client.post(f'/warehouses/counts/{count_id}/lines',
+                json={'lines': [{'product_id': located[0], 'counted_qty': stock_before[located[0]]}]})
+    assert client.get(f'/warehouses/counts/{count_id}/variances').get_json()['variances'] == []
+    full = client.get(f'/warehouses/counts/{count_id}/variances?uncounted=1').get_json()['variances']
+    assert {row['product_id']: row['counted'] for row in full} == {pid: 0 for pid in located[1:]}
+    page = client.get(f'/warehouses/counts/{count_id}?uncounted=1')
+    assert page.status_code == 200 and 'Approve' in page.get_data(as_text=True)
+
+
+def test_warehouse_with_count_history_is_not_deleted(app, client_for):
+    with app.app_context():
+        warehouse = WarehouseLocation(name='Counted Empty Warehouse', address='Count Street 1')
+        db.session.add(warehouse)
+        db.session.flush()
+        db.session.add(CycleCount(warehouse_id=warehouse.id, status='Cancelled'))
+        db.session.commit()
+        warehouse_id = warehouse.id
+    try:
+        response = client_for('Admin').post(f'/warehouses/{warehouse_id}/delete')
+        assert response.status_code == 302
+        with app.app_context():
+            assert db.session.get(WarehouseLocation, warehouse_id) is not None
+    finally:
+        with app.app_context():
+            CycleCount.query.filter_by(warehouse_id=warehouse_id).delete()
+            db.session.delete(db.session.get(WarehouseLocation, warehouse_id))
+            db.session.commit()
+
+
+def test_only_approved_adjustments_are_applied(app, client_for, count_id):
+    stock_before, totals_before = _stock(app)
+    approved, rejected = sorted(pid for pid, qty in stock_before.items() if qty > 0)[:2]
+    client = client_for('WarehouseManager')
+    client.post(f'/warehouses/counts/{count_id}/lines',
+                json={'lines': [{'product_id': approved, 'counted_qty': stock_before[approved] + 2},
+                                {'product_id': rejected, 'counted_qty': stock_before[rejected] + 7}]})
+    page = client.get(f'/warehouses/counts/{count_id}').get_data(as_text=True)
+    assert f'name="product_id" value="{approved}"' in page and 'Apply Selected' in page
+
+    client.post(f'/warehouses/counts/{count_id}/apply', data={'selected': '1'})  # hiçbiri seçilmedi
+    with app.app_context():
+        assert db.session.get(CycleCount, count_id).status == 'Open'
+
+    client.post(f'/warehouses/counts/{count_id}/apply', data={'selected': '1', 'product_id': [str(approved)]})
+    stock_after, totals_after = _stock(app)
+    assert stock_after[approved] == stock_before[approved] + 2
+    assert stock_after[rejected] == stock_before[rejected] and totals_after[rejected] == totals_before[rejected]
+    with app.app_context():
+        count = db.session.get(CycleCount, count_id)
+        assert (count.status, count.adjusted_products, count.net_adjustment) == ('Applied', 1, 2)
@@ -0,0 +1,142 @@
+# tests/test_live.py
+# Canlı panel: commit sonrası tek hesaplama, yalnızca değişen değerlerin yayını ve SSE akışı.
+import importlib
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import Order, Product
+
+
+@pytest.fixture
+def publisher(app):
+    publisher = app.extensions['live']
+    with app.app_context():
+        subscriber, first = publisher.subscribe()
+    yield publisher, subscriber, first
+    publisher.unsubscribe(subscriber)
+
+
+def test_commits_publish_only_changed_values(app, publisher):
+    publisher, subscriber, (_, kind, snapshot) = publisher
+    assert kind == 'snapshot'
+    with app.app_context():
+        order = Order(order_number='LIVE-001', user_id=1, status='Pending', total_amount=Decimal('12.50'))
+        db.session.add(order)
+        db.session.commit()
+        order_id = order.id
+        assert publisher._changed.is_set()
+        _, kind, delta = publisher.refresh()
+    assert kind == 'delta'
+    assert delta['pending_orders'] == snapshot['pending_orders'] + 1
+    assert delta['orders_today'] == snapshot['orders_today'] + 1
+    assert 'low_stock' not in delta
+    assert subscriber.queue.get_nowait()[2] == delta
+
+    with app.app_context():
+        product = Product.query.filter(Product.quantity_in_stock > Product.low_stock_threshold).first()
+        original = product.quantity_in_stock
+        # Core UPDATE de değişiklik olarak algılanır
+        db.session.execute(update(Product).where(Product.id == product.id).values(quantity_in_stock=0))
+        db.session.commit()
+        _, _, delta = publisher.refresh()
+        assert set(delta) == {'low_stock'}
+        assert [row['id'] for row in delta['low_stock']['entered']] == [product.id]
+        assert delta['low_stock']['count'] == snapshot['low_stock_count'] + 1
+
+        # Görünen hiçbir değer değişmediyse olay yayınlanmaz
+        assert publisher.refresh() is None
+
+        db.session.execute(update(Product).where(Product.id == product.id).values(quantity_in_stock=original))
+        db.session.delete(db.session.get(Order, order_id))
+        db.session.commit()
+        _, _, delta = publisher.refresh()
+        assert delta['low_stock']['left'] == [product.id]
+
+
+def test_stream_sends_snapshot_and_releases_subscriber(app, login):
+    publisher = app.extensions['live']
+    client = login('SalesTeam')
+    stream_seconds = publisher.settings['LIVE_STREAM_SECONDS']
+    publisher.settings['LIVE_STREAM_SECONDS'] = 0  # ilk olaydan sonra akış kapanır
+    try:
+        response = client.get('/dashboard/stream')
+        body = response.get_data(as_text=True)
+    finally:
+        publisher.settings['LIVE_STREAM_SECONDS'] = stream_seconds
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert 'event: snapshot' in body and '"pending_orders":' in body
+    assert publisher.snapshot()['subscribers'] == 0
+
+
+def test_stream_rejects_when_full(app, login):
+    publisher = app.extensions['live']
+    client = login('Admin')
+    limit = publisher.settings['LIVE_MAX_SUBSCRIBERS']
+    publisher.settings['LIVE_MAX_SUBSCRIBERS'] = 0
+    try:
+        response = client.get('/dashboard/stream')
+        dashboard = client.get('/dashboard').get_data(as_text=True)
+    finally:
+        publisher.settings['LIVE_MAX_SUBSCRIBERS'] = limit
+    assert response.status_code == 503 and response.headers['Retry-After']
+    assert 'EventSource' not in dashboard  # sınır 0 iken panel akış açmaz
+
+
+def test_streams_stop_at_the_limit_while_pages_keep_loading(app, client_for):
+    publisher = app.extensions['live']
+    limit = publisher.settings['LIVE_MAX_SUBSCRIBERS']
+    publisher.settings['LIVE_MAX_SUBSCRIBERS'] = 2
+    streams = []
+    try:
+        for _ in range(2):
+            response = client_for('SalesTeam').get('/dashboard/stream', buffered=False)
+            assert response.status_code == 200
+            body = iter(response.response)
+            assert next(body).startswith(b'retry:')  # akış açık, abone kayıtlı
+            streams.append(response)
+        assert publisher.snapshot()['subscribers'] == 2
+
+        other = client_for('Admin')
+        assert other.get('/dashboard/stream').status_code == 503
+        assert other.get('/dashboard').status_code == 200  # açık akışlar diğer istekleri bekletmez
+        assert other.get('/products/').status_code == 200
+    finally:
+        for response in streams:
+            response.close()
+        publisher.settings['LIVE_MAX_SUBSCRIBERS'] = limit
+    assert publisher.snapshot()['subscribers'] == 0
+
+
+def test_commit_while_idle_is_not_lost_by_a_new_subscriber(app):
+    publisher = app.extensions['live']
+    with app.app_context():
+        subscriber, (sequence, _, snapshot) = publisher.subscribe()
+        publisher.unsubscribe(subscriber)
+        order = Order(order_number='LIVE-IDLE', user_id=1, status='Pending', total_amount=Decimal('1.00'))
+        db.session.add(order)
+        db.session.commit()  # izleyen yok: önbellekteki durum silinir
+        try:
+            subscriber, (_, _, fresh) = publisher.subscribe()
+            publisher.unsubscribe(subscriber)
+            assert fresh['pending_orders'] == snapshot['pending_orders'] + 1
+        finally:
+            db.session.delete(db.session.get(Order, order.id))
+            db.session.commit()
+
+
+def test_gevent_workers_raise_the_stream_limit(monkeypatch):
+    import config
+    monkeypatch.setenv('WEB_THREADS', '4')
+    try:
+        assert importlib.reload(config).Config.LIVE_MAX_SUBSCRIBERS == 2
+        monkeypatch.setenv('WEB_WORKER_CLASS', 'gevent')
+        monkeypatch.setenv('WEB_WORKER_CONNECTIONS', '1000')
+        assert importlib.reload(config).Config.LIVE_MAX_SUBSCRIBERS == 500
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
@@ -0,0 +1,70 @@
+# tests/test_lookups.py
+# Ürün formundaki tedarikçi/depo seçimi: önek araması, PK doğrulaması, seçenek önbelleği.
+import pytest
+
+from app import db
+from app.lookups import choice_cache, cached_choices
+from app.models import Product, Supplier
+from query_count import assert_max_queries
+
+
+@pytest.fixture
+def typeahead_mode(app):
+    # Seçenek listesi sınırını düşürerek büyük kurulum davranışını taklit et
+    app.config['LOOKUP_SELECT_MAX'] = 5
+    choice_cache.invalidate()
+    yield
+    app.config.pop('LOOKUP_SELECT_MAX')
+    choice_cache.invalidate()
+
+
+def test_prefix_search(login):
+    client = login('SalesTeam')
+    results = client.get('/suppliers/lookup?q=Supplier 1&limit=2').get_json()['results']
+    assert [row['text'] for row in results] == ['Supplier 10', 'Supplier 11']
+    assert len(client.get('/suppliers/lookup?limit=-1').get_json()['results']) == 1
+    assert client.get('/suppliers/lookup?q=%25').get_json()['results'] == []  # % joker değil, harf olarak aranır
+    assert client.get('/warehouses/lookup?q=Address 3').get_json()['results'] == []  # adı olan depo adresle aranmaz
+
+
+def test_form_uses_typeahead_for_large_tables(app, login, typeahead_mode):
+    client = login('Admin')
+    page = client.get('/products/1/edit').get_data(as_text=True)
+    assert 'lookup-input' in page and '/suppliers/lookup' in page
+    assert 'value="Supplier 00"' in page  # yalnızca seçili tedarikçinin adı gösterilir
+    assert 'Supplier 07' not in page
+
+
+def test_submitted_id_is_checked_by_primary_key(app, login, typeahead_mode):
+    client = login('Admin')
+    data = {'name': 'Lookup Product', 'quantity_in_stock': 5, 'price': '3.50', 'supplier_id': 999999}
+    client.get('/products/add')  # seçenek önbelleğini doldur
+    # Oturumdaki kullanıcı + tek bir birincil anahtar sorgusu
+    with assert_max_queries(app, 2, label='POST /products/add with an unknown supplier'):
+        response = client.post('/products/add', data=data)
+    assert response.status_code == 200
+    assert 'Selected supplier does not exist' in response.get_data(as_text=True)
+
+    with app.app_context():
+        supplier_id = db.session.scalar(db.select(Supplier.id).where(Supplier.name == 'Supplier 03'))
+    response = client.post('/products/add', data=dict(data, supplier_id=supplier_id))
+    assert response.status_code == 302
+    with app.app_context():
+        product = Product.query.filter_by(name='Lookup Product').one()
+        assert product.supplier_id == supplier_id and product.warehouse_id is None
+        db.session.delete(product)
+        db.session.commit()
+
+
+def test_choice_cache_is_invalidated_on_supplier_write(app):
+    with app.app_context():
+        choice_cache.invalidate()
+        before = cached_choices('supplier')
+        assert cached_choices('supplier') is before  # ikinci çağrı önbellekten
+        supplier = Supplier(name='Supplier ZZ')
+        db.session.add(supplier)
+        db.session.commit()
+        assert (supplier.id, 'Supplier ZZ') in cached_choices('supplier')
+        db.session.delete(supplier)
+        db.session.commit()
+        assert (supplier.id, 'Supplier ZZ') not in cached_choices('supplier')
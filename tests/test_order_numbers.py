@@ -0,0 +1,74 @@
+# tests/test_order_numbers.py
+# Sipariş numaraları: süreç içinde artan ve benzersiz, süreçler arasında çakışmasız, düğüm id'si
+# veritabanından kiralanabilir.
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import OrderNumberNode
+from app.order_numbers import OrderNumberGenerator, generate_batch, decode, new_order_number, _lease, \
+    ORDER_NUMBER_EPOCH, MAX_SEQUENCE
+
+
+def test_numbers_increase_through_bursts_and_clock_steps():
+    now = [1_800_000_000.0]
+    generator = OrderNumberGenerator(7, clock=lambda: now[0])
+    numbers = [generator.next() for _ in range(MAX_SEQUENCE + 10)]  # aynı milisaniyede sıra taşar
+    now[0] -= 5  # saat geri gider
+    numbers += [generator.next() for _ in range(10)]
+    assert numbers == sorted(numbers) and len(set(numbers)) == len(numbers)
+    assert {len(number) for number in numbers} == {13}
+    ms, node, sequence = decode(numbers[0])
+    assert (ms, node, sequence) == (1_800_000_000_000, 7, 0)
+    assert decode(numbers[-1])[0] > ms  # mantıksal saat ilerledi
+    with pytest.raises(ValueError):
+        OrderNumberGenerator(1024)
+
+
+def test_throughput_across_processes():
+    processes, per_process = 4, 50_000
+    started = time.perf_counter()
+    with ProcessPoolExecutor(processes) as pool:
+        batches = list(pool.map(generate_batch, range(processes), [per_process] * processes))
+    elapsed = time.perf_counter() - started
+    numbers = [number for batch in batches for number in batch]
+    assert len(set(numbers)) == processes * per_process
+    assert all(batch == sorted(batch) for batch in batches)
+    assert len(numbers) / elapsed >= 10_000, f'{len(numbers) / elapsed:.0f} numbers/s'
+
+
+def test_node_ids_are_leased_once_per_process(app):
+    app.config['ORDER_NUMBER_NODE_ID'] = None
+    try:
+        with app.app_context():
+            first, second = _lease('host-a:1', 60), _lease('host-b:2', 60)
+            assert first != second
+            assert _lease('host-a:1', 60, current=first) == first  # yenileme aynı id'yi korur
+            # Süresi dolan kiralama başka bir sürece geçer
+            db.session.get(OrderNumberNode, second).leased_until = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            assert _lease('host-c:3', 60) == second
+            assert _lease('host-b:2', 60, current=second) not in (first, second)
+
+            number = new_order_number()
+            node_id = decode(number)[1]
+            assert db.session.get(OrderNumberNode, node_id, populate_existing=True).owner.endswith(f':{os.getpid()}')
+            assert decode(new_order_number())[1] == node_id  # sonraki numaralar veritabanına gitmez
+    finally:
+        app.config['ORDER_NUMBER_NODE_ID'] = 1
+        with app.app_context():
+            OrderNumberNode.query.delete()
+            db.session.commit()
+
+
+def test_fixed_node_numbers_are_time_ordered(app):
+    with app.app_context():
+        before = int(time.time() * 1000)
+        number = new_order_number()
+        ms, node, _ = decode(number)
+        assert node == 1 and ms >= before >= ORDER_NUMBER_EPOCH
+        assert new_order_number() > number
@@ -0,0 +1,62 @@
+# tests/test_picking.py
+# Toplama listeleri: depo/raf gruplaması, en yakın komşu + 2-opt rota, süre ve mesafe raporu.
+import random
+import time
+
+from sqlalchemy import select, func
+
+from app import db
+from app.models import Order, OrderItem
+from app.picking import parse_bin, plan_route
+
+
+def test_parse_bin():
+    assert parse_bin(' b-12-2 ') == (2, 12, 2)
+    assert parse_bin('AA03') == (27, 3, 0)
+    assert parse_bin('Shelf near door') is None and parse_bin(None) is None
+
+
+def test_two_opt_improves_on_nearest_neighbour(app):
+    with app.test_request_context():
+        # Tek koridorda rota düz bir gidiş-dönüştür
+        order, _, distance = plan_route([(1, 5), (1, 1), (1, 9), (1, 3)])
+        assert order == [1, 3, 0, 2] or order == [2, 0, 3, 1]
+        assert distance == 2 * (3.0 + 9)
+
+        rng = random.Random(7)
+        bins = list({(rng.randint(1, 30), rng.randint(1, 40)) for _ in range(520)})[:500]
+        started = time.perf_counter()
+        order, initial, optimized = plan_route(bins)
+        assert time.perf_counter() - started < 1.0
+    assert sorted(order) == list(range(len(bins)))
+    assert optimized <= initial
+
+
+def test_pick_lists_cover_pending_orders(app, login, client_for):
+    with app.app_context():
+        pending_units = db.session.scalar(select(func.sum(OrderItem.quantity)).join(Order)
+                                          .where(Order.status == 'Pending'))
+    client = login('InventoryStaff')
+    result = client.get('/orders/api/pick-lists').get_json()
+    assert result['orders'] > 0 and result['compute_ms'] < 1000
+    assert sum(pick['units'] for pick in result['lists']) == pending_units
+    for pick in result['lists']:
+        assert pick['distance_m'] <= pick['nearest_neighbour_distance_m']
+        assert pick['pick_seconds'] >= pick['walk_seconds']
+        bins = [stop['bin'] for stop in pick['stops']]
+        assert len(bins) == len(set(bins))  # aynı raf tek durak
+        for line in pick['unlocated']:
+            assert sum(quantity for _, quantity in line['orders']) == line['quantity']
+
+    warehouse_id = result['lists'][0]['warehouse_id']
+    only = client.get(f'/orders/api/pick-lists?warehouse={warehouse_id}').get_json()
+    assert [pick['warehouse_id'] for pick in only['lists']] == [warehouse_id]
+    max_orders, app.config['PICK_MAX_ORDERS'] = app.config['PICK_MAX_ORDERS'], 2
+    try:
+        # Negatif limit sınırı aşamaz (SQLite'ta LIMIT -1 sınırsızdır)
+        assert client.get('/orders/api/pick-lists?limit=-1').get_json()['orders'] == 1
+        assert client.get('/orders/api/pick-lists?limit=500').get_json()['orders'] == 2
+    finally:
+        app.config['PICK_MAX_ORDERS'] = max_orders
+    assert 'Pick Lists' in client.get('/orders/pick-lists').get_data(as_text=True)
+    assert client_for('SalesTeam').get('/orders/pick-lists').status_code in (302, 403)
@@ -0,0 +1,84 @@
+# tests/test_product_cache.py
+# Ürün özeti önbelleği: tekrar eden okumalar veritabanına gitmez, ORM ve Core yazmaları commit
+# sonrası özetleri düşürür, yazmadan önce başlamış okuma eski özeti geri koyamaz.
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import Product, Supplier
+from app.product_cache import product_cache, get_product, get_products
+from query_count import assert_max_queries
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    product_cache.invalidate()
+    yield
+    product_cache.invalidate()
+
+
+def test_detail_and_cart_read_from_cache(app, login):
+    with app.app_context():
+        product = db.session.get(Product, 3)
+        name, supplier = product.name, product.supplier_details.name
+    client = login('SalesTeam')
+    response = client.get('/products/3')
+    assert response.status_code == 200
+    assert name.encode() in response.data and supplier.encode() in response.data
+    # Önbellekteki ürün için tek sorgu oturumdaki kullanıcıdır
+    with assert_max_queries(app, 1, label='cached product detail'):
+        assert client.get('/products/3').status_code == 200
+    with assert_max_queries(app, 1, label='add to cart'):
+        assert client.post('/cart/add/3', data={'quantity': 1}).status_code == 302
+    with client.session_transaction() as session:
+        assert session['cart']['3']['name'] == name
+    assert client.get('/products/999999').status_code == 404
+
+
+def _stock(product_id):
+    return db.session.get(Product, product_id, populate_existing=True).quantity_in_stock
+
+
+def test_writes_invalidate_after_commit(app):
+    with app.app_context():
+        before = get_product(5)
+        product = db.session.get(Product, 5)
+        product.price = before.price + 1
+        db.session.flush()
+        assert get_product(5) == before  # commit edilmemiş yazma görünmez
+        db.session.commit()
+        after = get_product(5)
+        assert after.price == before.price + 1 and after.version_id > before.version_id
+
+        # Core UPDATE hangi satırlara dokunduğunu bildirmez: tüm önbellek düşer
+        get_products([6, 7])
+        db.session.execute(update(Product).where(Product.id == 6).values(quantity_in_stock=Product.quantity_in_stock + 1))
+        db.session.commit()
+        assert product_cache.snapshot()['entries'] == 0
+        assert get_product(6).quantity_in_stock == _stock(6)
+
+        # Özetteki tedarikçi adı için tedarikçi değişiklikleri de önbelleği temizler
+        supplier_id = get_product(5).supplier_id
+        supplier = db.session.get(Supplier, supplier_id)
+        name = supplier.name
+        supplier.name = 'Renamed Supplier'
+        db.session.commit()
+        assert get_product(5).supplier_name == 'Renamed Supplier'
+        supplier.name = name
+        product = db.session.get(Product, 5)
+        product.price = before.price
+        db.session.commit()
+
+
+def test_read_started_before_invalidation_is_not_stored(app):
+    with app.app_context():
+        stale = get_product(8, fresh=True)
+        generation = product_cache.generation
+        product_cache.invalidate([8])
+        product_cache.put_many([stale], generation, 100)
+        assert product_cache.get(8, 60) is None
+        # Aynı nesilde bile eski version_id daha yenisinin yerine geçmez
+        fresh = get_product(8)
+        product_cache.put_many([stale._replace(version_id=fresh.version_id - 1, name='old')],
+                               product_cache.generation, 100)
+        assert get_product(8).name == fresh.name
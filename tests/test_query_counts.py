@@ -0,0 +1,114 @@
+# tests/test_query_counts.py
+# Route başına SQL ifadesi bütçeleri. Bütçeler veri miktarından bağımsızdır; örnek veri her
+# listede bir sayfadan fazla satır içerdiği için satır başına sorgu (N+1) bütçeyi aşar.
+# Bir route'a bilinçli olarak sorgu eklendiğinde bütçesi burada güncellenir.
+import pytest
+from sqlalchemy import select
+
+from app import db
+from app.models import Order, User
+from conftest import ROLES, username_for
+from query_count import assert_max_queries
+
+ALL_ROLES = ROLES
+MANAGERS = ('Admin', 'WarehouseManager')
+ADMIN = ('Admin',)
+
+# (url, en fazla SQL ifadesi, erişebilen roller). Oturumdaki kullanıcının yüklenmesi dahildir.
+ROUTE_BUDGETS = {
+    'main': [
+        ('/', 1, ALL_ROLES),
+        ('/reports', 1, ALL_ROLES),
+        ('/reports/low_stock', 2, ALL_ROLES),
+        ('/reports/inventory_aging', 3, ALL_ROLES),
+        ('/reports/products_by_warehouse', 3, ALL_ROLES),
+        ('/reports/recent_orders', 3, ALL_ROLES),
+        ('/reports/most_profitable_products', 3, ALL_ROLES),
+        ('/reports/warehouse_capacity', 3, ('Admin', 'WarehouseManager', 'InventoryStaff')),
+        ('/reports/reorder_suggestions', 4, ('Admin', 'WarehouseManager', 'InventoryStaff')),
+        ('/reports/abc_xyz?refresh=1', 5, ALL_ROLES),
+    ],
+    'products': [
+        ('/products/', 3, ALL_ROLES),
+        ('/products/1', 2, ALL_ROLES),
+        ('/products/1/stock_at', 3, ALL_ROLES),
+        ('/products/scan/SKU-00001', 2, ALL_ROLES),
+        ('/products/add', 3, MANAGERS),
+        ('/products/1/edit', 4, MANAGERS),
+    ],
+    'suppliers': [
+        ('/suppliers/', 3, ALL_ROLES),
+        ('/suppliers/1/edit', 2, MANAGERS),
+        ('/suppliers/lookup?q=Supplier%200', 2, ALL_ROLES),
+    ],
+    'warehouses': [
+        ('/warehouses/', 3, ALL_ROLES),
+        ('/warehouses/1/edit', 2, MANAGERS),
+        ('/warehouses/lookup?q=Ware', 2, ALL_ROLES),
+        ('/warehouses/1/counts', 3, ('Admin', 'WarehouseManager', 'InventoryStaff')),
+        ('/warehouses/transfer?source=1&target=2', 3, MANAGERS),
+    ],
+    'cart': [
+        ('/cart/', 1, ALL_ROLES),
+    ],
+    'orders': [
+        ('/orders/', 4, ALL_ROLES),
+        ('/orders/pick-lists', 3, ('Admin', 'WarehouseManager', 'InventoryStaff')),
+        ('/orders/waves', 2, ('Admin', 'WarehouseManager', 'InventoryStaff')),
+    ],
+    'admin': [
+        ('/admin/users', 3, ADMIN),
+        ('/admin/user/1/edit', 1, ADMIN),
+        ('/admin/metrics', 1, ADMIN),
+    ],
+}
+
+# Dashboard'da role göre farklı sayaçlar çalışır
+DASHBOARD_BUDGETS = {'Admin': 9, 'WarehouseManager': 8, 'InventoryStaff': 6, 'SalesTeam': 6}
+
+ORDER_DETAIL_BUDGET = 3
+
+
+def _route_cases():
+    for blueprint, routes in ROUTE_BUDGETS.items():
+        for url, budget, roles in routes:
+            for role in roles:
+                yield pytest.param(role, url, budget, id=f'{blueprint}:{role}:{url}')
+
+
+@pytest.mark.parametrize('role, url, budget', list(_route_cases()))
+def test_route_query_budget(app, login, role, url, budget):
+    client = login(role)
+    with assert_max_queries(app, budget, label=f'GET {url} as {role}'):
+        response = client.get(url)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('role', ROLES)
+def test_dashboard_query_budget(app, login, role):
+    client = login(role)
+    with assert_max_queries(app, DASHBOARD_BUDGETS[role], label=f'GET /dashboard as {role}'):
+        response = client.get('/dashboard')
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('role', ROLES)
+def test_order_detail_query_budget(app, login, role):
+    with app.app_context():
+        order_id = db.session.scalar(select(Order.id).join(User, Order.user_id == User.id)
+                                     .where(User.username == username_for(role)).limit(1))
+    client = login(role)
+    with assert_max_queries(app, ORDER_DETAIL_BUDGET, label=f'GET /orders/{order_id} as {role}'):
+        response = client.get(f'/orders/{order_id}')
+    assert response.status_code == 200
+
+
+def test_budget_failure_lists_statements(app):
+    with pytest.raises(AssertionError) as excinfo:
+        with assert_max_queries(app, 1, label='N+1 loop'):
+            with app.app_context():
+                for order in Order.query.limit(3).all():
+                    order.items.count()
+    message = str(excinfo.value)
+    assert 'N+1 loop ran 4 SQL statements, expected at most 1' in message
+    assert message.count('FROM order_items') == 3
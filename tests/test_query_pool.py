@@ -0,0 +1,38 @@
+# tests/test_query_pool.py
+# Dashboard sorgu havuzu: zaman aşımına uğrayan sorgular havuzu doldurunca yeni sorgular beklemeden
+# varsayılan değerle döner.
+import pytest
+from sqlalchemy import create_engine, select, text, literal
+
+from app import db
+from app.query_pool import run_concurrently, scalar, query_pool_metrics
+
+# SQLite sorgu zaman aşımını desteklemez; bu sorgu vazgeçildikten sonra da arka planda sürer
+SLOW = text('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 3000000) '
+            'SELECT count(*) FROM c')
+
+
+@pytest.fixture
+def file_engine(app, tmp_path, monkeypatch):
+    engine = create_engine(f'sqlite:///{tmp_path / "pool.db"}')
+    app.config['DASHBOARD_QUERY_MAX_IN_FLIGHT'] = 1
+    app.extensions.pop('query_pool', None)
+    monkeypatch.setattr(db.session, 'get_bind', lambda *args, **kwargs: engine)
+    yield engine
+    app.extensions.pop('query_pool').shutdown(wait=True)
+    app.extensions.pop('query_pool_slots')
+    app.config.pop('DASHBOARD_QUERY_MAX_IN_FLIGHT')
+    engine.dispose()
+
+
+def test_abandoned_queries_do_not_queue_new_pages(app, file_engine):
+    with app.test_request_context():
+        results, degraded = run_concurrently({'slow': scalar(SLOW, default=-1)}, timeout=0.01)
+        assert results == {'slow': -1} and degraded == ['slow']
+        # Yavaş sorgu hâlâ çalışırken yeni sorgu kuyruğa girmez, hemen varsayılanla döner
+        results, degraded = run_concurrently({'fast': scalar(select(literal(1)), default=0)}, timeout=5)
+        assert results == {'fast': 0} and degraded == ['fast']
+        assert query_pool_metrics.snapshot()['fast']['rejected'] >= 1
+        app.extensions.pop('query_pool').shutdown(wait=True)  # yavaş sorgu biter, yer açılır
+        results, degraded = run_concurrently({'fast': scalar(select(literal(1)), default=0)}, timeout=5)
+        assert results == {'fast': 1} and degraded == []
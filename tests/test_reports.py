@@ -0,0 +1,35 @@
+# tests/test_reports.py
+# Rapor sayfalarının hata yolları: hatalı parametre veya yapılandırma yönlendirme döngüsüne girmez.
+import pytest
+
+
+@pytest.fixture
+def config_value(app):
+    changed = {}
+
+    def set_value(name, value):
+        changed.setdefault(name, app.config.get(name))
+        app.config[name] = value
+
+    yield set_value
+    for name, value in changed.items():
+        app.config[name] = value
+
+
+def test_reorder_suggestions_error_does_not_loop(login, config_value):
+    client = login('Admin')
+    response = client.get('/reports/reorder_suggestions?days=1')
+    assert response.status_code == 302 and response.location.endswith('/reports/reorder_suggestions')
+    # Hatalı varsayılan kullanıcı girdisi değildir: sayfa kendine değil rapor listesine yönlendirir
+    config_value('REPLENISHMENT_HISTORY_DAYS', 1)
+    response = client.get('/reports/reorder_suggestions')
+    assert response.status_code == 302 and response.location.endswith('/reports')
+
+
+def test_abc_xyz_error_does_not_loop(login, config_value):
+    client = login('Admin')
+    response = client.get('/reports/abc_xyz?days=3')
+    assert response.status_code == 302 and response.location.endswith('/reports/abc_xyz')
+    config_value('CLASSIFICATION_PERIOD_DAYS', 3)
+    response = client.get('/reports/abc_xyz')
+    assert response.status_code == 302 and response.location.endswith('/reports')
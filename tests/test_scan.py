@@ -0,0 +1,83 @@
+# tests/test_scan.py
+# SKU taramaları: önbellekten çözümleme, toplu taramada tek sorgu, yazmalarda önbellek temizliği.
+import statistics
+import time
+
+import pytest
+
+from app import db
+from app.models import Product
+from app.scan import scan_cache
+from query_count import assert_max_queries
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    scan_cache.invalidate()
+    yield
+    scan_cache.invalidate()
+
+
+def test_scan_returns_minimal_summary_and_is_cached(app, login):
+    client = login('InventoryStaff')
+    response = client.get('/products/scan/ SKU-00004 ')
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'id', 'sku', 'name', 'warehouse_id'}
+    assert response.get_json()['name'] == 'Product 04'
+    # Önbellekteki kod için tek sorgu oturumdaki kullanıcıdır
+    with assert_max_queries(app, 1, label='cached scan'):
+        assert client.get('/products/scan/SKU-00004').status_code == 200
+    assert client.get('/products/scan/NO-SUCH-SKU').status_code == 404
+
+
+def test_cached_scan_latency(login):
+    client = login('InventoryStaff')
+    client.get('/products/scan/SKU-00007')
+    timings = []
+    for _ in range(50):
+        started = time.perf_counter()
+        client.get('/products/scan/SKU-00007')
+        timings.append(time.perf_counter() - started)
+    assert statistics.median(timings) < 0.010
+
+
+def test_batch_resolves_uncached_codes_in_one_query(app, login):
+    client = login('SalesTeam')
+    client.get('/products/scan/SKU-00001')
+    codes = [f'SKU-{i:05}' for i in range(20)] + ['SKU-00001', 'UNKNOWN-1']
+    with assert_max_queries(app, 2, label='batch scan'):
+        response = client.post('/products/scan/batch', json={'codes': codes})
+    data = response.get_json()
+    assert len(data['found']) == 20 and data['missing'] == ['UNKNOWN-1']
+
+    assert client.post('/products/scan/batch', json={'codes': 'SKU-00001'}).status_code == 400
+    app.config['SCAN_BATCH_MAX'] = 5
+    try:
+        assert client.post('/products/scan/batch', json={'codes': codes}).status_code == 400
+    finally:
+        app.config.pop('SCAN_BATCH_MAX')
+
+
+def test_sku_change_invalidates_cache(app, login):
+    client = login('Admin')
+    assert client.get('/products/scan/SKU-00010').status_code == 200
+    with app.app_context():
+        product = Product.query.filter_by(sku='SKU-00010').one()
+        product.sku = 'SKU-RENAMED'
+        db.session.commit()
+    try:
+        assert client.get('/products/scan/SKU-00010').status_code == 404
+        assert client.get('/products/scan/SKU-RENAMED').get_json()['name'] == 'Product 10'
+    finally:
+        with app.app_context():
+            product = Product.query.filter_by(sku='SKU-RENAMED').one()
+            product.sku = 'SKU-00010'
+            db.session.commit()
+
+
+def test_form_rejects_duplicate_sku(login):
+    client = login('Admin')
+    response = client.post('/products/add', data={'name': 'Duplicate SKU', 'sku': 'SKU-00002',
+                                                   'quantity_in_stock': 1, 'price': '1.00'})
+    assert response.status_code == 200
+    assert 'already assigned to another product' in response.get_data(as_text=True)
@@ -0,0 +1,190 @@
+# tests/test_transfers.py
+# Depolar arası toplu transfer: tek transaction, kapasite kontrolü, depo stoğu ve defter tutarlılığı.
+from sqlalchemy import select, func
+
+from app import db
+from app.models import Product, WarehouseLocation, WarehouseStock, StockMovement
+from app.transfers import transfer_stock
+
+# conftest: ürün i, depo i % 12 + 1; her depo kapasitesi 5000
+SOURCE, TARGET = 6, 7
+
+
+def _state(app):
+    with app.app_context():
+        stock = {(p, w): q for p, w, q in db.session.execute(
+            select(WarehouseStock.product_id, WarehouseStock.warehouse_id, WarehouseStock.quantity)).all()}
+        totals = dict(db.session.execute(select(Product.id, Product.quantity_in_stock)).all())
+    return stock, totals
+
+
+def _located(stock, warehouse_id):
+    return sorted(p for (p, w), q in stock.items() if w == warehouse_id and q > 1)
+
+
+def test_bulk_transfer_moves_stock_and_writes_ledger(app, client_for):
+    stock, totals = _state(app)
+    first, second = _located(stock, SOURCE)[:2]
+    with app.app_context():
+        second_sku = db.session.get(Product, second).sku
+        movements_before = db.session.scalar(select(func.count()).select_from(StockMovement))
+    moves = [{'product_id': first, 'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET,
+              'quantity': stock[(first, SOURCE)]},                                           # tamamı
+             {'sku': second_sku, 'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET, 'quantity': 1}]
+    client = client_for('WarehouseManager')
+    response = client.post('/warehouses/api/transfers', json={'moves': moves, 'reference': 'Rebalance',
+                                                              'update_home': True})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['moves'] == 2 and result['rehomed_products'] == 1
+    moved = stock[(first, SOURCE)] + 1
+    assert result['warehouses'][str(TARGET)]['occupancy_after'] - result['warehouses'][str(TARGET)]['occupancy_before'] == moved
+
+    after, totals_after = _state(app)
+    assert totals_after == totals  # transfer ürün toplamını değiştirmez
+    assert after[(first, SOURCE)] == 0 and after[(first, TARGET)] == stock[(first, SOURCE)]
+    assert after[(second, SOURCE)] == stock[(second, SOURCE)] - 1 and after[(second, TARGET)] == 1
+    with app.app_context():
+        assert db.session.get(Product, first).warehouse_id == TARGET
+        assert db.session.get(Product, second).warehouse_id == SOURCE
+        rows = db.session.execute(select(StockMovement.product_id, StockMovement.warehouse_id, StockMovement.quantity)
+                                  .where(StockMovement.reference == 'Rebalance')).all()
+        assert db.session.scalar(select(func.count()).select_from(StockMovement)) == movements_before + 4
+    assert sorted(rows) == sorted([(first, SOURCE, -stock[(first, SOURCE)]), (first, TARGET, stock[(first, SOURCE)]),
+                                   (second, SOURCE, -1), (second, TARGET, 1)])
+
+    # Geri taşı
+    back = [dict(move, from_warehouse_id=TARGET, to_warehouse_id=SOURCE) for move in moves]
+    assert client.post('/warehouses/api/transfers', json={'moves': back, 'update_home': True}).status_code == 200
+    restored, _ = _state(app)
+    assert restored[(first, SOURCE)] == stock[(first, SOURCE)] and restored[(second, TARGET)] == 0
+
+
+def test_only_changed_homes_are_reported(app):
+    stock, _ = _state(app)
+    homed = _located(stock, TARGET)[0]
+    with app.app_context():
+        version = db.session.get(Product, homed).version_id
+        there = {'product_id': homed, 'from_warehouse_id': TARGET, 'to_warehouse_id': SOURCE, 'quantity': 1}
+        transfer_stock([there])
+        # Ana deposu zaten hedef depo olan ürün taşınmış sayılmaz
+        result = transfer_stock([dict(there, from_warehouse_id=SOURCE, to_warehouse_id=TARGET)], update_home=True)
+        assert result['rehomed_products'] == 0
+        product = db.session.get(Product, homed)
+        assert (product.warehouse_id, product.version_id) == (TARGET, version)
+    assert _state(app)[0][(homed, TARGET)] == stock[(homed, TARGET)]
+
+
+def test_transfer_is_all_or_nothing(app, client_for):
+    stock, totals = _state(app)
+    first, second = _located(stock, SOURCE)[:2]
+    client = client_for('Admin')
+    moves = [{'product_id': first, 'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET, 'quantity': 1},
+             {'product_id': second, 'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET,
+              'quantity': stock[(second, SOURCE)] + 1}]                                      # stok yetmez
+    response = client.post('/warehouses/api/transfers', json={'moves': moves})
+    assert response.status_code == 400 and 'Not enough stock' in response.get_json()['error']
+    response = client.post('/warehouses/api/transfers', json={'moves': [dict(moves[0], sku='NOPE', product_id=None)]})
+    assert response.status_code == 400 and 'unknown SKU' in response.get_json()['error']
+    assert _state(app) == (stock, totals)
+
+
+def test_target_capacity_is_checked(app, client_for):
+    stock, _ = _state(app)
+    first = _located(stock, SOURCE)[0]
+    with app.app_context():
+        target = db.session.get(WarehouseLocation, TARGET)
+        stored = db.session.scalar(select(func.sum(WarehouseStock.quantity)).where(WarehouseStock.warehouse_id == TARGET))
+        target.capacity = stored + 1
+        db.session.commit()
+    try:
+        client = client_for('Admin')
+        move = {'product_id': first, 'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET, 'quantity': 2}
+        response = client.post('/warehouses/api/transfers', json={'moves': [move]})
+        assert response.status_code == 400 and 'capacity' in response.get_json()['error']
+        assert _state(app)[0] == stock
+    finally:
+        with app.app_context():
+            db.session.get(WarehouseLocation, TARGET).capacity = 5000
+            db.session.commit()
+
+
+def test_transfer_form(app, client_for):
+    stock, _ = _state(app)
+    first = _located(stock, SOURCE)[0]
+    assert client_for('InventoryStaff').get('/warehouses/transfer').status_code in (302, 403)
+    client = client_for('WarehouseManager')
+    assert client.get(f'/warehouses/transfer?source={SOURCE}&target={TARGET}').status_code == 200
+    response = client.post('/warehouses/transfer', data={'from_warehouse_id': SOURCE, 'to_warehouse_id': TARGET,
+                                                          'lines': f'#{first},1'}, follow_redirects=True)
+    assert 'Moved 1 units of 1 products' in response.get_data(as_text=True)
+    client.post('/warehouses/transfer', data={'from_warehouse_id': TARGET, 'to_warehouse_id': SOURCE,
+                                              'lines': f'#{first},1'})
+    assert _state(app)[0][(first, SOURCE)] == stock[(first, SOURCE)]
+
+
+def test_warehouse_holding_stock_is_not_deleted(app, client_for):
+    with app.app_context():
+        warehouse = WarehouseLocation(name='Transfer Only Warehouse', address='Transfer Street 1')
+        db.session.add(warehouse)
+        db.session.flush()
+        # Ürünün ana deposu değil, yalnızca depo stoğu satırları var
+        db.session.add_all([WarehouseStock(product_id=1, warehouse_id=warehouse.id, quantity=3),
+                            WarehouseStock(product_id=2, warehouse_id=warehouse.id, quantity=0)])
+        db.session.commit()
+        warehouse_id = warehouse.id
+    client = client_for('Admin')
+    assert client.post(f'/warehouses/{warehouse_id}/delete').status_code == 302
+    with app.app_context():
+        assert db.session.get(WarehouseLocation, warehouse_id) is not None
+        WarehouseStock.query.filter_by(warehouse_id=warehouse_id, product_id=1).update({'quantity': 0})
+        db.session.commit()
+    # Yalnızca sıfır stok kalınca depo, boş stok satırlarıyla birlikte silinir
+    assert client.post(f'/warehouses/{warehouse_id}/delete').status_code == 302
+    with app.app_context():
+        assert db.session.get(WarehouseLocation, warehouse_id) is None
+        assert WarehouseStock.query.filter_by(warehouse_id=warehouse_id).count() == 0
+
+
+def _home_state(product_id):
+    stock = dict(db.session.execute(select(WarehouseStock.warehouse_id, WarehouseStock.quantity)
+                                    .where(WarehouseStock.product_id == product_id)).all())
+    transfers = db.session.execute(select(StockMovement.warehouse_id, StockMovement.quantity)
+                                   .where(StockMovement.product_id == product_id,
+                                          StockMovement.movement_type == 'transfer')
+                                   .order_by(StockMovement.id)).all()
+    return {w: q for w, q in stock.items() if q}, [tuple(row) for row in transfers]
+
+
+def test_home_warehouse_change_moves_stock_and_ledger_together(app):
+    with app.app_context():
+        product = Product(name='Unhomed Product', price=1, quantity_in_stock=50)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+        try:
+            # Atanmamış stok yeni ana depoya geçer; defter taşınan miktarı yazar
+            product.warehouse_id = SOURCE
+            db.session.commit()
+            assert _home_state(product_id) == ({SOURCE: 50}, [(None, -50), (SOURCE, 50)])
+
+            # Başka depodaki stok ana depo değişikliğiyle taşınmaz
+            transfer_stock([{'product_id': product_id, 'from_warehouse_id': SOURCE, 'to_warehouse_id': 1,
+                             'quantity': 20}])
+            product = db.session.get(Product, product_id)
+            product.warehouse_id = TARGET
+            db.session.commit()
+            stock, transfers = _home_state(product_id)
+            assert stock == {1: 20, TARGET: 30}
+            assert transfers[-2:] == [(SOURCE, -30), (TARGET, 30)]
+
+            # Ana depo kaldırılınca ana depo satırı atanmamış stoğa döner
+            product = db.session.get(Product, product_id)
+            product.warehouse_id = None
+            db.session.commit()
+            stock, transfers = _home_state(product_id)
+            assert stock == {1: 20} and transfers[-2:] == [(TARGET, -30), (None, 30)]
+        finally:
+            WarehouseStock.query.filter_by(product_id=product_id).delete()
+            db.session.delete(db.session.get(Product, product_id))
+            db.session.commit()
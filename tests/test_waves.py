@@ -0,0 +1,126 @@
+# tests/test_waves.py
+# Dalga planlayıcısı: depo ve ortak ürüne göre gruplama, artımlı imleç, doluluk/süre ile serbest bırakma.
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Order, OrderItem, Product, PickWave, WavePlannerState
+from app.waves import plan_waves
+
+
+@pytest.fixture
+def planner(app):
+    app.config.update(WAVE_SIZE=3, WAVE_MAX_OPEN=2, WAVE_CUTOFF_MINUTES=30, WAVE_LOOKBACK_IDS=0)
+    with app.app_context():
+        # Tohum siparişleri planlanmasın: imleç mevcut son siparişten başlar
+        state = db.session.get(WavePlannerState, 1) or WavePlannerState(id=1)
+        state.last_order_id = db.session.scalar(select(func.max(Order.id)))
+        db.session.add(state)
+        db.session.commit()
+    created = []
+
+    def place(product_ids):
+        with app.app_context():
+            order = Order(order_number=f'WAVE-{len(created):03}', user_id=1, status='Pending')
+            for product_id in product_ids:
+                order.items.append(OrderItem(product_id=product_id, quantity=1, price_at_order=Decimal('1.00')))
+            db.session.add(order)
+            db.session.commit()
+            created.append(order.id)
+            return order.id
+
+    yield place
+    with app.app_context():
+        for order_id in created:
+            db.session.delete(db.session.get(Order, order_id))
+        db.session.flush()
+        PickWave.query.delete()
+        db.session.commit()
+    for key in ('WAVE_SIZE', 'WAVE_MAX_OPEN', 'WAVE_CUTOFF_MINUTES', 'WAVE_LOOKBACK_IDS'):
+        app.config.pop(key)
+
+
+def _plan(app, now=None):
+    with app.app_context():
+        return plan_waves(now)
+
+
+def _wave_of(app, order_id):
+    with app.app_context():
+        order = db.session.get(Order, order_id)
+        return order.wave_id, order.status
+
+
+def test_orders_are_grouped_by_warehouse_and_overlap(app, planner):
+    with app.app_context():
+        a, b, c = db.session.execute(select(Product.id).where(Product.warehouse_id == 2)
+                                     .order_by(Product.id).limit(3)).scalars()
+        x = db.session.scalar(select(Product.id).where(Product.warehouse_id == 3))
+    o1, o2, o3, o4, o5 = planner([a]), planner([b]), planner([a]), planner([c]), planner([x])
+
+    summary = _plan(app)
+    assert summary['new_orders'] == 5 and summary['waves_created'] == 3
+    first = _wave_of(app, o1)[0]
+    assert _wave_of(app, o3)[0] == first        # ortak ürün (a)
+    assert _wave_of(app, o2)[0] != first        # ortak ürün yok, yeni dalga
+    assert _wave_of(app, o4)[0] == first        # açık dalga sınırı dolu: en dolu dalgaya
+    assert _wave_of(app, o5)[0] not in (first, _wave_of(app, o2)[0])  # başka depo
+    # Dolan dalga hemen serbest bırakılır, siparişleri Processing olur
+    assert summary['released'] == [first]
+    assert {_wave_of(app, o)[1] for o in (o1, o3, o4)} == {'Processing'}
+    assert _wave_of(app, o2)[1] == 'Pending'
+    with app.app_context():
+        wave = db.session.get(PickWave, first)
+        assert (wave.status, wave.order_count, wave.line_count, wave.sku_count) == ('Released', 3, 3, 2)
+
+    # Artımlı: yeni sipariş yoksa hiçbir şey taranmaz; süre aşımı kalan dalgaları serbest bırakır
+    assert _plan(app)['new_orders'] == 0
+    later = _plan(app, now=datetime.utcnow() + timedelta(minutes=31))
+    assert sorted(later['released']) == sorted({_wave_of(app, o2)[0], _wave_of(app, o5)[0]})
+    assert _wave_of(app, o2)[1] == 'Processing'
+
+
+def test_waves_page_and_wave_pick_list(app, login, planner):
+    with app.app_context():
+        product_id = db.session.scalar(select(Product.id).where(Product.warehouse_id == 2, Product.bin != None))
+    order_id = planner([product_id])
+    _plan(app)
+    wave_id = _wave_of(app, order_id)[0]
+    client = login('InventoryStaff')
+    assert f'#{wave_id}' in client.get('/orders/waves').get_data(as_text=True)
+    result = client.get(f'/orders/api/pick-lists?wave={wave_id}').get_json()
+    assert result['orders'] == 1 and result['lists'][0]['stops'][0]['lines'][0]['product_id'] == product_id
+
+
+class _StopLoop(BaseException):
+    pass
+
+
+def test_loop_survives_failed_runs(app, monkeypatch):
+    from app.orders import commands
+    runs, sleeps = [], []
+
+    def flaky_plan_waves():
+        runs.append(1)
+        if len(runs) == 1:
+            raise OperationalError('SELECT 1', {}, Exception('connection lost'))
+        return {'new_orders': 0, 'waves_created': 0, 'released': [], 'seconds': 0}
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise _StopLoop()
+
+    monkeypatch.setattr(commands, 'plan_waves', flaky_plan_waves)
+    monkeypatch.setattr(commands.time, 'sleep', sleep)
+    runner = app.test_cli_runner()
+    with pytest.raises(_StopLoop):
+        runner.invoke(args=['orders', 'plan-waves', '--loop', '--interval', '1'])
+    assert len(runs) == 2  # hatalı çalışmadan sonra döngü sürdü
+    # Döngü olmadan hata komutu sonlandırır
+    runs.clear()
+    assert isinstance(runner.invoke(args=['orders', 'plan-waves']).exception, OperationalError)
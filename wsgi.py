@@ -0,0 +1,7 @@
+# wsgi.py
+# Üretim sunucusu giriş noktası: gunicorn -c gunicorn.conf.py wsgi:app
+# Geliştirme için run.py kullanılmaya devam edilir.
+from app import create_app
+
+app = create_app(components=('web', 'api'))
+